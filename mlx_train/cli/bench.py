@@ -0,0 +1,123 @@
+import os
+from pathlib import Path
+from typing import List, Optional
+import typer
+from rich.console import Console
+from rich.table import Table
+from mlx_train.core.distributed import get_communicator, launch_local
+from mlx_train.utils.benchmark import (
+    DEFAULT_SIZES, DEFAULT_VOCAB_SIZES, benchmark_checkpoint, benchmark_collectives, benchmark_loss_memory, save_results
+)
+
+console = Console()
+app = typer.Typer(help="Benchmark communication and compute")
+
+def _run_benchmark(comm, sizes, dtypes, iterations):
+    return benchmark_collectives(comm, sizes=sizes, dtypes=dtypes, iterations=iterations)
+
+def _format_bytes(n: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024:
+            return f"{n:.0f}{unit}"
+        n /= 1024
+    return f"{n:.0f}TB"
+
+@app.command()
+def comm(
+    config: Path = typer.Option(Path("mlx-project/config.json"), help="Project config; results are saved next to it"),
+    sizes: Optional[List[int]] = typer.Option(None, "--size", help="Message size in bytes (repeatable)"),
+    dtypes: List[str] = typer.Option(["float32", "bfloat16"], "--dtype", help="Data type (repeatable)"),
+    iterations: int = typer.Option(10, help="Timed iterations per message size"),
+    backend: str = typer.Option("mlx", help="Communicator backend: mlx or mpi"),
+    local: int = typer.Option(0, help="Run N ranks on this machine over shared memory instead"),
+    btl_tcp_links: Optional[int] = typer.Option(None, help="Set OMPI_MCA_btl_tcp_links before initializing")
+):
+    """Measure all_reduce, all_gather and broadcast latency and bus bandwidth"""
+    sizes = sizes or DEFAULT_SIZES
+    if btl_tcp_links is not None:
+        os.environ["OMPI_MCA_btl_tcp_links"] = str(btl_tcp_links)
+
+    if local:
+        # Fit the largest message in one slot (bf16 travels as fp32, hence 2x), at least 1MB
+        slot_mb = max(2 * max(sizes) / 1024 / 1024, 1.0)
+        results = launch_local(_run_benchmark, local, sizes, dtypes, iterations, slot_mb=slot_mb)[0]
+        rank = 0
+    else:
+        communicator = get_communicator(backend)
+        results = _run_benchmark(communicator, sizes, dtypes, iterations)
+        rank = communicator.rank
+
+    if rank != 0:
+        return
+
+    table = Table(title=f"Collectives on {results[0]['world_size']} rank(s)")
+    for column in ("Op", "Dtype", "Size", "Latency", "Alg BW", "Bus BW"):
+        table.add_column(column)
+    for row in results:
+        table.add_row(
+            row["op"],
+            row["dtype"],
+            _format_bytes(row["bytes"]),
+            f"{row['latency_us']:.1f}us",
+            f"{row['algbw_gbps']:.2f}GB/s",
+            f"{row['busbw_gbps']:.2f}GB/s"
+        )
+    console.print(table)
+
+    output = config.parent / "comm_benchmark.json"
+    save_results(results, output, metadata={
+        "backend": "shared_memory" if local else backend,
+        "btl_tcp_links": os.environ.get("OMPI_MCA_btl_tcp_links")
+    })
+    console.print(f"[green]Saved results to {output}[/green]")
+
+@app.command()
+def checkpoint(
+    params: float = typer.Option(1e9, help="Number of parameters"),
+    dtype: str = typer.Option("float32", help="Parameter data type"),
+    directory: Optional[Path] = typer.Option(None, help="Where to write the temporary checkpoints")
+):
+    """Measure checkpoint save and load time and size on disk"""
+    results = benchmark_checkpoint(int(params), dtype=dtype, directory=directory)
+
+    table = Table(title=f"Checkpoint of {int(params) / 1e6:.0f}M {dtype} parameters")
+    for column in ("Format", "Save", "Load", "Size", "Save rate"):
+        table.add_column(column)
+    for row in results:
+        table.add_row(
+            row["format"],
+            f"{row['save_s']:.2f}s",
+            f"{row['load_s']:.2f}s",
+            _format_bytes(row["bytes"]),
+            f"{row['bytes'] / row['save_s'] / 1e9:.2f}GB/s"
+        )
+    console.print(table)
+    if len(results) == 1:
+        console.print("[yellow]JSON format skipped at this size (use --params 1e7 or less to compare)[/yellow]")
+
+@app.command()
+def loss(
+    vocab_sizes: Optional[List[int]] = typer.Option(None, "--vocab", help="Vocabulary size (repeatable)"),
+    tokens: int = typer.Option(2048, help="Tokens per batch (batch x sequence length)"),
+    hidden_size: int = typer.Option(512, help="Hidden size feeding the output projection"),
+    chunk_size: int = typer.Option(1024, help="Tokens per chunk for the chunked loss"),
+    dtype: str = typer.Option("float32", help="Activation and weight data type")
+):
+    """Measure peak memory of the naive vs chunked cross-entropy loss"""
+    results = benchmark_loss_memory(
+        vocab_sizes or DEFAULT_VOCAB_SIZES, tokens=tokens, hidden_size=hidden_size,
+        chunk_size=chunk_size, dtype=dtype
+    )
+
+    table = Table(title=f"Cross-entropy over {tokens} tokens (forward + backward)")
+    for column in ("Vocab", "Method", "Logits", "Peak memory", "Time"):
+        table.add_column(column)
+    for row in results:
+        table.add_row(
+            str(row["vocab_size"]),
+            row["method"],
+            _format_bytes(row["logits_bytes"]),
+            _format_bytes(row["peak_bytes"]),
+            f"{row['time_s']:.2f}s"
+        )
+    console.print(table)
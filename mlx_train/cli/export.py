@@ -16,7 +16,8 @@ def export_model(
     checkpoint_path: Path,
     output_dir: Path,
     format: str = "mlx",
-    quantize: bool = True
+    quantize: bool = True,
+    adapter_path: Optional[Path] = None
 ):
     """Export trained model for inference"""
     try:
@@ -29,7 +30,7 @@ def export_model(
         
         # Export based on format
         if format == "mlx":
-            _export_mlx(checkpoint, output_dir, quantize)
+            _export_mlx(checkpoint_path, output_dir, quantize, adapter_path)
         elif format == "gguf":  # For Ollama compatibility
             _export_gguf(checkpoint, output_dir)
         
@@ -67,18 +68,21 @@ def export_model(
 def serve(
     model_path: Path,
     port: int = 8000,
-    quantize: bool = True
+    quantize: bool = True,
+    adapters: Optional[Path] = None
 ):
     """Serve exported model locally"""
     from serving.server import ModelServer
     
     server = ModelServer(model_path, port)
     server.load_model(quantize=quantize)
+    if adapters:
+        server.load_adapters(adapters)
     server.serve() 
 
-def _export_mlx(checkpoint, output_dir, quantize):
+def _export_mlx(checkpoint, output_dir, quantize, adapter_path=None):
     """Export model to MLX format"""
-    return export_mlx(checkpoint, output_dir, quantize)
+    return export_mlx(checkpoint, output_dir, quantize, adapter_path=adapter_path)
 
 def _export_gguf(checkpoint, output_dir):
     """Export model to GGUF format"""
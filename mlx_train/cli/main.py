@@ -14,12 +14,14 @@ from core.environment import EnvironmentManager
 from core.hardware import HardwareManager
 from core.config import ProjectConfig
 from core.memory_optimizer import MemoryOptimizer
+from mlx_train.cli.bench import app as bench_app
 
 app = typer.Typer(
     help="🚀 MLX Training Framework",
     no_args_is_help=True,
     add_completion=False
 )
+app.add_typer(bench_app, name="bench")
 console = Console()
 
 def show_welcome():
@@ -118,7 +120,8 @@ def configure_project():
             "num_layers": 24,
             "num_heads": 32,
             "batch_size": 64,
-            "model_type": "transformer"
+            "model_type": "transformer",
+            "fsdp": True  # Shard parameters instead of replicating them
         }
     }
     
@@ -1,23 +1,352 @@
+import multiprocessing as mp
+import queue
+import threading
+import time
+import traceback
+from multiprocessing import shared_memory
+from typing import Any, Callable, List, Optional
 import mlx.core as mx
-from mpi4py import MPI
-from typing import Dict, Any
+import numpy as np
 
-class DistributedController:
-    def __init__(self):
-        self.comm = MPI.COMM_WORLD
+class Communicator:
+    """Collective operations on MLX arrays, independent of the transport
+
+    All ranks must call collectives in the same order with arrays of the
+    same shape and dtype. `all_gather` concatenates along axis 0 and
+    `reduce_scatter` sums then returns this rank's slice of axis 0.
+    Point-to-point `send`/`recv` complete before returning.
+    """
+
+    rank: int = 0
+    size: int = 1
+
+    def all_reduce(self, x: mx.array) -> mx.array:
+        raise NotImplementedError
+
+    def broadcast(self, x: mx.array, root: int = 0) -> mx.array:
+        raise NotImplementedError
+
+    def all_gather(self, x: mx.array) -> mx.array:
+        raise NotImplementedError
+
+    def reduce_scatter(self, x: mx.array) -> mx.array:
+        raise NotImplementedError
+
+    def barrier(self):
+        raise NotImplementedError
+
+    def send(self, x: mx.array, dst: int):
+        raise NotImplementedError
+
+    def recv(self, shape, dtype: mx.Dtype, src: int) -> mx.array:
+        raise NotImplementedError
+
+    def _scatter_slice(self, x: mx.array) -> mx.array:
+        """This rank's slice of axis 0 for reduce-scatter"""
+        if x.shape[0] % self.size:
+            raise ValueError(f"reduce_scatter needs axis 0 ({x.shape[0]}) divisible by world size {self.size}")
+        chunk = x.shape[0] // self.size
+        return x[self.rank * chunk:(self.rank + 1) * chunk]
+
+class MLXCommunicator(Communicator):
+    """Collectives on `mx.distributed` (MPI or ring backend), lazy and on-graph"""
+
+    def __init__(self, group=None):
+        self.group = group if group is not None else mx.distributed.init()
+        self.rank = int(self.group.rank())
+        self.size = int(self.group.size())
+
+    def all_reduce(self, x: mx.array) -> mx.array:
+        return mx.distributed.all_sum(x, group=self.group)
+
+    def broadcast(self, x: mx.array, root: int = 0) -> mx.array:
+        """Ring broadcast over point-to-point sends
+
+        The tensor travels from the root around the ring, so every rank
+        receives it once and sends it at most once: half the bytes of an
+        all-reduce over zeros. Only neighbours talk, which the ring backend
+        requires; the cost is `size - 1` hops of latency. Unlike the other
+        collectives it is evaluated eagerly, like `send`/`recv`: a send and
+        a later recv in the same graph can deadlock.
+        """
+        if self.size == 1:
+            return x
+        position = (self.rank - root) % self.size
+        if position:
+            x = mx.distributed.recv_like(x, (self.rank - 1) % self.size, group=self.group)
+        mx.eval(x)
+        if position < self.size - 1:
+            mx.eval(mx.distributed.send(x, (self.rank + 1) % self.size, group=self.group))
+        return x
+
+    def all_gather(self, x: mx.array) -> mx.array:
+        return mx.distributed.all_gather(x, group=self.group)
+
+    def reduce_scatter(self, x: mx.array) -> mx.array:
+        if hasattr(mx.distributed, "sum_scatter"):
+            return mx.distributed.sum_scatter(x, group=self.group)
+        return self._scatter_slice(self.all_reduce(x))
+
+    def barrier(self):
+        mx.eval(mx.distributed.all_sum(mx.array(0.0), group=self.group))
+
+    def send(self, x: mx.array, dst: int):
+        mx.eval(mx.distributed.send(x, dst, group=self.group))
+
+    def recv(self, shape, dtype: mx.Dtype, src: int) -> mx.array:
+        x = mx.distributed.recv(shape, dtype, src, group=self.group)
+        mx.eval(x)
+        return x
+
+def _to_numpy(x: mx.array) -> np.ndarray:
+    """Zero-copy numpy view of an evaluated array (bf16 is upcast, numpy lacks it)"""
+    if x.dtype == mx.bfloat16:
+        x = x.astype(mx.float32)
+    mx.eval(x)
+    return np.ascontiguousarray(np.asarray(x))
+
+def _from_numpy(array: np.ndarray, dtype: mx.Dtype) -> mx.array:
+    return mx.array(array).astype(dtype)
+
+def _recv_buffer(shape, dtype: mx.Dtype):
+    """A fresh MLX array and a writable numpy view of its memory
+
+    Receiving into the view fills the MLX array in place, so results need
+    no copy back from numpy. bf16 is received as fp32 (see `_to_numpy`) and
+    converted by `_from_buffer`.
+    """
+    out = mx.zeros(shape, dtype=mx.float32 if dtype == mx.bfloat16 else dtype)
+    mx.eval(out)
+    view = np.asarray(out)
+    if not view.flags.c_contiguous or not view.flags.writeable:
+        # Not a plain buffer we can write through; receive into numpy instead
+        view = np.empty(view.shape, dtype=view.dtype)
+        return None, view
+    return out, view
+
+def _from_buffer(out: Optional[mx.array], view: np.ndarray, dtype: mx.Dtype) -> mx.array:
+    if out is None:
+        return _from_numpy(view, dtype)
+    return out if out.dtype == dtype else out.astype(dtype)
+
+class MPICommunicator(Communicator):
+    """Collectives on mpi4py buffers
+
+    Send buffers are numpy views of the MLX arrays, and results are received
+    straight into the memory of a new MLX array, so neither side copies
+    (bf16 is the exception: it travels as fp32).
+    """
+
+    def __init__(self, comm=None):
+        from mpi4py import MPI
+        self.MPI = MPI
+        self.comm = comm if comm is not None else MPI.COMM_WORLD
         self.rank = self.comm.Get_rank()
         self.size = self.comm.Get_size()
-        
-    def all_reduce_grads(self, grads: Dict[str, mx.array]) -> Dict[str, mx.array]:
-        """All-reduce gradients across devices"""
-        for k, v in grads.items():
-            # Convert to numpy for MPI communication
-            np_array = v.numpy()
-            self.comm.Allreduce(MPI.IN_PLACE, np_array, op=MPI.SUM)
-            # Convert back to MLX array and normalize
-            grads[k] = mx.array(np_array) / self.size
-        return grads
-    
-    def broadcast(self, data: Any, root: int = 0) -> Any:
-        """Broadcast data from root to all processes"""
-        return self.comm.bcast(data, root=root) 
\ No newline at end of file
+
+    def all_reduce(self, x: mx.array) -> mx.array:
+        send = _to_numpy(x)
+        out, recv = _recv_buffer(x.shape, x.dtype)
+        self.comm.Allreduce(send, recv, op=self.MPI.SUM)
+        return _from_buffer(out, recv, x.dtype)
+
+    def broadcast(self, x: mx.array, root: int = 0) -> mx.array:
+        if self.rank == root:
+            # Root sends straight from its view and keeps its own array
+            self.comm.Bcast(_to_numpy(x), root=root)
+            return x
+        out, buffer = _recv_buffer(x.shape, x.dtype)
+        self.comm.Bcast(buffer, root=root)
+        return _from_buffer(out, buffer, x.dtype)
+
+    def all_gather(self, x: mx.array) -> mx.array:
+        send = _to_numpy(x)
+        out, recv = _recv_buffer((self.size * x.shape[0],) + tuple(x.shape[1:]), x.dtype)
+        self.comm.Allgather(send, recv)
+        return _from_buffer(out, recv, x.dtype)
+
+    def reduce_scatter(self, x: mx.array) -> mx.array:
+        send = _to_numpy(x)
+        chunk = self._scatter_slice(x).shape[0]
+        out, recv = _recv_buffer((chunk,) + tuple(x.shape[1:]), x.dtype)
+        self.comm.Reduce_scatter_block(send, recv, op=self.MPI.SUM)
+        return _from_buffer(out, recv, x.dtype)
+
+    def barrier(self):
+        self.comm.Barrier()
+
+    def send(self, x: mx.array, dst: int):
+        self.comm.Send(_to_numpy(x), dest=dst)
+
+    def recv(self, shape, dtype: mx.Dtype, src: int) -> mx.array:
+        out, buffer = _recv_buffer(shape, dtype)
+        self.comm.Recv(buffer, source=src)
+        return _from_buffer(out, buffer, dtype)
+
+class SharedMemoryCommunicator(Communicator):
+    """Multi-process collectives over a shared-memory segment on one machine
+
+    Each rank owns a fixed-size slot; messages larger than a slot are sent
+    in chunks. Reductions sum slots in rank order, so every rank gets a
+    bit-identical result. Point-to-point messages go through one queue per
+    (src, dst) pair. Intended for testing collective correctness and
+    performance with N ranks on a single Linux box (see `launch_local`).
+    """
+
+    def __init__(self, rank: int, size: int, shm_name: str, barrier, slot_bytes: int, mailboxes=None):
+        self.rank = rank
+        self.size = size
+        self.slot_bytes = slot_bytes
+        self._barrier = barrier
+        self._mailboxes = mailboxes or {}
+        self._shm = shared_memory.SharedMemory(name=shm_name)
+        self._buffer = np.ndarray((size, slot_bytes), dtype=np.uint8, buffer=self._shm.buf)
+
+    def close(self):
+        del self._buffer
+        self._shm.close()
+
+    def _exchange(self, data: np.ndarray, consume: Callable[[int, List[np.ndarray]], None]):
+        """Publish `data` chunk by chunk and let `consume` read every rank's chunk"""
+        raw = np.ascontiguousarray(data).reshape(-1).view(np.uint8)
+        for start in range(0, max(raw.size, 1), self.slot_bytes):
+            chunk = raw[start:start + self.slot_bytes]
+            self._buffer[self.rank, :chunk.size] = chunk
+            self._barrier.wait()
+            consume(start, [self._buffer[r, :chunk.size] for r in range(self.size)])
+            # Nobody overwrites a slot until every rank has read it
+            self._barrier.wait()
+
+    def all_reduce(self, x: mx.array) -> mx.array:
+        data = _to_numpy(x)
+        out = np.empty_like(data).reshape(-1).view(np.uint8)
+
+        def consume(start, slots):
+            acc = slots[0].view(data.dtype).copy()
+            for slot in slots[1:]:
+                acc += slot.view(data.dtype)
+            out[start:start + acc.nbytes] = acc.view(np.uint8)
+
+        self._exchange(data, consume)
+        return _from_numpy(out.view(data.dtype).reshape(data.shape), x.dtype)
+
+    def broadcast(self, x: mx.array, root: int = 0) -> mx.array:
+        data = _to_numpy(x)
+        out = np.empty_like(data).reshape(-1).view(np.uint8)
+
+        def consume(start, slots):
+            out[start:start + slots[root].size] = slots[root]
+
+        self._exchange(data, consume)
+        return _from_numpy(out.view(data.dtype).reshape(data.shape), x.dtype)
+
+    def all_gather(self, x: mx.array) -> mx.array:
+        data = _to_numpy(x)
+        out = np.empty((self.size, data.nbytes), dtype=np.uint8)
+
+        def consume(start, slots):
+            for r, slot in enumerate(slots):
+                out[r, start:start + slot.size] = slot
+
+        self._exchange(data, consume)
+        gathered = out.view(data.dtype).reshape((self.size * data.shape[0],) + data.shape[1:])
+        return _from_numpy(gathered, x.dtype)
+
+    def reduce_scatter(self, x: mx.array) -> mx.array:
+        # Local test backend: a full all-reduce followed by a local slice
+        return self._scatter_slice(self.all_reduce(x))
+
+    def barrier(self):
+        self._barrier.wait()
+
+    def send(self, x: mx.array, dst: int):
+        self._mailboxes[(self.rank, dst)].put(_to_numpy(x))
+
+    def recv(self, shape, dtype: mx.Dtype, src: int) -> mx.array:
+        return _from_numpy(self._mailboxes[(src, self.rank)].get(), dtype).reshape(shape)
+
+class RankFailure(RuntimeError):
+    """A local distributed run failed; `failed_ranks` died or raised first"""
+
+    def __init__(self, message: str, failed_ranks: List[int]):
+        super().__init__(message)
+        self.failed_ranks = failed_ranks
+
+def _local_worker(fn, rank, size, shm_name, barrier, slot_bytes, mailboxes, results, args):
+    comm = SharedMemoryCommunicator(rank, size, shm_name, barrier, slot_bytes, mailboxes)
+    try:
+        results.put((rank, True, fn(comm, *args)))
+    except BaseException as e:
+        barrier.abort()  # Unblock the other ranks
+        # Ranks that only broke because a peer aborted the barrier are collateral
+        collateral = isinstance(e, threading.BrokenBarrierError)
+        results.put((rank, False, (collateral, traceback.format_exc())))
+    finally:
+        comm.close()
+
+def launch_local(fn: Callable, world_size: int, *args, slot_mb: float = 16.0, timeout: float = 300.0) -> List[Any]:
+    """Run `fn(comm, *args)` on `world_size` local processes and collect the results
+
+    `fn` must be importable (module level) since ranks are spawned. Raises
+    `RankFailure` if any rank raises or dies (e.g. is killed).
+    """
+    ctx = mp.get_context("spawn")
+    slot_bytes = int(slot_mb * 1024 * 1024) // 8 * 8  # Keep chunks dtype-aligned
+    shm = shared_memory.SharedMemory(create=True, size=world_size * slot_bytes)
+    barrier = ctx.Barrier(world_size, timeout=timeout)
+    results = ctx.Queue()
+    mailboxes = {
+        (src, dst): ctx.Queue()
+        for src in range(world_size) for dst in range(world_size) if src != dst
+    }
+
+    processes = [
+        ctx.Process(target=_local_worker, args=(fn, rank, world_size, shm.name, barrier, slot_bytes, mailboxes, results, args))
+        for rank in range(world_size)
+    ]
+    try:
+        for p in processes:
+            p.start()
+        outputs = dict()
+        errors = dict()
+        failed = []
+        deadline = time.time() + timeout
+        while len(outputs) + len(errors) < world_size:
+            try:
+                rank, ok, value = results.get(timeout=0.1)
+            except queue.Empty:
+                # A rank that exited without reporting was killed or crashed hard
+                for rank, p in enumerate(processes):
+                    if rank not in outputs and rank not in errors and p.exitcode not in (None, 0):
+                        errors[rank] = f"exited with code {p.exitcode}"
+                        failed.append(rank)
+                        barrier.abort()
+                if time.time() > deadline:
+                    raise RankFailure("Local distributed run timed out", failed)
+                continue
+            if ok:
+                outputs[rank] = value
+            else:
+                collateral, errors[rank] = value
+                if not collateral:
+                    failed.append(rank)
+        for p in processes:
+            p.join()
+        if errors:
+            message = "\n".join(f"rank {rank}:\n{error}" for rank, error in sorted(errors.items()))
+            raise RankFailure("Local distributed run failed\n" + message, sorted(failed))
+        return [outputs[rank] for rank in range(world_size)]
+    finally:
+        for p in processes:
+            if p.is_alive():
+                p.terminate()
+        shm.close()
+        shm.unlink()
+
+def get_communicator(backend: str = "mlx") -> Communicator:
+    """Create a communicator for the given backend ("mlx" or "mpi")"""
+    if backend == "mlx":
+        return MLXCommunicator()
+    if backend == "mpi":
+        return MPICommunicator()
+    raise ValueError(f"Unknown communicator backend {backend}. Use launch_local() for shared memory")
@@ -0,0 +1,153 @@
+import os
+import subprocess
+from pathlib import Path
+from typing import Any, Callable, List, Optional, Sequence
+from rich.console import Console
+from mlx_train.core.distributed import RankFailure, launch_local
+
+console = Console()
+
+# Set in every rank's environment to the number of restarts so far
+RESTART_ENV = "MLX_TRAIN_ELASTIC_RESTART"
+
+class ElasticSupervisor:
+    """Relaunch a local distributed run on the surviving ranks when one dies
+
+    Single-host only: ranks are `launch_local` processes. Use
+    `MPIElasticSupervisor` for runs spanning several machines.
+    `fn(comm, *args)` should resume from its latest checkpoint on every
+    start (checkpoints are world-size independent, see
+    `DistributedController.save_checkpoint`). When a rank crashes or is
+    killed, the remaining ranks are stopped and the run is restarted with
+    the world shrunk by the number of failed ranks, down to
+    `min_world_size`, at most `max_restarts` times.
+    """
+
+    def __init__(
+        self,
+        fn: Callable,
+        world_size: int,
+        min_world_size: int = 1,
+        max_restarts: int = 3,
+        **launch_kwargs
+    ):
+        self.fn = fn
+        self.world_size = world_size
+        self.min_world_size = min_world_size
+        self.max_restarts = max_restarts
+        self.launch_kwargs = launch_kwargs
+        self.restarts = 0
+        self.history: List[int] = []  # World size of every attempt
+
+    def run(self, *args) -> List[Any]:
+        """Run to completion, shrinking the world after each rank failure"""
+        world_size = self.world_size
+        while True:
+            self.history.append(world_size)
+            os.environ[RESTART_ENV] = str(self.restarts)
+            try:
+                return launch_local(self.fn, world_size, *args, **self.launch_kwargs)
+            except RankFailure as e:
+                survivors = world_size - len(e.failed_ranks)
+                self.restarts += 1
+                if self.restarts > self.max_restarts or survivors < self.min_world_size:
+                    console.print(f"[red]Elastic run failed after {self.restarts} restarts[/red]")
+                    raise
+                console.print(
+                    f"[yellow]Ranks {e.failed_ranks} failed; restarting on {survivors} "
+                    f"rank{'s' if survivors != 1 else ''} (restart {self.restarts}/{self.max_restarts})[/yellow]"
+                )
+                world_size = survivors
+            finally:
+                os.environ.pop(RESTART_ENV, None)
+
+def probe_host(host: str, timeout: float = 5.0) -> bool:
+    """Whether `host` accepts an ssh connection (non-interactive)"""
+    command = ["ssh", "-o", "BatchMode=yes", "-o", f"ConnectTimeout={int(timeout)}", host, "true"]
+    try:
+        return subprocess.run(command, capture_output=True, timeout=timeout + 5).returncode == 0
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+
+class MPIElasticSupervisor:
+    """Relaunch a multi-node `mpirun` job on the hosts that are still reachable
+
+    Runs `command` (e.g. `["python", "train.py"]`) under
+    `mpirun --hostfile` with `slots_per_host` ranks per host. If the job
+    exits non-zero, or runs past `timeout` seconds (a lost node usually
+    stalls the collectives instead of crashing them), every host is probed
+    (over ssh by default). Hosts that don't answer are dropped, the hostfile
+    is rewritten and mpirun re-executed, down to `min_hosts`, at most
+    `max_restarts` times. As with `ElasticSupervisor`, the command should
+    resume from its latest checkpoint; `RESTART_ENV` is exported to every
+    rank.
+    """
+
+    def __init__(
+        self,
+        command: Sequence[str],
+        hosts: Sequence[str],
+        slots_per_host: int = 1,
+        min_hosts: int = 1,
+        max_restarts: int = 3,
+        timeout: Optional[float] = None,
+        hostfile: Path = Path("hostfile.elastic"),
+        launcher: Sequence[str] = ("mpirun",),
+        probe: Callable[[str], bool] = probe_host
+    ):
+        self.command = list(command)
+        self.hosts = list(hosts)
+        self.slots_per_host = slots_per_host
+        self.min_hosts = min_hosts
+        self.max_restarts = max_restarts
+        self.timeout = timeout
+        self.hostfile = Path(hostfile)
+        self.launcher = list(launcher)
+        self.probe = probe
+        self.restarts = 0
+        self.history: List[List[str]] = []  # Hosts of every attempt
+
+    def write_hostfile(self, hosts: Sequence[str]) -> Path:
+        """Write an MPI hostfile for `hosts`"""
+        self.hostfile.write_text("\n".join(f"{host} slots={self.slots_per_host}" for host in hosts) + "\n")
+        return self.hostfile
+
+    def mpirun_command(self, hosts: Sequence[str]) -> List[str]:
+        return [
+            *self.launcher,
+            "--hostfile", str(self.write_hostfile(hosts)),
+            "-np", str(len(hosts) * self.slots_per_host),
+            "-x", RESTART_ENV,
+            *self.command
+        ]
+
+    def run(self) -> List[str]:
+        """Run to completion and return the hosts of the final attempt"""
+        hosts = list(self.hosts)
+        while True:
+            self.history.append(list(hosts))
+            env = {**os.environ, RESTART_ENV: str(self.restarts)}
+            try:
+                returncode = subprocess.run(self.mpirun_command(hosts), env=env, timeout=self.timeout).returncode
+            except subprocess.TimeoutExpired:
+                returncode = None
+            if returncode == 0:
+                return hosts
+
+            alive = [host for host in hosts if self.probe(host)]
+            lost = [host for host in hosts if host not in alive]
+            failed_ranks = [
+                index * self.slots_per_host + slot
+                for index, host in enumerate(hosts) if host in lost
+                for slot in range(self.slots_per_host)
+            ]
+            reason = "timed out" if returncode is None else f"exited with {returncode}"
+            self.restarts += 1
+            if self.restarts > self.max_restarts or len(alive) < self.min_hosts:
+                console.print(f"[red]Elastic run failed after {self.restarts} restarts[/red]")
+                raise RankFailure(f"mpirun {reason}; unreachable hosts: {lost}", failed_ranks)
+            console.print(
+                f"[yellow]mpirun {reason}; {f'dropping {lost}, ' if lost else ''}restarting on "
+                f"{len(alive)} host{'s' if len(alive) != 1 else ''} (restart {self.restarts}/{self.max_restarts})[/yellow]"
+            )
+            hosts = alive
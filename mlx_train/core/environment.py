@@ -6,7 +6,9 @@ class EnvironmentManager:
     def setup_distributed(self, config):
         """Setup MLX distributed environment"""
         os.environ["MLX_DISTRIBUTED"] = "1"
-        os.environ["OMPI_MCA_btl_tcp_links"] = "4"
+        # Parallel TCP links per peer; tune with `mlx-train bench comm --btl-tcp-links N`
+        links = config.get("btl_tcp_links", 4) if isinstance(config, dict) else getattr(config, "btl_tcp_links", 4)
+        os.environ.setdefault("OMPI_MCA_btl_tcp_links", str(links))
         return mx.distributed.init() 
 
     def setup_dependencies(self):
@@ -1,17 +1,43 @@
 import mlx.core as mx
+from mlx.utils import tree_flatten
 import torch
 from pathlib import Path
 from typing import Optional
+from mlx_train.models.architectures.lora import load_adapter, merge_adapter_weights
+from mlx_train.training.checkpoint import read_checkpoint
 
-def export_mlx(checkpoint: Path, output_dir: Path, quantize: Optional[bool] = False):
-    """Export model to MLX format"""
-    # Load checkpoint
-    state_dict = torch.load(checkpoint, map_location="cpu")
+def export_mlx(
+    checkpoint: Path,
+    output_dir: Path,
+    quantize: Optional[bool] = False,
+    adapter_path: Optional[Path] = None,
+    lora_scale: Optional[float] = None
+):
+    """Export model to MLX format, merging LoRA adapters into the base weights
+
+    `checkpoint` is a torch state dict or a checkpoint directory written by
+    `DistributedController.save_checkpoint`. The adapter scale comes from the
+    adapter file, else `lora_scale`, else the `lora_scale` saved with the
+    checkpoint.
+    """
+    if checkpoint.is_dir():
+        model_state, _, manifest = read_checkpoint(checkpoint)
+        mlx_state = dict(tree_flatten(model_state))
+        saved_scale = manifest.get("lora_scale")
+    else:
+        state_dict = torch.load(checkpoint, map_location="cpu")
+        saved_scale = state_dict.pop("lora_scale", None)
+        # Convert to MLX format
+        mlx_state = {
+            k: mx.array(v.numpy()) for k, v in state_dict.items()
+        }
     
-    # Convert to MLX format
-    mlx_state = {
-        k: mx.array(v.numpy()) for k, v in state_dict.items()
-    }
+    # Merge adapters (from a separate file or embedded in the checkpoint)
+    if adapter_path:
+        adapters, scale = load_adapter(adapter_path)
+    else:
+        adapters, scale = None, lora_scale if lora_scale is not None else saved_scale
+    mlx_state = merge_adapter_weights(mlx_state, adapters, scale)
     
     # Apply quantization if requested
     if quantize:
@@ -1,16 +1,86 @@
 import mlx.core as mx
 from dataclasses import dataclass
-from typing import List
+from typing import List, Optional
 from .discovery import DeviceInfo, DeviceDiscovery
 
+# Approximate FP32 TFLOPS per chip
+DEVICE_TFLOPS = {
+    # M4 Family 
+    "M4": 11.0,  
+    "M4 Pro": 19.0,  
+    "M4 Max": 40.0,  
+    
+    # M3 Family
+    "M3": 16.5,
+    "M3 Pro": 20.0,
+    "M3 Max": 40.0,
+    
+    # M2 Family
+    "M2": 15.8,
+    "M2 Pro": 19.0,
+    "M2 Max": 23.0,
+    "M2 Ultra": 46.0,
+    
+    # M1 Family
+    "M1": 11.0,
+    "M1 Pro": 11.0,
+    "M1 Max": 16.0,
+    "M1 Ultra": 32.0,
+    
+    "Apple Silicon": 14.2  # Default fallback
+}
+
+# Memory bandwidth in GB/s per chip
+DEVICE_BANDWIDTH = {
+    # M4 Family
+    "M4": 120,      
+    "M4 Pro": 273,  
+    "M4 Max": 546,  
+    
+    # M3 Family
+    "M3": 100,
+    "M3 Pro": 200,
+    "M3 Max": 400,
+    
+    # M2 Family
+    "M2": 100,
+    "M2 Pro": 200,
+    "M2 Max": 400,
+    "M2 Ultra": 800,
+    
+    # M1 Family
+    "M1": 68.25,
+    "M1 Pro": 200,
+    "M1 Max": 400,
+    "M1 Ultra": 800,
+    
+    "Apple Silicon": 100  # Default fallback
+}
+
 @dataclass
 class HardwareConfig:
-    def __init__(self):
-        """Initialize hardware config"""
-        self.num_devices = 1  # Default to single device
-        self.total_memory_gb = self._get_total_memory()
+    def __init__(
+        self,
+        num_devices: int = 1,
+        device_type: Optional[str] = None,
+        memory_gb: Optional[float] = None,
+        btl_tcp_links: int = 4
+    ):
+        """Initialize hardware config
+
+        `device_type` and `memory_gb` describe a (possibly remote) node; they
+        are detected on the local machine when omitted.
+        """
+        self.num_devices = num_devices
+        self.device_type = device_type or self._detect_device_type()
+        self.total_memory_gb = memory_gb if memory_gb is not None else self._get_total_memory()
         self.total_tflops = self._calculate_tflops()
-        self.device_type = self._detect_device_type()
+        self.btl_tcp_links = btl_tcp_links
+        
+    @classmethod
+    def from_device(cls, device: DeviceInfo) -> "HardwareConfig":
+        """Hardware config of a discovered device"""
+        return cls(device_type=device.device_type, memory_gb=device.memory_gb)
         
     def _get_total_memory(self):
         """Get total available memory in GB"""
@@ -68,61 +138,11 @@ class HardwareConfig:
     def _calculate_tflops(self):
         """Calculate approximate TFLOPS based on device type"""
         
-        device_tflops = {
-            # M4 Family 
-            "M4": 11.0,  
-            "M4 Pro": 19.0,  
-            "M4 Max": 40.0,  
-            
-            # M3 Family
-            "M3": 16.5,
-            "M3 Pro": 20.0,
-            "M3 Max": 40.0,
-            
-            # M2 Family
-            "M2": 15.8,
-            "M2 Pro": 19.0,
-            "M2 Max": 23.0,
-            "M2 Ultra": 46.0,
-            
-            # M1 Family
-            "M1": 11.0,
-            "M1 Pro": 11.0,
-            "M1 Max": 16.0,
-            "M1 Ultra": 32.0,
-            
-            "Apple Silicon": 14.2  # Default fallback
-        }
-        return device_tflops.get(self._detect_device_type(), 14.2)
+        return DEVICE_TFLOPS.get(self.device_type, DEVICE_TFLOPS["Apple Silicon"])
     
     def get_memory_bandwidth(self):
         """Get memory bandwidth in GB/s"""
-        device_bandwidth = {
-            # M4 Family
-            "M4": 120,      
-            "M4 Pro": 273,  
-            "M4 Max": 546,  
-            
-            # M3 Family
-            "M3": 100,
-            "M3 Pro": 200,
-            "M3 Max": 400,
-            
-            # M2 Family
-            "M2": 100,
-            "M2 Pro": 200,
-            "M2 Max": 400,
-            "M2 Ultra": 800,
-            
-            # M1 Family
-            "M1": 68.25,
-            "M1 Pro": 200,
-            "M1 Max": 400,
-            "M1 Ultra": 800,
-            
-            "Apple Silicon": 100  # Default fallback
-        }
-        return device_bandwidth.get(self._detect_device_type(), 100)
+        return DEVICE_BANDWIDTH.get(self.device_type, DEVICE_BANDWIDTH["Apple Silicon"])
 
 class HardwareManager:
     def __init__(self):
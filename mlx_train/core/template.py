@@ -32,10 +32,11 @@ class ProjectTemplate:
         "distributed": {
             "description": "Multi-device training setup",
             "config": {
-                "model_type": "distributed",
+                "model_type": "transformer",
                 "hidden_size": 2048,
                 "num_layers": 24,
-                "num_heads": 32
+                "num_heads": 32,
+                "fsdp": True  # Shard parameters instead of replicating them
             }
         }
     }
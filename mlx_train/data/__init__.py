@@ -2,8 +2,10 @@
 
 from mlx_train.data.manager import DatasetManager
 from mlx_train.data.preprocessor import DataPreprocessor
+from mlx_train.data.sampler import ResumableSampler
 
 __all__ = [
     "DatasetManager",
-    "DataPreprocessor"
+    "DataPreprocessor",
+    "ResumableSampler"
 ]
@@ -9,6 +9,7 @@ import pandas as pd
 import json
 from pathlib import Path
 from mlx_train.utils.memory import MemoryOptimizer
+from mlx_train.data.sampler import ResumableSampler
 
 console = Console()
 
@@ -109,13 +110,27 @@ class DatasetManager:
         """Load and process Parquet data"""
         return Dataset.from_parquet(str(path))
     
-    def get_dataloader(self, dataset: Dataset) -> Iterator[Tuple[mx.array, mx.array]]:
-        """Create MLX-optimized dataloader"""
+    def get_dataloader(
+        self,
+        dataset: Dataset,
+        sampler: Optional[ResumableSampler] = None
+    ) -> Iterator[Tuple[mx.array, mx.array]]:
+        """Create MLX-optimized dataloader
+
+        With a `sampler` the batches follow its (shuffled, rank-sliced)
+        order and pick up from its cursor, so a restored sampler resumes
+        mid-epoch.
+        """
         def prepare_batch(examples: Dict) -> Tuple[mx.array, mx.array]:
             x = mx.array(examples["input_ids"])
             y = mx.array(examples["labels"])
             return x, y
         
+        if sampler is not None:
+            for indices in sampler:
+                yield prepare_batch(dataset[indices.tolist()])
+            return
+        
         # Calculate optimal batch size with default model size if not provided
         model_size = self.config.get("model_size", self.config["hidden_size"] * self.config["hidden_size"])
         optimal_batch = MemoryOptimizer.optimize_batch_size(
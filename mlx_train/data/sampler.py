@@ -0,0 +1,75 @@
+from typing import Dict, Iterator
+import numpy as np
+
+class ResumableSampler:
+    """Shuffled, rank-aware batch indices with a checkpointable cursor
+
+    Each epoch's order is a permutation seeded by `(seed, epoch)`, so the
+    shuffle is fully described by those two numbers and never has to be
+    stored. The cursor counts samples consumed this epoch across all ranks,
+    which keeps the position valid when resuming on a different world size.
+    Every rank takes its slice of each global batch of
+    `batch_size * world_size` samples.
+    """
+
+    def __init__(
+        self,
+        num_samples: int,
+        batch_size: int,
+        shuffle: bool = True,
+        seed: int = 0,
+        rank: int = 0,
+        world_size: int = 1,
+        drop_last: bool = False
+    ):
+        self.num_samples = num_samples
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.seed = seed
+        self.rank = rank
+        self.world_size = world_size
+        self.drop_last = drop_last
+        self.epoch = 0
+        self.cursor = 0
+
+    @property
+    def global_batch_size(self) -> int:
+        return self.batch_size * self.world_size
+
+    def __len__(self) -> int:
+        """Batches per epoch"""
+        if self.drop_last:
+            return self.num_samples // self.global_batch_size
+        return -(-self.num_samples // self.global_batch_size)
+
+    def order(self, epoch: int) -> np.ndarray:
+        """Sample order of an epoch"""
+        if not self.shuffle:
+            return np.arange(self.num_samples)
+        return np.random.default_rng((self.seed, epoch)).permutation(self.num_samples)
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        """This rank's indices for the rest of the current epoch
+
+        The cursor moves before each batch is handed out, so state saved
+        after a training step points at the next batch. Once the epoch is
+        exhausted the sampler rolls over to the next one.
+        """
+        order = self.order(self.epoch)
+        end = len(self) * self.global_batch_size if self.drop_last else self.num_samples
+        while self.cursor < end:
+            start = self.cursor
+            self.cursor = min(start + self.global_batch_size, end)
+            yield np.array_split(order[start:self.cursor], self.world_size)[self.rank]
+        self.epoch += 1
+        self.cursor = 0
+
+    def state_dict(self) -> Dict:
+        return {"epoch": self.epoch, "cursor": self.cursor, "seed": self.seed, "shuffle": self.shuffle}
+
+    def load_state_dict(self, state: Dict):
+        """Continue from a saved position (world size may differ)"""
+        self.epoch = state["epoch"]
+        self.cursor = state["cursor"]
+        self.seed = state.get("seed", self.seed)
+        self.shuffle = state.get("shuffle", self.shuffle)
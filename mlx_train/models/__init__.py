@@ -1,3 +1,4 @@
 from mlx_train.models.architectures.simple_model import SimpleModel
+from mlx_train.models.architectures.transformer import Transformer
 
-__all__ = ["SimpleModel"]
+__all__ = ["SimpleModel", "Transformer"]
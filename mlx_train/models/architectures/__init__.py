@@ -1,7 +1,41 @@
 from mlx_train.models.architectures.test_model import TestModel
-from mlx_train.models.architectures.lora import LoRALayer
+from mlx_train.models.architectures.transformer import Transformer
+from mlx_train.models.architectures.lora import (
+    LoRALayer,
+    LoRALinear,
+    MultiLoRALinear,
+    apply_lora,
+    merge_lora,
+    adapter_scale,
+    save_adapters,
+    load_multi_adapter,
+    set_adapter_ids
+)
+from mlx_train.models.architectures.tensor_parallel import (
+    ColumnParallelLinear,
+    RowParallelLinear,
+    ShardedAttention,
+    TensorParallelOptimizerState,
+    TensorParallelState,
+    apply_tensor_parallel
+)
 
 __all__ = [
     "TestModel",
-    "LoRALayer"
-] 
\ No newline at end of file
+    "Transformer",
+    "LoRALayer",
+    "LoRALinear",
+    "MultiLoRALinear",
+    "apply_lora",
+    "merge_lora",
+    "adapter_scale",
+    "save_adapters",
+    "load_multi_adapter",
+    "set_adapter_ids",
+    "ColumnParallelLinear",
+    "RowParallelLinear",
+    "ShardedAttention",
+    "TensorParallelOptimizerState",
+    "TensorParallelState",
+    "apply_tensor_parallel"
+] 
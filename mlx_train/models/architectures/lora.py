@@ -1,12 +1,274 @@
+import fnmatch
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
 import mlx.core as mx
 import mlx.nn as nn
+from mlx.utils import tree_flatten, tree_unflatten
 
 class LoRALayer(nn.Module):
-    def __init__(self, in_features, out_features, rank=8):
+    def __init__(self, in_features, out_features, rank=8, alpha=None, dropout=0.0):
         super().__init__()
         self.lora_a = nn.Linear(in_features, rank, bias=False)
         self.lora_b = nn.Linear(rank, out_features, bias=False)
-        self.scale = 1.0
+        # Zero-init B so the adapted model starts identical to the base model
+        self.lora_b.weight = mx.zeros_like(self.lora_b.weight)
+        self.dropout = nn.Dropout(dropout)
+        self.scale = alpha / rank if alpha is not None else 1.0
 
     def __call__(self, x):
-        return self.lora_b(self.lora_a(x)) * self.scale 
\ No newline at end of file
+        return self.lora_b(self.lora_a(self.dropout(x))) * self.scale
+
+class LoRALinear(nn.Module):
+    """Frozen linear layer with a trainable low-rank adapter"""
+
+    def __init__(
+        self,
+        base: nn.Module,
+        rank: int = 8,
+        alpha: Optional[float] = 16.0,
+        dropout: float = 0.0,
+        dtype: Optional[mx.Dtype] = None
+    ):
+        super().__init__()
+        out_features, in_features = base.weight.shape
+        if isinstance(base, nn.QuantizedLinear):
+            # Packed uint32 weights hold 32 // bits values per element
+            in_features = in_features * 32 // base.bits
+        self.base = base
+        self.base.freeze()
+        self.adapter = LoRALayer(in_features, out_features, rank=rank, alpha=alpha, dropout=dropout)
+        if dtype is not None:
+            self.adapter.set_dtype(dtype)
+
+    def __call__(self, x):
+        return self.base(x) + self.adapter(x)
+
+    def delta(self) -> mx.array:
+        """Dense weight update `scale * B @ A` contributed by the adapter"""
+        a = self.adapter.lora_a.weight.astype(mx.float32)
+        b = self.adapter.lora_b.weight.astype(mx.float32)
+        return self.adapter.scale * (b @ a)
+
+    def merged_weight(self) -> mx.array:
+        """Base weight with the adapter folded in (dequantized if needed)"""
+        base = self.base
+        if isinstance(base, nn.QuantizedLinear):
+            weight = mx.dequantize(base.weight, base.scales, base.biases, base.group_size, base.bits)
+        else:
+            weight = base.weight
+        return (weight.astype(mx.float32) + self.delta()).astype(weight.dtype)
+
+    def merge(self) -> nn.Module:
+        """Return a plain (or re-quantized) linear layer with the adapter merged"""
+        out_features, in_features = self.merged_weight().shape
+        has_bias = "bias" in self.base
+        linear = nn.Linear(in_features, out_features, bias=has_bias)
+        linear.weight = self.merged_weight()
+        if has_bias:
+            linear.bias = self.base.bias
+        if isinstance(self.base, nn.QuantizedLinear):
+            return nn.QuantizedLinear.from_linear(linear, self.base.group_size, self.base.bits)
+        return linear
+
+class MultiLoRALinear(nn.Module):
+    """Shared frozen linear layer serving many adapters in one batched pass
+
+    Adapters are stacked into `[num_adapters, rank, in]` / `[num_adapters, out, rank]`
+    tensors (padded to the largest rank). Slot 0 is an all-zero adapter, i.e.
+    the plain base model. `set_adapter_ids` selects the adapter per batch row.
+    """
+
+    def __init__(self, base: nn.Module, adapters: List[Dict[str, mx.array]], scales: List[float]):
+        super().__init__()
+        self.base = base
+        self.base.freeze()
+        max_rank = max(a["lora_a"].shape[0] for a in adapters)
+        in_features = adapters[0]["lora_a"].shape[1]
+        out_features = adapters[0]["lora_b"].shape[0]
+
+        lora_a = [mx.zeros((max_rank, in_features))]
+        lora_b = [mx.zeros((out_features, max_rank))]
+        for adapter in adapters:
+            pad = max_rank - adapter["lora_a"].shape[0]
+            lora_a.append(mx.pad(adapter["lora_a"], [(0, pad), (0, 0)]))
+            lora_b.append(mx.pad(adapter["lora_b"], [(0, 0), (0, pad)]))
+        self.lora_a = mx.stack(lora_a)
+        self.lora_b = mx.stack(lora_b)
+        self.scales = mx.array([0.0] + list(scales))
+        self._adapter_ids = None
+        self.freeze()
+
+    def __call__(self, x):
+        y = self.base(x)
+        if self._adapter_ids is None:
+            return y
+        # Gather one adapter per batch row and apply it with batched matmuls
+        a = mx.take(self.lora_a, self._adapter_ids, axis=0)
+        b = mx.take(self.lora_b, self._adapter_ids, axis=0)
+        scales = mx.take(self.scales, self._adapter_ids, axis=0)
+        h = x.reshape(x.shape[0], -1, x.shape[-1])
+        h = (h @ a.swapaxes(1, 2)) @ b.swapaxes(1, 2)
+        h = h * scales[:, None, None]
+        return y + h.reshape(y.shape).astype(y.dtype)
+
+def _matches(name: str, patterns: Sequence[str]) -> bool:
+    """Check a module name against glob-style patterns"""
+    return any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns)
+
+def apply_lora(
+    model: nn.Module,
+    target_modules: Sequence[str] = ("*",),
+    rank: int = 8,
+    alpha: Optional[float] = 16.0,
+    dropout: float = 0.0,
+    dtype: Optional[mx.Dtype] = None
+) -> List[str]:
+    """Freeze the model and wrap matching linear layers with LoRA adapters
+
+    Returns the names of the wrapped modules. After this only adapter
+    weights are trainable, so `nn.value_and_grad`, the optimizer state and
+    gradient all-reduce all cover the adapters alone. Quantized linears are
+    wrapped the same way (QLoRA), with adapters kept in `dtype`.
+    """
+    model.freeze()
+
+    wrapped = []
+    for name, module in model.named_modules():
+        if not isinstance(module, (nn.Linear, nn.QuantizedLinear)) or not _matches(name, target_modules):
+            continue
+        # Skip layers that are already the frozen base of an adapter
+        if name.endswith(".base") or ".adapter." in name:
+            continue
+        wrapped.append((name, LoRALinear(module, rank=rank, alpha=alpha, dropout=dropout, dtype=dtype)))
+
+    if not wrapped:
+        raise ValueError(f"No linear layers match LoRA targets {list(target_modules)}")
+
+    model.update_modules(tree_unflatten(wrapped))
+    return sorted(name for name, _ in wrapped)
+
+def merge_lora(model: nn.Module) -> List[str]:
+    """Fold all LoRA adapters into their base weights for zero-overhead inference"""
+    merged = [
+        (name, module.merge())
+        for name, module in model.named_modules()
+        if isinstance(module, LoRALinear)
+    ]
+    if merged:
+        model.update_modules(tree_unflatten(merged))
+    return sorted(name for name, _ in merged)
+
+def merged_weights(model: nn.Module) -> Dict[str, mx.array]:
+    """Flat parameter dict in the base layout with adapters folded in
+
+    Unlike `merge_lora` this leaves the model (and its adapters) untouched.
+    """
+    weights = dict(tree_flatten(model.parameters()))
+    for name, module in model.named_modules():
+        if not isinstance(module, LoRALinear):
+            continue
+        weights = {k: v for k, v in weights.items() if not k.startswith(f"{name}.")}
+        weights[f"{name}.weight"] = module.merged_weight()
+        if "bias" in module.base:
+            weights[f"{name}.bias"] = module.base.bias
+    return weights
+
+def adapter_scale(model: nn.Module) -> Optional[float]:
+    """The `alpha / rank` scale shared by the model's adapters, None without LoRA"""
+    scales = {module.adapter.scale for _, module in model.named_modules() if isinstance(module, LoRALinear)}
+    if len(scales) > 1:
+        raise ValueError(f"Adapters use different scales {sorted(scales)}")
+    return scales.pop() if scales else None
+
+def save_adapters(model: nn.Module, path: Path):
+    """Save only the adapter weights (and their scale) to safetensors"""
+    weights = {}
+    for name, module in model.named_modules():
+        if isinstance(module, LoRALinear):
+            weights[f"{name}.lora_a"] = module.adapter.lora_a.weight
+            weights[f"{name}.lora_b"] = module.adapter.lora_b.weight
+    scale = adapter_scale(model)
+    mx.save_safetensors(str(path), weights, metadata={"scale": str(scale if scale is not None else 1.0)})
+
+def load_adapter(path: Path):
+    """Load an adapter file written by `save_adapters`"""
+    weights, metadata = mx.load(str(path), return_metadata=True)
+    return weights, float(metadata.get("scale", 1.0))
+
+def merge_adapter_weights(
+    state: Dict[str, mx.array],
+    adapters: Optional[Dict[str, mx.array]] = None,
+    scale: Optional[float] = None
+) -> Dict[str, mx.array]:
+    """Merge adapters into a flat state dict
+
+    Adapters are taken from `adapters` (`<layer>.lora_a` / `<layer>.lora_b`,
+    as written by `save_adapters`) or, for checkpoints of a LoRA model, from
+    the `<layer>.adapter.*` / `<layer>.base.*` entries in `state` itself.
+    `scale` is the adapters' `alpha / rank` and is required when there is
+    anything to merge. Quantized base layers are dequantized, so merged
+    layers come out as plain weights.
+    """
+    state = dict(state)
+    adapters = dict(adapters or {})
+
+    # Pull in-checkpoint adapters and restore the base layout
+    for key in [k for k in state if ".adapter.lora_a." in k]:
+        layer = key.split(".adapter.")[0]
+        adapters[f"{layer}.lora_a"] = state.pop(key)
+        adapters[f"{layer}.lora_b"] = state.pop(f"{layer}.adapter.lora_b.weight")
+    for key in [k for k in state if ".base." in k]:
+        state[key.replace(".base.", ".")] = state.pop(key)
+
+    layers = [k[:-len(".lora_a")] for k in adapters if k.endswith(".lora_a")]
+    if layers and scale is None:
+        raise ValueError("Merging LoRA adapters needs their scale (alpha / rank)")
+    for layer in layers:
+        key = f"{layer}.lora_a"
+        weight = state[f"{layer}.weight"]
+        if f"{layer}.scales" in state:
+            # Packed QuantizedLinear weight: recover bits and group size from the shapes
+            in_features = adapters[key].shape[1]
+            scales = state.pop(f"{layer}.scales")
+            bits = weight.shape[1] * 32 // in_features
+            group_size = in_features // scales.shape[1]
+            weight = mx.dequantize(weight, scales, state.pop(f"{layer}.biases"), group_size, bits)
+        delta = scale * (adapters[f"{layer}.lora_b"].astype(mx.float32) @ adapters[key].astype(mx.float32))
+        state[f"{layer}.weight"] = (weight.astype(mx.float32) + delta).astype(weight.dtype)
+    return state
+
+def load_multi_adapter(model: nn.Module, adapter_paths: Dict[str, Path]) -> Dict[str, int]:
+    """Attach many adapters over one shared base for batched serving
+
+    Returns the adapter-name to slot mapping used with `set_adapter_ids`.
+    Slot 0 is reserved for the plain base model.
+    """
+    loaded = {name: load_adapter(path) for name, path in adapter_paths.items()}
+    names = sorted(loaded)
+    layers = sorted({k[:-len(".lora_a")] for weights, _ in loaded.values() for k in weights if k.endswith(".lora_a")})
+    modules = dict(model.named_modules())
+
+    replacements = []
+    for layer in layers:
+        base = modules[layer]
+        out_features, in_features = base.weight.shape
+        if isinstance(base, nn.QuantizedLinear):
+            in_features = in_features * 32 // base.bits
+        adapters = []
+        for name in names:
+            weights, _ = loaded[name]
+            # Adapters that skip this layer get an empty rank-1 slot
+            adapters.append({
+                "lora_a": weights.get(f"{layer}.lora_a", mx.zeros((1, in_features))),
+                "lora_b": weights.get(f"{layer}.lora_b", mx.zeros((out_features, 1)))
+            })
+        replacements.append((layer, MultiLoRALinear(base, adapters, [loaded[n][1] for n in names])))
+
+    model.update_modules(tree_unflatten(replacements))
+    return {name: slot + 1 for slot, name in enumerate(names)}
+
+def set_adapter_ids(model: nn.Module, adapter_ids: Optional[mx.array]):
+    """Select the adapter slot for each row of the next batched forward pass"""
+    for _, module in model.named_modules():
+        if isinstance(module, MultiLoRALinear):
+            module._adapter_ids = adapter_ids
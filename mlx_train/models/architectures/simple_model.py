@@ -5,6 +5,7 @@ import numpy as np
 from pathlib import Path
 from mlx_train.models.base import BaseModel
 from mlx_train.models.registry import ModelRegistry
+from mlx_train.models.architectures.lora import merged_weights
 
 @ModelRegistry.register("simple")
 class SimpleModel(BaseModel):
@@ -42,8 +43,19 @@ class SimpleModel(BaseModel):
         x = self.linear2(x)
         return x
         
+    def stages(self):
+        return [nn.Sequential(self.linear1, self.act_fn, self.dropout), self.linear2]
+        
     def loss_fn(self, output, target):
         return mx.mean((output - target) ** 2)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            config["hidden_size"],
+            activation=config.get("activation", "relu"),
+            dropout=config.get("dropout", 0.1)
+        )
         
     def export(self, path: Path, format: str = "mlx"):
         """Export model weights and config"""
@@ -59,22 +71,16 @@ class SimpleModel(BaseModel):
             json.dump(config, f)
             
         if format == "mlx":
-            # Export linear1 parameters
-            linear1_params = self.linear1.parameters()
-            linear2_params = self.linear2.parameters()
+            # Fold any LoRA adapters into the base weights for zero-overhead inference
+            params = merged_weights(self)
             
             # Evaluate all parameters first
-            mx.eval(linear1_params["weight"])
-            mx.eval(linear1_params["bias"])
-            mx.eval(linear2_params["weight"])
-            mx.eval(linear2_params["bias"])
+            mx.eval(params)
             
             # Convert to numpy arrays directly
             weights_dict = {
-                "linear1.weight": np.array(linear1_params["weight"]),
-                "linear1.bias": np.array(linear1_params["bias"]),
-                "linear2.weight": np.array(linear2_params["weight"]),
-                "linear2.bias": np.array(linear2_params["bias"])
+                name: np.array(params[name])
+                for name in ["linear1.weight", "linear1.bias", "linear2.weight", "linear2.bias"]
             }
             
             # Save weights using numpy's savez
@@ -0,0 +1,316 @@
+import math
+from typing import Dict, List, Optional, Sequence
+import mlx.core as mx
+import mlx.nn as nn
+from mlx.utils import tree_flatten, tree_unflatten
+from mlx_train.core.distributed import Communicator
+from mlx_train.models.architectures.lora import _matches
+
+class _ParallelOps:
+    """Differentiable collectives for tensor parallelism (Megatron's f / g)
+
+    - `copy`: identity forward, all-reduce of the gradient in backward
+    - `reduce`: all-reduce forward, identity backward
+    - `gather`: all-gather on the last axis forward, own slice backward
+    """
+
+    def __init__(self, comm: Communicator):
+        self.comm = comm
+
+        @mx.custom_function
+        def copy(x):
+            return x
+
+        @copy.vjp
+        def copy_vjp(primals, cotangent, output):
+            return comm.all_reduce(cotangent)
+
+        @mx.custom_function
+        def reduce(x):
+            return comm.all_reduce(x)
+
+        @reduce.vjp
+        def reduce_vjp(primals, cotangent, output):
+            return cotangent
+
+        @mx.custom_function
+        def gather(x):
+            return mx.moveaxis(comm.all_gather(mx.moveaxis(x, -1, 0)), 0, -1)
+
+        @gather.vjp
+        def gather_vjp(primals, cotangent, output):
+            chunk = primals[0].shape[-1]
+            return cotangent[..., comm.rank * chunk:(comm.rank + 1) * chunk]
+
+        self.copy, self.reduce, self.gather = copy, reduce, gather
+
+def _shard(x: mx.array, comm: Communicator, axis: int) -> mx.array:
+    """This rank's contiguous slice of `x` along `axis`"""
+    if x.shape[axis] % comm.size:
+        raise ValueError(f"Dimension {x.shape[axis]} is not divisible by tensor-parallel size {comm.size}")
+    chunk = x.shape[axis] // comm.size
+    index = [slice(None)] * x.ndim
+    index[axis] = slice(comm.rank * chunk, (comm.rank + 1) * chunk)
+    return mx.array(x[tuple(index)])
+
+class ColumnParallelLinear(nn.Module):
+    """Linear layer whose output features are split across ranks
+
+    Each rank holds `out_features / world_size` rows of the weight. The
+    output stays sharded (feed it to a `RowParallelLinear`) unless
+    `gather_output` is set. With `copy_input=False` the layer skips its own
+    `copy` op, for inputs that already went through one shared with sibling
+    layers (see `apply_tensor_parallel`'s `shared_input`).
+    """
+
+    def __init__(
+        self,
+        in_features: int,
+        out_features: int,
+        comm: Communicator,
+        bias: bool = True,
+        gather_output: bool = False,
+        copy_input: bool = True
+    ):
+        super().__init__()
+        linear = nn.Linear(in_features, out_features // comm.size, bias=bias)
+        self.weight = linear.weight
+        if bias:
+            self.bias = linear.bias
+        self.gather_output = gather_output
+        self.copy_input = copy_input
+        self._ops = _ParallelOps(comm)
+
+    @classmethod
+    def from_linear(
+        cls,
+        linear: nn.Linear,
+        comm: Communicator,
+        gather_output: bool = False,
+        copy_input: bool = True
+    ) -> "ColumnParallelLinear":
+        out_features, in_features = linear.weight.shape
+        layer = cls(
+            in_features, out_features, comm, bias="bias" in linear,
+            gather_output=gather_output, copy_input=copy_input
+        )
+        layer.weight = _shard(linear.weight, comm, axis=0)
+        if "bias" in linear:
+            layer.bias = _shard(linear.bias, comm, axis=0)
+        return layer
+
+    def __call__(self, x):
+        if self.copy_input:
+            x = self._ops.copy(x)
+        y = x @ self.weight.T
+        if "bias" in self:
+            y = y + self.bias
+        return self._ops.gather(y) if self.gather_output else y
+
+class RowParallelLinear(nn.Module):
+    """Linear layer whose input features are split across ranks
+
+    Expects an input already sharded on its last axis (e.g. the output of
+    a `ColumnParallelLinear`); partial products are summed with one
+    all-reduce and the (replicated) bias is added afterwards.
+    """
+
+    def __init__(self, in_features: int, out_features: int, comm: Communicator, bias: bool = True):
+        super().__init__()
+        linear = nn.Linear(in_features // comm.size, out_features, bias=bias)
+        self.weight = linear.weight
+        if bias:
+            self.bias = linear.bias
+        self._ops = _ParallelOps(comm)
+
+    @classmethod
+    def from_linear(cls, linear: nn.Linear, comm: Communicator) -> "RowParallelLinear":
+        out_features, in_features = linear.weight.shape
+        layer = cls(in_features, out_features, comm, bias="bias" in linear)
+        layer.weight = _shard(linear.weight, comm, axis=1)
+        if "bias" in linear:
+            layer.bias = linear.bias
+        return layer
+
+    def __call__(self, x):
+        y = self._ops.reduce(x @ self.weight.T)
+        if "bias" in self:
+            y = y + self.bias
+        return y
+
+class ShardedAttention(nn.Module):
+    """Multi-head attention with heads split across ranks
+
+    Query/key/value projections are column-parallel (each rank computes
+    `num_heads / world_size` heads end to end) and the output projection is
+    row-parallel, so a forward pass costs a single all-reduce.
+    """
+
+    def __init__(self, dims: int, num_heads: int, comm: Communicator, bias: bool = False):
+        super().__init__()
+        if num_heads % comm.size:
+            raise ValueError(f"{num_heads} heads can't be split across {comm.size} ranks")
+        self.num_heads = num_heads // comm.size
+        self.query_proj = ColumnParallelLinear(dims, dims, comm, bias=bias)
+        self.key_proj = ColumnParallelLinear(dims, dims, comm, bias=bias)
+        self.value_proj = ColumnParallelLinear(dims, dims, comm, bias=bias)
+        self.out_proj = RowParallelLinear(dims, dims, comm, bias=bias)
+
+    @classmethod
+    def from_attention(cls, attention: nn.MultiHeadAttention, comm: Communicator) -> "ShardedAttention":
+        dims = attention.query_proj.weight.shape[0]
+        layer = cls(dims, attention.num_heads, comm, bias="bias" in attention.query_proj)
+        layer.query_proj = ColumnParallelLinear.from_linear(attention.query_proj, comm)
+        layer.key_proj = ColumnParallelLinear.from_linear(attention.key_proj, comm)
+        layer.value_proj = ColumnParallelLinear.from_linear(attention.value_proj, comm)
+        layer.out_proj = RowParallelLinear.from_linear(attention.out_proj, comm)
+        return layer
+
+    def __call__(self, queries, keys, values, mask=None):
+        queries = self.query_proj(queries)
+        keys = self.key_proj(keys)
+        values = self.value_proj(values)
+
+        queries = mx.unflatten(queries, -1, (self.num_heads, -1)).transpose(0, 2, 1, 3)
+        keys = mx.unflatten(keys, -1, (self.num_heads, -1)).transpose(0, 2, 1, 3)
+        values = mx.unflatten(values, -1, (self.num_heads, -1)).transpose(0, 2, 1, 3)
+        scale = math.sqrt(1 / queries.shape[-1])
+        output = mx.fast.scaled_dot_product_attention(queries, keys, values, scale=scale, mask=mask)
+        output = output.transpose(0, 2, 1, 3).flatten(-2, -1)
+        return self.out_proj(output)
+
+def apply_tensor_parallel(
+    model: nn.Module,
+    comm: Communicator,
+    column: Sequence[str] = (),
+    row: Sequence[str] = (),
+    attention: Sequence[str] = (),
+    shared_input: Sequence[str] = ()
+) -> Dict[str, List[str]]:
+    """Replace matching modules with tensor-parallel versions in place
+
+    `column` and `row` are glob patterns for `nn.Linear` layers; pair them
+    (e.g. an MLP's up and down projection) so activations stay sharded in
+    between. `attention` patterns match `nn.MultiHeadAttention` modules.
+    `shared_input` patterns match modules whose column-parallel children all
+    read the module's input (Q/K/V, or gate/up): those children skip their
+    own `copy` and the module's `parallel_input` applies a single one, so the
+    input gradient is all-reduced once instead of once per layer. Parents of
+    sharded layers that declare `num_heads` / `num_kv_heads` must have head
+    counts divisible by the world size. Returns the names of the replaced
+    modules per kind.
+    """
+    modules = dict(model.named_modules())
+    shared = {name for name in modules if _matches(name, shared_input)}
+    replaced = {"column": [], "row": [], "attention": []}
+    replacements = []
+    for name, module in modules.items():
+        parent = name.rpartition(".")[0]
+        if isinstance(module, nn.MultiHeadAttention) and _matches(name, attention):
+            replacements.append((name, ShardedAttention.from_attention(module, comm)))
+            replaced["attention"].append(name)
+        elif isinstance(module, nn.Linear) and _matches(name, column):
+            replacements.append((name, ColumnParallelLinear.from_linear(module, comm, copy_input=parent not in shared)))
+            replaced["column"].append(name)
+        elif isinstance(module, nn.Linear) and _matches(name, row):
+            replacements.append((name, RowParallelLinear.from_linear(module, comm)))
+            replaced["row"].append(name)
+
+    # Layers inside a sharded attention block are handled by it
+    attention_prefixes = tuple(f"{name}." for name in replaced["attention"])
+    replacements = [(n, m) for n, m in replacements if not n.startswith(attention_prefixes)]
+    for kind in ("column", "row"):
+        replaced[kind] = sorted(n for n in replaced[kind] if not n.startswith(attention_prefixes))
+
+    # Splitting a head across ranks would silently mix heads
+    for parent in sorted({n.rpartition(".")[0] for n in replaced["column"] + replaced["row"]}):
+        for attr in ("num_heads", "num_kv_heads"):
+            heads = getattr(modules.get(parent), attr, None)
+            if isinstance(heads, int) and heads % comm.size:
+                raise ValueError(f"{parent}: {attr}={heads} can't be split across {comm.size} tensor-parallel ranks")
+
+    for name in sorted(shared):
+        if any(n.rpartition(".")[0] == name for n in replaced["column"]):
+            modules[name].parallel_input = _ParallelOps(comm).copy
+
+    if replacements:
+        model.update_modules(tree_unflatten(replacements))
+    return replaced
+
+class TensorParallelState:
+    """Full-tensor view of a tensor-parallel model, for synchronizing and checkpointing it
+
+    `parameters` all-gathers every rank's shards of the column- and
+    row-parallel layers into full tensors (replicated ones pass through), so
+    checkpoints match an unsharded model's. `update` slices full tensors
+    back onto this rank. Collective: every rank must call `parameters`.
+    """
+
+    def __init__(self, model: nn.Module, comm: Communicator):
+        self.model = model
+        self.comm = comm
+        # Sharded axis of every tensor-parallel parameter
+        self.axes: Dict[str, int] = {}
+        for name, module in model.named_modules():
+            prefix = f"{name}." if name else ""
+            if isinstance(module, ColumnParallelLinear):
+                self.axes.update({f"{prefix}{key}": 0 for key in ("weight", "bias") if key in module})
+            elif isinstance(module, RowParallelLinear):
+                self.axes[f"{prefix}weight"] = 1
+
+    def _axis(self, name: str) -> Optional[int]:
+        """Sharded axis of a parameter, or of an optimizer field such as `<param>.m`"""
+        if name in self.axes:
+            return self.axes[name]
+        return self.axes.get(name.rpartition(".")[0])
+
+    def gather(self, tree: Dict) -> Dict:
+        """Full tensors from a tree of shards (parameters or optimizer state)"""
+        flat = []
+        for name, value in tree_flatten(tree):
+            axis = self._axis(name)
+            if axis is not None and isinstance(value, mx.array):
+                value = mx.moveaxis(self.comm.all_gather(mx.moveaxis(value, axis, 0)), 0, axis)
+            flat.append((name, value))
+        return tree_unflatten(flat)
+
+    def shard(self, tree: Dict) -> Dict:
+        """This rank's shards of a tree of full tensors"""
+        flat = []
+        for name, value in tree_flatten(tree):
+            axis = self._axis(name)
+            if axis is not None and isinstance(value, mx.array):
+                value = _shard(value, self.comm, axis)
+            flat.append((name, value))
+        return tree_unflatten(flat)
+
+    def parameters(self) -> Dict:
+        return self.gather(self.model.parameters())
+
+    def update(self, parameters: Dict):
+        self.model.update(self.shard(parameters))
+
+class TensorParallelOptimizerState:
+    """Checkpoint view of the optimizer of a tensor-parallel model
+
+    Gathers the sharded state like `TensorParallelState.parameters` and
+    slices it back on load; pass it with the `TensorParallelState` to
+    `DistributedController`.
+    """
+
+    def __init__(self, tensor_parallel: TensorParallelState, optimizer):
+        self.tensor_parallel = tensor_parallel
+        self.optimizer = optimizer
+
+    @property
+    def state(self) -> Dict:
+        return self.state_dict()
+
+    def state_dict(self) -> Dict:
+        return self.tensor_parallel.gather(self.optimizer.state)
+
+    def load_state_dict(self, model, state: Dict):
+        self.optimizer.state.update(self.tensor_parallel.shard(state))
+
+    def load_sharded(self, model, reader):
+        self.load_state_dict(model, reader.read_tree("optimizer"))
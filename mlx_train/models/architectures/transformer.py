@@ -0,0 +1,196 @@
+import math
+from typing import Dict, List, Optional
+import mlx.core as mx
+import mlx.nn as nn
+from mlx_train.models.base import BaseModel
+from mlx_train.models.registry import ModelRegistry
+
+class Attention(nn.Module):
+    """Causal self-attention with grouped-query heads and rotary embeddings
+
+    `num_kv_heads` key/value heads are shared by groups of query heads
+    (`num_kv_heads == num_heads` is plain multi-head attention, 1 is
+    multi-query). RoPE and attention run as fused `mx.fast` kernels, and
+    K/V are never tiled to the query head count. Head counts are read from
+    the projection widths at call time, so column-sharded projections
+    (tensor parallelism) work unchanged.
+    """
+
+    def __init__(self, dims: int, num_heads: int, num_kv_heads: int, rope_theta: float = 10000.0):
+        super().__init__()
+        if dims % num_heads:
+            raise ValueError(f"hidden_size {dims} is not divisible by {num_heads} heads")
+        if num_heads % num_kv_heads:
+            raise ValueError(f"{num_heads} query heads can't be grouped over {num_kv_heads} KV heads")
+        self.num_heads = num_heads
+        self.num_kv_heads = num_kv_heads
+        self.head_dim = dims // num_heads
+        self.rope_theta = rope_theta
+        self.q_proj = nn.Linear(dims, num_heads * self.head_dim, bias=False)
+        self.k_proj = nn.Linear(dims, num_kv_heads * self.head_dim, bias=False)
+        self.v_proj = nn.Linear(dims, num_kv_heads * self.head_dim, bias=False)
+        self.o_proj = nn.Linear(num_heads * self.head_dim, dims, bias=False)
+
+    def parallel_input(self, x):
+        """Identity; tensor parallelism swaps in one `copy` op shared by Q/K/V"""
+        return x
+
+    def __call__(self, x, mask="causal"):
+        x = self.parallel_input(x)
+        queries, keys, values = self.q_proj(x), self.k_proj(x), self.v_proj(x)
+        queries = mx.unflatten(queries, -1, (-1, self.head_dim)).transpose(0, 2, 1, 3)
+        keys = mx.unflatten(keys, -1, (-1, self.head_dim)).transpose(0, 2, 1, 3)
+        values = mx.unflatten(values, -1, (-1, self.head_dim)).transpose(0, 2, 1, 3)
+
+        rope = dict(traditional=False, base=self.rope_theta, scale=1.0, offset=0)
+        queries = mx.fast.rope(queries, self.head_dim, **rope)
+        keys = mx.fast.rope(keys, self.head_dim, **rope)
+        output = mx.fast.scaled_dot_product_attention(
+            queries, keys, values, scale=1 / math.sqrt(self.head_dim), mask=mask
+        )
+        return self.o_proj(output.transpose(0, 2, 1, 3).flatten(-2, -1))
+
+class FeedForward(nn.Module):
+    """SwiGLU MLP"""
+
+    def __init__(self, dims: int, hidden_dims: int):
+        super().__init__()
+        self.gate_proj = nn.Linear(dims, hidden_dims, bias=False)
+        self.up_proj = nn.Linear(dims, hidden_dims, bias=False)
+        self.down_proj = nn.Linear(hidden_dims, dims, bias=False)
+
+    def parallel_input(self, x):
+        """Identity; tensor parallelism swaps in one `copy` op shared by gate/up"""
+        return x
+
+    def __call__(self, x):
+        x = self.parallel_input(x)
+        return self.down_proj(nn.silu(self.gate_proj(x)) * self.up_proj(x))
+
+class TransformerBlock(nn.Module):
+    """Pre-norm attention and MLP with residual connections"""
+
+    def __init__(
+        self,
+        dims: int,
+        num_heads: int,
+        num_kv_heads: int,
+        hidden_dims: int,
+        rope_theta: float = 10000.0,
+        norm_eps: float = 1e-5,
+        dropout: float = 0.0
+    ):
+        super().__init__()
+        self.attention_norm = nn.RMSNorm(dims, eps=norm_eps)  # mx.fast.rms_norm
+        self.attention = Attention(dims, num_heads, num_kv_heads, rope_theta)
+        self.mlp_norm = nn.RMSNorm(dims, eps=norm_eps)
+        self.mlp = FeedForward(dims, hidden_dims)
+        self.dropout = nn.Dropout(dropout)
+
+    def __call__(self, x, mask="causal"):
+        x = x + self.dropout(self.attention(self.attention_norm(x), mask))
+        return x + self.dropout(self.mlp(self.mlp_norm(x)))
+
+@ModelRegistry.register("transformer")
+class Transformer(BaseModel):
+    """Decoder-only language model (Llama-style) built on `mx.fast` kernels
+
+    Takes token ids `[batch, seq]` and returns next-token logits
+    `[batch, seq, vocab_size]`. `num_kv_heads` below `num_heads` enables
+    grouped-query attention; `intermediate_size` defaults to the usual
+    SwiGLU width of about 8/3 * hidden_size (rounded up to 256). With
+    `loss_chunk_size` set, `loss` fuses the output projection into a
+    chunked cross-entropy so the full logits are never stored.
+    """
+
+    # Megatron-style sharding: column-parallel Q/K/V and gate/up, row-parallel outputs,
+    # with one gradient all-reduce per attention / MLP input
+    tensor_parallel_plan = {
+        "column": ["layers.*.attention.q_proj", "layers.*.attention.k_proj",
+                   "layers.*.attention.v_proj", "layers.*.mlp.gate_proj", "layers.*.mlp.up_proj"],
+        "row": ["layers.*.attention.o_proj", "layers.*.mlp.down_proj"],
+        "shared_input": ["layers.*.attention", "layers.*.mlp"]
+    }
+
+    def __init__(
+        self,
+        hidden_size: int,
+        num_layers: int,
+        num_heads: int,
+        vocab_size: int = 32000,
+        num_kv_heads: Optional[int] = None,
+        intermediate_size: Optional[int] = None,
+        rope_theta: float = 10000.0,
+        norm_eps: float = 1e-5,
+        dropout: float = 0.0,
+        loss_chunk_size: Optional[int] = None
+    ):
+        super().__init__()
+        self.hidden_size = hidden_size
+        self.num_layers = num_layers
+        self.num_heads = num_heads
+        self.num_kv_heads = num_kv_heads or num_heads
+        self.vocab_size = vocab_size
+        self.intermediate_size = intermediate_size or 256 * math.ceil(8 * hidden_size / 3 / 256)
+        self.loss_chunk_size = loss_chunk_size
+
+        self.embed_tokens = nn.Embedding(vocab_size, hidden_size)
+        self.layers = [
+            TransformerBlock(
+                hidden_size, num_heads, self.num_kv_heads, self.intermediate_size,
+                rope_theta=rope_theta, norm_eps=norm_eps, dropout=dropout
+            )
+            for _ in range(num_layers)
+        ]
+        self.norm = nn.RMSNorm(hidden_size, eps=norm_eps)
+        self.lm_head = nn.Linear(hidden_size, vocab_size, bias=False)
+
+    def hidden_states(self, x):
+        """Final normalized hidden states, before the output projection"""
+        x = self.embed_tokens(x)
+        for layer in self.layers:
+            x = layer(x)
+        return self.norm(x)
+
+    def __call__(self, x):
+        return self.lm_head(self.hidden_states(x))
+
+    def stages(self) -> List[nn.Module]:
+        return [self.embed_tokens, *self.layers, nn.Sequential(self.norm, self.lm_head)]
+
+    def loss_fn(self, output, target):
+        return mx.mean(nn.losses.cross_entropy(output, target))
+
+    def loss(self, x, y):
+        # Quantized, LoRA or sharded heads keep the plain path
+        if self.loss_chunk_size is None or type(self.lm_head) is not nn.Linear:
+            return super().loss(x, y)
+        return self.chunked_cross_entropy(self.hidden_states(x), self.lm_head.weight, y, self.loss_chunk_size)
+
+    def flops_per_token(self, seq_len: int) -> float:
+        """Training FLOPs (forward + backward) per token at a given context length
+
+        `6 * N` for the matmul parameters (embedding lookups are free, the
+        output projection is not) plus `12 * layers * hidden * seq_len` for
+        the attention scores and weighted sum, following the PaLM appendix.
+        Causal masking is not discounted.
+        """
+        d, kv = self.hidden_size, self.num_kv_heads * (self.hidden_size // self.num_heads)
+        per_layer = 2 * d * d + 2 * d * kv + 3 * d * self.intermediate_size
+        matmul_params = self.num_layers * per_layer + d * self.vocab_size
+        return 6 * matmul_params + 12 * self.num_layers * d * seq_len
+
+    @classmethod
+    def from_config(cls, config: Dict):
+        return cls(
+            config["hidden_size"],
+            config["num_layers"],
+            config["num_heads"],
+            vocab_size=config.get("vocab_size", 32000),
+            num_kv_heads=config.get("num_kv_heads"),
+            intermediate_size=config.get("intermediate_size"),
+            rope_theta=config.get("rope_theta", 10000.0),
+            norm_eps=config.get("norm_eps", 1e-5),
+            dropout=config.get("dropout", 0.0),
+            loss_chunk_size=config.get("loss_chunk_size")
+        )
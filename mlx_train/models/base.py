@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import List
 import mlx.core as mx
 import mlx.nn as nn
 
@@ -10,10 +11,84 @@ class BaseModel(nn.Module):
         """Forward pass of the model"""
         raise NotImplementedError
     
+    def stages(self) -> List[nn.Module]:
+        """Ordered sub-modules whose composition is the forward pass
+
+        Used by sharded and pipelined training to materialize one stage at a
+        time. Defaults to the whole model as a single stage.
+        """
+        return [self]
+    
     def loss_fn(self, x, y):
         """Loss function for training"""
         raise NotImplementedError
     
+    def loss(self, x, y):
+        """Training loss straight from inputs
+
+        Defaults to `loss_fn(self(x), y)`. Models can override it to fuse
+        the output layer into the loss (see `chunked_cross_entropy`).
+        """
+        return self.loss_fn(self(x), y)
+    
+    @staticmethod
+    def chunked_cross_entropy(
+        hidden: mx.array,
+        weight: mx.array,
+        targets: mx.array,
+        chunk_size: int = 1024
+    ) -> mx.array:
+        """Mean cross-entropy of `hidden @ weight.T` without materializing the logits
+
+        `hidden` is `[..., dims]`, `weight` the `[vocab, dims]` output
+        projection and `targets` the matching `[...]` class ids. The tokens
+        are processed `chunk_size` at a time, in forward and again in the
+        custom backward (which recomputes each chunk's logits), so only a few
+        `[chunk_size, vocab]` blocks are alive at once instead of the full
+        `[tokens, vocab]` logits and their gradient. Logits are computed
+        in float32.
+        """
+        hidden = hidden.reshape(-1, hidden.shape[-1])
+        targets = targets.reshape(-1)
+        n = hidden.shape[0]
+        bounds = [(s, min(s + chunk_size, n)) for s in range(0, n, chunk_size)]
+
+        @mx.custom_function
+        def loss(hidden, weight, targets):
+            total = mx.array(0.0)
+            for start, stop in bounds:
+                # Chain chunks so the scheduler can't run all the matmuls up front
+                logits = (mx.depends(hidden[start:stop], total) @ weight.T).astype(mx.float32)
+                picked = mx.take_along_axis(logits, targets[start:stop, None], axis=-1).squeeze(-1)
+                total = total + (mx.logsumexp(logits, axis=-1) - picked).sum()
+            return total / n
+
+        @loss.vjp
+        def loss_vjp(primals, cotangent, output):
+            hidden, weight, targets = primals
+            scale = cotangent / n
+            grad_hidden, grad_weight = [], None
+            for start, stop in bounds:
+                h = hidden[start:stop]
+                if grad_weight is not None:
+                    h = mx.depends(h, [grad_weight, grad_hidden[-1]])
+                logits = (h @ weight.T).astype(mx.float32)
+                # d/dlogits = softmax - one_hot(target)
+                index = targets[start:stop, None]
+                g = mx.softmax(logits, axis=-1)
+                g = mx.put_along_axis(g, index, mx.take_along_axis(g, index, axis=-1) - 1, axis=-1)
+                g = (g * scale).astype(hidden.dtype)
+                grad_hidden.append(g @ weight)
+                chunk_grad = (g.T @ h).astype(mx.float32)
+                grad_weight = chunk_grad if grad_weight is None else grad_weight + chunk_grad
+            return (
+                mx.concatenate(grad_hidden),
+                grad_weight.astype(weight.dtype),
+                mx.zeros_like(targets)
+            )
+
+        return loss(hidden, weight, targets)
+    
     @classmethod
     def from_config(cls, config):
         """Create model instance from config"""
@@ -1,41 +1,107 @@
 from typing import Optional, Union, Dict
 import mlx.core as mx
+from mlx.utils import tree_flatten
+from rich.console import Console
 from mlx_train.models.registry import ModelRegistry
 from mlx_train.models.base import BaseModel
+from mlx_train.models.architectures.lora import apply_lora
+from mlx_train.models.architectures.tensor_parallel import apply_tensor_parallel
+from mlx_train.core.distributed import Communicator, get_communicator
 from mlx_train.utils.memory import MemoryOptimizer
 
+console = Console()
+
 class ModelBuilder:
     """Enhanced model builder with memory optimizations"""
-    
+
     @staticmethod
     def build(
         config: Dict,
         model_type: str = "custom",
         pretrained: bool = False,
-        quantize: bool = False
+        quantize: bool = False,
+        lora: bool = False,
+        communicator: Optional[Communicator] = None
     ) -> BaseModel:
-        """Build a model with memory optimizations"""
+        """Build a model with memory optimizations
+
+        With `lora=True` the base weights are frozen and linear layers matching
+        `config["lora"]["target_modules"]` get trainable low-rank adapters.
+        Combined with `quantize=True` the frozen linears are first converted to
+        group-wise quantized modules (`config["quantization"]`), i.e. QLoRA.
+        `config["tensor_parallel"]` (`column` / `row` / `attention` /
+        `shared_input` module-name patterns) shards matching layers across the communicator's ranks;
+        `true` uses the model's own `tensor_parallel_plan`.
+        With `pretrained=True`, `config["pretrained_path"]` (a safetensors
+        file or a directory of shards) is memory-mapped and loaded tensor by
+        tensor over the not-yet-evaluated initial weights.
+        """
         # Get model class from registry
         model_cls = ModelRegistry.get_model(model_type)
-        
+
         # Create model instance
         model = model_cls.from_config(config)
-        
+
+        quantization = config.get("quantization", {})
+        bits = quantization.get("bits", 4)
+        group_size = quantization.get("group_size", 64)
+
         if pretrained:
             weights = MemoryOptimizer.load_sharded(config["pretrained_path"])
-            if quantize:
-                weights = MemoryOptimizer.quantize_weights(weights)
-            model.update(weights)
-        
+            if any(name.endswith(".scales") for name in weights):
+                # Already-quantized checkpoint: match module layout before loading
+                MemoryOptimizer.quantize_model(model, bits=bits, group_size=group_size)
+                quantize = False
+            MemoryOptimizer.load_into(model, weights)
+
+        tensor_parallel = config.get("tensor_parallel")
+        if tensor_parallel is True:
+            tensor_parallel = getattr(model, "tensor_parallel_plan", {})
+        if tensor_parallel:
+            comm = communicator if communicator is not None else get_communicator()
+            replaced = apply_tensor_parallel(
+                model,
+                comm,
+                column=tensor_parallel.get("column", []),
+                row=tensor_parallel.get("row", []),
+                attention=tensor_parallel.get("attention", []),
+                shared_input=tensor_parallel.get("shared_input", [])
+            )
+            console.print(
+                f"[green]Tensor parallel across {comm.size} ranks: "
+                f"{sum(len(names) for names in replaced.values())} layers sharded[/green]"
+            )
+
+        if quantize:
+            report = MemoryOptimizer.quantize_model(model, bits=bits, group_size=group_size)
+            console.print(
+                f"[green]Quantized to {bits}-bit: {report['quantized_memory_gb']:.3f}GB "
+                f"vs {report['fp16_memory_gb']:.3f}GB fp16 "
+                f"({report['memory_saved_gb']:.3f}GB saved, {report['compression_ratio']:.1f}x)[/green]"
+            )
+
+        if lora:
+            lora_config = config.get("lora", {})
+            apply_lora(
+                model,
+                target_modules=lora_config.get("target_modules", ["*"]),
+                rank=lora_config.get("rank", 8),
+                alpha=lora_config.get("alpha", 16.0),
+                dropout=lora_config.get("dropout", 0.0),
+                dtype=getattr(mx, lora_config["dtype"]) if "dtype" in lora_config else None
+            )
+
         mx.eval(model.parameters())
         return model
 
+    @staticmethod
+    def count_parameters(model: BaseModel, trainable_only: bool = False) -> int:
+        """Count model parameters, optionally only the trainable ones"""
+        params = model.trainable_parameters() if trainable_only else model.parameters()
+        return sum(p.size for _, p in tree_flatten(params))
+
     @staticmethod
     def estimate_model_size(model: BaseModel) -> int:
         """Estimate model memory requirements"""
-        total_params = 0
-        for p in model.parameters().values():
-            total_params += p.size
-        
         # Estimate size in bytes (assuming float32)
-        return total_params * 4
\ No newline at end of file
+        return ModelBuilder.count_parameters(model) * 4
@@ -0,0 +1,44 @@
+import math
+from typing import List, Sequence, Tuple
+import mlx.core as mx
+
+def build_buckets(arrays: Sequence[mx.array], bucket_size_mb: float = 25.0) -> List[List[int]]:
+    """Group tensor indices into contiguous same-dtype buckets of ~bucket_size_mb
+
+    Tensors keep their order. A tensor larger than the bucket size gets a
+    bucket of its own.
+    """
+    bucket_bytes = bucket_size_mb * 1024 * 1024
+    buckets: List[List[int]] = []
+    current: List[int] = []
+    current_bytes = 0
+
+    for i, array in enumerate(arrays):
+        dtype_changed = current and arrays[current[0]].dtype != array.dtype
+        if current and (dtype_changed or current_bytes + array.nbytes > bucket_bytes):
+            buckets.append(current)
+            current, current_bytes = [], 0
+        current.append(i)
+        current_bytes += array.nbytes
+
+    if current:
+        buckets.append(current)
+    return buckets
+
+def flatten_bucket(arrays: Sequence[mx.array]) -> mx.array:
+    """Concatenate tensors into one flat contiguous buffer"""
+    if len(arrays) == 1:
+        return arrays[0].reshape(-1)
+    return mx.concatenate([a.reshape(-1) for a in arrays])
+
+def unflatten_bucket(buffer: mx.array, shapes: Sequence[Tuple[int, ...]]) -> List[mx.array]:
+    """Split a flat buffer back into tensors of the given shapes"""
+    sizes = [math.prod(shape) for shape in shapes]
+    offsets = []
+    total = 0
+    for size in sizes[:-1]:
+        total += size
+        offsets.append(total)
+
+    parts = mx.split(buffer, offsets) if offsets else [buffer]
+    return [part.reshape(shape) for part, shape in zip(parts, shapes)]
@@ -0,0 +1,507 @@
+import hashlib
+import json
+import math
+import os
+import queue
+import shutil
+import threading
+import time
+import weakref
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+import mlx.core as mx
+from mlx.utils import tree_flatten, tree_map, tree_unflatten
+from mlx_train.utils.safetensors import read_safetensors_header, read_tensor_range
+
+FORMAT_VERSION = 1
+MODEL_FILE = "model.safetensors"
+OPTIMIZER_FILE = "optimizer.safetensors"
+MANIFEST_FILE = "manifest.json"
+INDEX_FILE = "index.json"
+
+def checkpoint_epoch(path: Path) -> int:
+    """Epoch encoded in a `checkpoint_epoch_<n>[.json]` name"""
+    return int(Path(path).name.split(".")[0].split("_")[-1])
+
+def checkpoint_order(path: Path) -> Tuple[int, int, int]:
+    """Sort key putting `checkpoint_step_<n>` saves after the end of the epoch they were taken in
+
+    End-of-epoch checkpoints sort by epoch. A mid-epoch checkpoint is named
+    by global step and records the epochs completed so far in its manifest,
+    so it lands between that epoch's checkpoint and the next one.
+    """
+    path = Path(path)
+    if path.name.startswith("checkpoint_step_"):
+        with open(path / MANIFEST_FILE) as f:
+            epoch = json.load(f)["epoch"]
+        return epoch, 1, int(path.name.split("_")[-1])
+    return checkpoint_epoch(path), 0, 0
+
+def list_checkpoints(directory: Path) -> List[Path]:
+    """Checkpoints in `directory` (binary directories and legacy JSON files), oldest first"""
+    directory = Path(directory)
+    candidates = [
+        p for p in directory.glob("checkpoint_epoch_*")
+        if (p / MANIFEST_FILE).exists() or p.suffix == ".json"
+    ] + [p for p in directory.glob("checkpoint_step_*") if (p / MANIFEST_FILE).exists()]
+    # Prefer the binary checkpoint when both formats exist for an epoch
+    return sorted(candidates, key=lambda p: (checkpoint_order(p), p.is_dir()))
+
+def _split_arrays(tree: Dict) -> Tuple[Dict[str, mx.array], Dict]:
+    """Flatten a tree into safetensors-storable arrays and JSON-storable scalars"""
+    arrays, scalars = {}, {}
+    for name, value in tree_flatten(tree):
+        if isinstance(value, mx.array):
+            arrays[name] = value
+        else:
+            scalars[name] = value
+    return arrays, scalars
+
+def _fsync(path: Path):
+    """Flush a file or directory entry to disk"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _publish(tmp: Path, path: Path):
+    """Atomically rename a fully written temporary checkpoint directory into place
+
+    Checkpoint names are unique per epoch or step, so `path` doesn't exist
+    during training and the rename is a single atomic `os.replace`. A
+    stale checkpoint of the same name (e.g. from an earlier run in the same
+    directory) can't be renamed over, so it is deleted first.
+    """
+    if path.exists():
+        shutil.rmtree(path)
+    os.replace(tmp, path)
+    _fsync(path.parent)
+
+def _tensor_index(arrays: Dict[str, mx.array]) -> Dict:
+    return {k: {"shape": list(v.shape), "dtype": str(v.dtype).split(".")[-1]} for k, v in arrays.items()}
+
+def write_checkpoint(path: Path, model_state: Dict, optimizer_state: Dict, metadata: Dict) -> Path:
+    """Write a checkpoint directory: two safetensors files plus a JSON manifest
+
+    Both trees are flattened to dotted names, so nested modules and
+    optimizer fields round-trip with their dtypes. `metadata` (epoch,
+    metrics, ...) goes into the manifest together with a tensor index.
+    Files are written and fsynced in a hidden temporary directory that is
+    then renamed into place, so readers never see a partial checkpoint.
+    """
+    path = Path(path)
+    tmp = path.parent / f".{path.name}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    model_arrays, model_scalars = _split_arrays(model_state)
+    optimizer_arrays, optimizer_scalars = _split_arrays(optimizer_state)
+
+    mx.save_safetensors(str(tmp / MODEL_FILE), model_arrays)
+    mx.save_safetensors(str(tmp / OPTIMIZER_FILE), optimizer_arrays)
+
+    manifest = {
+        **metadata,
+        "format_version": FORMAT_VERSION,
+        # Non-array leaves (e.g. Python scalars in optimizer state)
+        "scalars": {"model": model_scalars, "optimizer": optimizer_scalars},
+        "tensors": {"model": _tensor_index(model_arrays), "optimizer": _tensor_index(optimizer_arrays)},
+        "timestamp": metadata.get("timestamp", time.time())
+    }
+    with open(tmp / MANIFEST_FILE, "w") as f:
+        json.dump(manifest, f, indent=2)
+    for name in (MODEL_FILE, OPTIMIZER_FILE, MANIFEST_FILE):
+        _fsync(tmp / name)
+
+    _publish(tmp, path)
+    return path
+
+class AsyncCheckpointWriter:
+    """Write checkpoints on a background thread while training continues
+
+    `submit` evaluates the state and keeps references to the resulting
+    arrays. MLX arrays are immutable (optimizer updates create new ones),
+    so the references are a consistent snapshot at no copy cost, at the
+    price of keeping that step's tensors alive until written. Snapshots are
+    written one at a time in submission order; at most `max_in_flight`
+    exist at once (2 = double buffering) and `submit` blocks beyond that.
+    Write errors are re-raised by the next `submit` or `wait`. `write_fn`
+    does the actual write (`write_checkpoint` by default).
+    """
+
+    def __init__(self, max_in_flight: int = 2, write_fn: Optional[Callable] = None):
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        self.max_in_flight = max_in_flight
+        self.write_fn = write_fn or write_checkpoint
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._error: Optional[BaseException] = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.written: List[Path] = []
+
+    def submit(self, path: Path, model_state: Dict, optimizer_state: Dict, metadata: Dict):
+        """Snapshot the state and queue it for writing"""
+        self._raise_error()
+        # New containers, same (immutable) arrays: later in-place updates of
+        # e.g. `optimizer.state` don't leak into the snapshot
+        model_state = tree_map(lambda x: x, model_state)
+        optimizer_state = tree_map(lambda x: x, optimizer_state)
+        # Materialize on the caller's thread; the writer only reads buffers
+        mx.eval(model_state, optimizer_state)
+        self._slots.acquire()
+        with self._lock:
+            self.in_flight += 1
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        self._queue.put((Path(path), model_state, optimizer_state, metadata))
+
+    def _run(self):
+        while True:
+            path, model_state, optimizer_state, metadata = self._queue.get()
+            try:
+                self.written.append(self.write_fn(path, model_state, optimizer_state, metadata))
+            except BaseException as e:
+                self._error = e
+            finally:
+                # Drop the snapshot before freeing its slot
+                del model_state, optimizer_state
+                with self._lock:
+                    self.in_flight -= 1
+                self._slots.release()
+                self._queue.task_done()
+
+    def wait(self):
+        """Block until every submitted checkpoint is on disk"""
+        self._queue.join()
+        self._raise_error()
+
+    def _raise_error(self):
+        error, self._error = self._error, None
+        if error is not None:
+            raise RuntimeError(f"Background checkpoint write failed: {error}") from error
+
+class BlobStore:
+    """Content-addressed tensor blobs shared by incremental checkpoints
+
+    Each tensor is stored once as `<root>/<key[:2]>/<key>.safetensors`, keyed
+    by the SHA-256 of its dtype, shape and bytes, so snapshots that share
+    tensors (frozen layers, unchanged optimizer fields) share the blob.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    @staticmethod
+    def key(array: mx.array) -> str:
+        flat = array.reshape(-1)
+        mx.eval(flat)
+        digest = hashlib.sha256(f"{array.dtype}{array.shape}".encode())
+        digest.update(memoryview(flat))
+        return digest.hexdigest()
+
+    def path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.safetensors"
+
+    def put(self, array: mx.array, key: Optional[str] = None) -> Tuple[str, bool]:
+        """Store a tensor; returns its key and whether a new blob was written"""
+        key = key or self.key(array)
+        path = self.path(key)
+        if path.exists():
+            return key, False
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.parent / f".{key}.tmp.safetensors"
+        mx.save_safetensors(str(tmp), {"tensor": array})
+        _fsync(tmp)
+        os.replace(tmp, path)
+        return key, True
+
+    def get(self, key: str) -> mx.array:
+        return mx.load(str(self.path(key)))["tensor"]
+
+    def keys(self) -> Set[str]:
+        return {p.stem for p in self.root.glob("*/*.safetensors") if not p.name.startswith(".")}
+
+    def collect_garbage(self, referenced: Set[str]) -> int:
+        """Delete blobs no snapshot references; returns how many were removed"""
+        removed = 0
+        for key in self.keys() - referenced:
+            self.path(key).unlink(missing_ok=True)
+            removed += 1
+        return removed
+
+def write_incremental_checkpoint(
+    path: Path,
+    store: BlobStore,
+    model_state: Dict,
+    optimizer_state: Dict,
+    metadata: Dict,
+    cache: Optional[Dict] = None
+) -> Path:
+    """Write a snapshot manifest whose tensors live in a shared `BlobStore`
+
+    Only tensors whose content is not in the store yet are written. `cache`
+    (kept by the caller between saves) maps names to a weak reference to
+    the array of the previous save and its key: MLX arrays are immutable,
+    so when the same array object is still alive (e.g. a frozen layer) it
+    is skipped without even hashing it.
+    """
+    path = Path(path)
+    cache = cache if cache is not None else {}
+    tmp = path.parent / f".{path.name}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    blobs, index, scalars, written_bytes = {}, {}, {}, 0
+    for kind, tree in (("model", model_state), ("optimizer", optimizer_state)):
+        arrays, scalars[kind] = _split_arrays(tree)
+        blobs[kind], index[kind] = {}, _tensor_index(arrays)
+        for name, array in arrays.items():
+            cached = cache.get((kind, name))
+            known = cached is not None and cached[0]() is array
+            key, written = store.put(array, cached[1] if known else None)
+            written_bytes += array.nbytes if written else 0
+            cache[(kind, name)] = (weakref.ref(array), key)
+            blobs[kind][name] = key
+
+    manifest = {
+        **metadata,
+        "format_version": FORMAT_VERSION,
+        "scalars": scalars,
+        "tensors": index,
+        "blobs": blobs,
+        "blob_dir": os.path.relpath(store.root, path.parent),
+        "written_bytes": written_bytes,
+        "timestamp": metadata.get("timestamp", time.time())
+    }
+    with open(tmp / MANIFEST_FILE, "w") as f:
+        json.dump(manifest, f, indent=2)
+    _fsync(tmp / MANIFEST_FILE)
+    _publish(tmp, path)
+    return path
+
+def _checkpoint_metrics(path: Path) -> Dict:
+    if path.is_dir():
+        with open(path / MANIFEST_FILE) as f:
+            return json.load(f).get("metrics", {})
+    with open(path) as f:
+        return json.load(f).get("metrics", {})
+
+class RetentionPolicy:
+    """Which checkpoints to keep: the last `keep_last` plus the best `keep_best`
+
+    "Best" ranks checkpoints by `metrics[metric]` in their manifest
+    (lowest first with `mode="min"`). After pruning, blobs that no remaining
+    incremental snapshot references are deleted.
+    """
+
+    def __init__(self, keep_last: int = 3, keep_best: int = 0, metric: str = "loss", mode: str = "min"):
+        if keep_last < 1:
+            raise ValueError("keep_last must be at least 1 so training can resume")
+        if mode not in ("min", "max"):
+            raise ValueError(f"Unknown mode {mode}. Use 'min' or 'max'")
+        self.keep_last = keep_last
+        self.keep_best = keep_best
+        self.metric = metric
+        self.mode = mode
+
+    def select(self, checkpoints: List[Path]) -> List[Path]:
+        """Checkpoints to keep, in `list_checkpoints` order"""
+        keep = set(checkpoints[-self.keep_last:])
+        if self.keep_best:
+            scored = []
+            for position, path in enumerate(checkpoints):
+                value = _checkpoint_metrics(path).get(self.metric)
+                if isinstance(value, (int, float)):
+                    scored.append((value if self.mode == "min" else -value, position, path))
+            keep.update(path for *_, path in sorted(scored)[:self.keep_best])
+        return [p for p in checkpoints if p in keep]
+
+    def apply(self, directory: Path) -> List[Path]:
+        """Delete checkpoints outside the policy and unreferenced blobs; returns the removed paths"""
+        directory = Path(directory)
+        checkpoints = list_checkpoints(directory)
+        keep = self.select(checkpoints)
+        removed = [p for p in checkpoints if p not in keep]
+        for path in removed:
+            if path.is_dir():
+                shutil.rmtree(path)
+            else:
+                path.unlink()
+
+        referenced: Dict[Path, Set[str]] = {}
+        for path in keep:
+            if not path.is_dir():
+                continue
+            with open(path / MANIFEST_FILE) as f:
+                manifest = json.load(f)
+            if "blobs" in manifest:
+                root = (directory / manifest["blob_dir"]).resolve()
+                keys = referenced.setdefault(root, set())
+                for kind in manifest["blobs"].values():
+                    keys.update(kind.values())
+        blob_root = (directory / "blobs").resolve()
+        for root in set(referenced) | ({blob_root} if blob_root.exists() else set()):
+            BlobStore(root).collect_garbage(referenced.get(root, set()))
+        return removed
+
+def read_checkpoint(path: Path) -> Tuple[Dict, Dict, Dict]:
+    """Read a checkpoint directory as (model_state, optimizer_state, manifest) trees
+
+    Handles both full snapshots and incremental ones backed by a `BlobStore`.
+    """
+    path = Path(path)
+    with open(path / MANIFEST_FILE) as f:
+        manifest = json.load(f)
+    store = BlobStore(path.parent / manifest["blob_dir"]) if "blobs" in manifest else None
+
+    def load(filename: str, kind: str) -> Dict:
+        if store is not None:
+            flat = [(name, store.get(key)) for name, key in manifest["blobs"][kind].items()]
+        else:
+            flat = list(mx.load(str(path / filename)).items())
+        flat += list(manifest["scalars"][kind].items())
+        return tree_unflatten(flat) if flat else {}
+
+    return load(MODEL_FILE, "model"), load(OPTIMIZER_FILE, "optimizer"), manifest
+
+def read_legacy_checkpoint(path: Path) -> Tuple[Dict, Dict, Dict]:
+    """Read a JSON (nested-list) checkpoint as (model_state, optimizer_state, metadata)"""
+    with open(path) as f:
+        checkpoint = json.load(f)
+
+    def to_tree(flat: Dict) -> Dict:
+        return tree_unflatten([
+            (k, mx.array(v) if isinstance(v, (list, float, int)) else v)
+            for k, v in flat.items()
+        ]) if flat else {}
+
+    model_state = to_tree(checkpoint.pop("model_state"))
+    optimizer_state = to_tree(checkpoint.pop("optimizer_state", {}))
+    return model_state, optimizer_state, checkpoint
+
+def assign_tensors(sizes: Sequence[int], world_size: int) -> List[int]:
+    """Owner rank of each tensor, balancing bytes (largest first, deterministic)"""
+    loads = [0] * world_size
+    owners = [0] * len(sizes)
+    for i in sorted(range(len(sizes)), key=lambda i: (-sizes[i], i)):
+        rank = min(range(world_size), key=lambda r: (loads[r], r))
+        owners[i] = rank
+        loads[rank] += sizes[i]
+    return owners
+
+def shard_file(rank: int, world_size: int) -> str:
+    return f"shard-{rank:05d}-of-{world_size:05d}.safetensors"
+
+def write_sharded_checkpoint(path: Path, comm, pieces: List[Tuple], metadata: Dict) -> Path:
+    """Write this rank's pieces of a sharded checkpoint; collective
+
+    `pieces` are `(kind, name, shape, start, flat_array)` tuples: elements
+    `[start, start + flat_array.size)` of the flattened tensor `name`
+    (`kind` is "model" or "optimizer"). Every rank writes its pieces to its
+    own safetensors file in parallel; rank 0 then merges the per-rank
+    indexes into `index.json`, writes the manifest and renames the
+    directory into place. Assumes a filesystem shared by all ranks.
+    """
+    path = Path(path)
+    tmp = path.parent / f".{path.name}.tmp"
+    if comm.rank == 0:
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+    comm.barrier()
+
+    filename = shard_file(comm.rank, comm.size)
+    arrays, entries = {}, []
+    for kind, name, shape, start, array in pieces:
+        key = f"{kind}/{name}/{start}"
+        arrays[key] = array.reshape(-1)
+        entries.append({
+            "kind": kind, "name": name, "shape": list(shape), "dtype": str(array.dtype).split(".")[-1],
+            "start": start, "stop": start + array.size, "file": filename, "key": key
+        })
+    mx.save_safetensors(str(tmp / filename), arrays)
+    _fsync(tmp / filename)
+    with open(tmp / f"{filename}.json", "w") as f:
+        json.dump(entries, f)
+    comm.barrier()
+
+    if comm.rank == 0:
+        index = []
+        for rank in range(comm.size):
+            part = tmp / f"{shard_file(rank, comm.size)}.json"
+            index.extend(json.loads(part.read_text()))
+            part.unlink()
+        with open(tmp / INDEX_FILE, "w") as f:
+            json.dump({"world_size": comm.size, "tensors": index}, f)
+        with open(tmp / MANIFEST_FILE, "w") as f:
+            json.dump({
+                **metadata,
+                "format_version": FORMAT_VERSION,
+                "sharded": True,
+                "timestamp": metadata.get("timestamp", time.time())
+            }, f, indent=2)
+        for name in (INDEX_FILE, MANIFEST_FILE):
+            _fsync(tmp / name)
+        _publish(tmp, path)
+    comm.barrier()
+    return path
+
+def is_sharded(path: Path) -> bool:
+    return (Path(path) / INDEX_FILE).exists()
+
+class ShardedCheckpointReader:
+    """Read whole tensors or flat element ranges from a sharded checkpoint
+
+    Only the bytes of the requested range are read, from whichever shard
+    files hold them, so a rank can load exactly its part under a different
+    world size or layout than the one that wrote the checkpoint.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path / INDEX_FILE) as f:
+            index = json.load(f)
+        with open(self.path / MANIFEST_FILE) as f:
+            self.manifest = json.load(f)
+        self.world_size = index["world_size"]
+        self.pieces: Dict[Tuple[str, str], List[Dict]] = {}
+        for entry in index["tensors"]:
+            self.pieces.setdefault((entry["kind"], entry["name"]), []).append(entry)
+        self._headers: Dict[str, Tuple[Dict, int]] = {}
+
+    def names(self, kind: str) -> List[str]:
+        return [name for k, name in self.pieces if k == kind]
+
+    def shape(self, kind: str, name: str) -> Tuple[int, ...]:
+        return tuple(self.pieces[(kind, name)][0]["shape"])
+
+    def _header(self, filename: str) -> Tuple[Dict, int]:
+        if filename not in self._headers:
+            self._headers[filename] = read_safetensors_header(self.path / filename)
+        return self._headers[filename]
+
+    def read(self, kind: str, name: str, start: int = 0, stop: Optional[int] = None) -> mx.array:
+        """Flat elements [start, stop) of a tensor (the whole tensor, reshaped, by default)"""
+        shape = self.shape(kind, name)
+        whole = stop is None and start == 0
+        stop = math.prod(shape) if stop is None else stop
+        parts = []
+        for entry in sorted(self.pieces[(kind, name)], key=lambda e: e["start"]):
+            lo, hi = max(start, entry["start"]), min(stop, entry["stop"])
+            if lo >= hi:
+                continue
+            header, offset = self._header(entry["file"])
+            parts.append(read_tensor_range(
+                self.path / entry["file"], header, offset, entry["key"], lo - entry["start"], hi - entry["start"]
+            ))
+        flat = parts[0] if len(parts) == 1 else mx.concatenate(parts)
+        return flat.reshape(shape) if whole else flat
+
+    def read_tree(self, kind: str) -> Dict:
+        """All tensors of a kind as a nested tree (plus the manifest's scalars)"""
+        flat = [(name, self.read(kind, name)) for name in self.names(kind)]
+        flat += list(self.manifest.get("scalars", {}).get(kind, {}).items())
+        return tree_unflatten(flat) if flat else {}
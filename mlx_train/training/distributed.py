@@ -1,67 +1,207 @@
 import mlx.core as mx
-from mlx.utils import tree_map
+from mlx.utils import tree_flatten, tree_unflatten
 import os
 from pathlib import Path
-import json
 import time
+import zlib
+from typing import Callable, Dict, List, Optional
+from mlx_train.core.distributed import Communicator, MLXCommunicator, get_communicator
+from mlx_train.models.architectures.lora import adapter_scale
+from mlx_train.training.checkpoint import (
+    AsyncCheckpointWriter, BlobStore, RetentionPolicy, ShardedCheckpointReader, _split_arrays,
+    assign_tensors, is_sharded, list_checkpoints, read_checkpoint, read_legacy_checkpoint,
+    write_checkpoint, write_incremental_checkpoint, write_sharded_checkpoint
+)
+from mlx_train.training.buckets import build_buckets, flatten_bucket, unflatten_bucket
+from mlx_train.training.compression import GradientCompressor
 
 class DistributedController:
-    def __init__(self):
+    def __init__(
+        self,
+        bucket_size_mb: float = 25.0,
+        compression: Optional[GradientCompressor] = None,
+        communicator: Optional[Communicator] = None,
+        backend: str = "mlx",
+        checkpoint_dir: str = "checkpoints",
+        async_checkpoints: int = 0,
+        sharded_checkpoints: bool = False,
+        incremental_checkpoints: bool = False,
+        retention: Optional[RetentionPolicy] = None
+    ):
         """Initialize distributed controller"""
-        self.world = mx.distributed.init()
-        # Call the size and rank methods to get values
-        self.size = int(self.world.size())  # Add parentheses to call the method
-        self.rank = int(self.world.rank())  # Add parentheses to call the method
-        self.checkpoint_dir = Path("checkpoints")
+        self.comm = communicator if communicator is not None else get_communicator(backend)
+        # MLX group handle, kept for callers that use mx.distributed directly
+        self.world = getattr(self.comm, "group", None)
+        self.bucket_size_mb = bucket_size_mb
+        self.compression = compression
+        self.bytes_sent = 0  # Gradient bytes put on the wire by this rank
+        # Time spent inside timed gradient collectives and the bytes they moved
+        self.comm_time = 0.0
+        self.comm_bytes = 0
+        self._bandwidth_mark = (0.0, 0)
+        self.size = self.comm.size
+        self.rank = self.comm.rank
+        self.checkpoint_dir = Path(checkpoint_dir)
+        self.resume_state = {}
+        # Every rank writes its own shard instead of rank 0 writing everything
+        self.sharded_checkpoints = sharded_checkpoints
+        # Snapshots reference content-hashed blobs, so unchanged tensors are written once
+        self.blob_store = BlobStore(self.checkpoint_dir / "blobs") if incremental_checkpoints else None
+        self._blob_cache = {}
+        self.retention = retention
+        # Background writer holding at most this many snapshots (0 = write inline)
+        self.checkpoint_writer = AsyncCheckpointWriter(
+            async_checkpoints, write_fn=self._write_checkpoint
+        ) if async_checkpoints else None
         self.checkpoint_dir.mkdir(exist_ok=True, parents=True)
         
-    def save_checkpoint(self, model, optimizer, epoch, metrics):
-        """Save training checkpoint"""
+    def save_checkpoint(
+        self,
+        model,
+        optimizer,
+        epoch,
+        metrics,
+        samples_processed: int = 0,
+        training_state: Optional[Dict] = None,
+        step: Optional[int] = None
+    ):
+        """Save training checkpoint
+
+        The layout is world-size independent: parameters and optimizer state
+        are stored per parameter name (ZeRO shards are gathered first), and
+        the data position as a global sample count. Tensors are written as
+        safetensors next to a JSON manifest (see `training.checkpoint`).
+        Every rank must call this when the model or optimizer is sharded
+        (an `FullyShardedDataParallel` wrapper with its `FSDPOptimizerState`
+        gathers full tensors); only rank 0 writes. With `async_checkpoints` set, the write happens on a
+        background thread and this returns once the state is snapshotted.
+        With `sharded_checkpoints` every rank writes its part in parallel
+        instead (synchronously, see `write_sharded_checkpoint`). With
+        `incremental_checkpoints` only tensors that changed since earlier
+        snapshots are written (see `BlobStore`). The `retention` policy
+        prunes old checkpoints after each save. `training_state` (see
+        `training.state.training_state`) records the step, data position and
+        random state for an exact mid-epoch resume. The LoRA `alpha / rank`
+        scale is recorded as `lora_scale` so exports merge adapters correctly.
+        A mid-epoch save passes its global `step` and is written to
+        `checkpoint_step_<step>` so it doesn't replace the epoch's checkpoint.
+        """
+        name = f"checkpoint_step_{step}" if step is not None else f"checkpoint_epoch_{epoch}"
+        path = self.checkpoint_dir / name
+        metadata = {
+            "epoch": epoch,
+            "metrics": metrics,
+            "world_size": self.size,
+            "samples_processed": samples_processed,
+            "training_state": training_state,
+            "lora_scale": adapter_scale(model) if hasattr(model, "named_modules") else None,
+            "timestamp": time.time()
+        }
+        if self.sharded_checkpoints:
+            pieces, scalars = self._checkpoint_pieces(model, optimizer)
+            write_sharded_checkpoint(path, self.comm, pieces, {**metadata, "scalars": scalars})
+            if self.rank == 0 and self.retention is not None:
+                self.retention.apply(self.checkpoint_dir)
+            return
+        
+        # Gathering sharded state is a collective, so it runs on all ranks
+        model_state = model.parameters()
+        if hasattr(optimizer, "state_dict"):
+            optimizer_state = optimizer.state_dict()
+        else:
+            optimizer_state = optimizer.state
+        
         if self.rank == 0:  # Only primary device saves
-            # Convert model state to serializable format
-            model_state = {
-                k: v.tolist() if hasattr(v, 'tolist') else v
-                for k, v in model.parameters().items()
-            }
-            
-            checkpoint = {
-                "epoch": epoch,
-                "model_state": model_state,
-                "optimizer_state": optimizer.state,
-                "metrics": metrics,
-                "world_size": self.size,
-                "timestamp": time.time()
-            }
-            
-            path = self.checkpoint_dir / f"checkpoint_epoch_{epoch}.json"
-            with open(path, "w") as f:
-                json.dump(checkpoint, f)
+            save = self.checkpoint_writer.submit if self.checkpoint_writer is not None else self._write_checkpoint
+            save(path, model_state, optimizer_state, metadata)
+
+    def _write_checkpoint(self, path, model_state, optimizer_state, metadata):
+        """Write a full or incremental snapshot, then prune per the retention policy"""
+        if self.blob_store is not None:
+            path = write_incremental_checkpoint(
+                path, self.blob_store, model_state, optimizer_state, metadata, self._blob_cache
+            )
+        else:
+            path = write_checkpoint(path, model_state, optimizer_state, metadata)
+        if self.retention is not None:
+            self.retention.apply(self.checkpoint_dir)
+        return path
+
+    def _checkpoint_pieces(self, model, optimizer):
+        """This rank's share of a sharded checkpoint, plus the non-array leaves
+
+        Whole tensors are spread over the ranks by size; a ZeRO optimizer
+        contributes the slices each rank already owns.
+        """
+        model_arrays, model_scalars = _split_arrays(model.parameters())
+        owners = assign_tensors([a.nbytes for a in model_arrays.values()], self.size)
+        pieces = [
+            ("model", name, a.shape, 0, a)
+            for (name, a), owner in zip(model_arrays.items(), owners) if owner == self.rank
+        ]
+        if hasattr(optimizer, "shard_pieces"):
+            pieces += [("optimizer", *piece) for piece in optimizer.shard_pieces()]
+            optimizer_scalars = {}
+        else:
+            optimizer_arrays, optimizer_scalars = _split_arrays(optimizer.state)
+            owners = assign_tensors([a.nbytes for a in optimizer_arrays.values()], self.size)
+            pieces += [
+                ("optimizer", name, a.shape, 0, a)
+                for (name, a), owner in zip(optimizer_arrays.items(), owners) if owner == self.rank
+            ]
+        return pieces, {"model": model_scalars, "optimizer": optimizer_scalars}
+
+    def wait_for_checkpoints(self):
+        """Block until background checkpoint writes have finished"""
+        if self.checkpoint_writer is not None:
+            self.checkpoint_writer.wait()
                 
     def load_checkpoint(self, model, optimizer):
-        """Load latest checkpoint if exists"""
-        checkpoints = sorted(self.checkpoint_dir.glob("checkpoint_epoch_*.json"))
+        """Load latest checkpoint if exists
+
+        Checkpoints written with a different world size are re-sharded onto
+        the current one (elastic restart). Run metadata such as the global
+        `samples_processed` and the `training_state` saved with the
+        checkpoint are kept in `self.resume_state`. Legacy JSON
+        checkpoints are still read.
+        """
+        self.wait_for_checkpoints()
+        checkpoints = list_checkpoints(self.checkpoint_dir)
         if not checkpoints:
             return model, 0
             
         latest = checkpoints[-1]
         try:
-            with open(latest) as f:
-                checkpoint = json.load(f)
+            reader = ShardedCheckpointReader(latest) if is_sharded(latest) else None
+            if reader is not None:
+                model_state, optimizer_state, checkpoint = reader.read_tree("model"), None, reader.manifest
+            elif latest.is_dir():
+                model_state, optimizer_state, checkpoint = read_checkpoint(latest)
+            else:
+                model_state, optimizer_state, checkpoint = read_legacy_checkpoint(latest)
                 
-            # Verify world size matches
             if checkpoint["world_size"] != self.size:
-                raise ValueError("Checkpoint world size doesn't match current setup")
-                
-            # Convert loaded state back to MLX arrays
-            model_state = {
-                k: mx.array(v) if isinstance(v, (list, float)) else v
-                for k, v in checkpoint["model_state"].items()
-            }
+                print(f"Resuming {checkpoint['world_size']}-rank checkpoint on {self.size} rank(s)")
             
             # Update model and optimizer
             model.update(model_state)
-            optimizer.state.update(checkpoint.get("optimizer_state", {}))
+            if reader is not None and hasattr(optimizer, "load_sharded"):
+                # Read only the slices this rank owns in the current layout
+                optimizer.load_sharded(model, reader)
+            elif reader is not None:
+                optimizer.state.update(reader.read_tree("optimizer"))
+            elif hasattr(optimizer, "load_state_dict"):
+                # Re-partition sharded optimizer state for this world size
+                optimizer.load_state_dict(model, optimizer_state)
+            else:
+                optimizer.state.update(optimizer_state)
             
+            self.resume_state = {
+                "world_size": checkpoint["world_size"],
+                "samples_processed": checkpoint.get("samples_processed", 0),
+                "metrics": checkpoint.get("metrics", {}),
+                "training_state": checkpoint.get("training_state")
+            }
             return model, checkpoint["epoch"]
         except Exception as e:
             print(f"Error loading checkpoint: {e}")
@@ -73,29 +213,195 @@ class DistributedController:
             return grads
             
         try:
-            size_float = float(self.size)  # Convert to float for division
-            return tree_map(
-                lambda x: mx.distributed.all_sum(x) / size_float,
-                grads
-            )
+            if self.compression is not None and not self.compression.bucketable:
+                return self._compressed_all_reduce(grads)
+            return self._bucketed_all_reduce(grads)
         except Exception as e:
             print(f"Error in gradient reduction: {e}")
             return grads
 
+    def all_reduce_grads_async(self, grads) -> "PendingGradients":
+        """Start bucketed gradient all-reduces that overlap with backward
+
+        MLX builds the backward pass lazily, so buckets are launched in reverse
+        parameter order (output layers first, as backward produces them) with
+        `mx.async_eval`. Evaluating each bucket only runs the part of backward
+        it depends on; its collective then runs while the remaining layer
+        groups are still being differentiated. Call `wait()` before the
+        optimizer step; it blocks only on buckets still in flight. Eager
+        communicators (MPI, shared memory) reduce each bucket as it is built.
+        """
+        if self.size == 1:
+            return PendingGradients(grads)
+        if self.compression is not None and not self.compression.bucketable:
+            return PendingGradients(self._compressed_all_reduce(grads))
+        return self._bucketed_all_reduce(grads, overlap=True)
+
+    def _bucketed_all_reduce(self, grads, overlap: bool = False):
+        """Average a gradient tree with one collective per flattened bucket"""
+        flat = tree_flatten(grads)
+        if not flat:
+            return PendingGradients(grads) if overlap else grads
+        names, arrays = zip(*flat)
+        reduced = list(arrays)
+        buffers = []
+        size_float = float(self.size)  # Convert to float for division
+        
+        # Backward produces the last layers' gradients first
+        order = list(range(len(arrays)))[::-1] if overlap else list(range(len(arrays)))
+        buckets = [
+            [order[j] for j in bucket]
+            for bucket in build_buckets([arrays[i] for i in order], self.bucket_size_mb)
+        ]
+        
+        for n, bucket in enumerate(buckets):
+            buffer = flatten_bucket([arrays[i] for i in bucket])
+            if self.compression is not None:
+                buffer = self._timed_collective(
+                    lambda b: self.compression.reduce(f"bucket_{n}", b, self.comm), buffer, overlap
+                )
+            else:
+                buffer = self._timed_collective(self._counted_all_reduce, buffer, overlap) / size_float
+            if overlap:
+                # Launch this bucket's backward slice + collective right away
+                mx.async_eval(buffer)
+            buffers.append(buffer)
+            for i, grad in zip(bucket, unflatten_bucket(buffer, [arrays[i].shape for i in bucket])):
+                reduced[i] = grad
+                
+        reduced_grads = tree_unflatten(list(zip(names, reduced)))
+        if not overlap:
+            return reduced_grads
+        # Lazy collectives are still in flight; time what `wait` blocks on
+        lazy = isinstance(self.comm, MLXCommunicator)
+        return PendingGradients(reduced_grads, buffers, on_wait=self._add_comm_time if lazy else None)
+
+    def _counted_all_reduce(self, buffer: mx.array) -> mx.array:
+        self.bytes_sent += buffer.nbytes
+        return self.comm.all_reduce(buffer)
+
+    def _compressed_all_reduce(self, grads):
+        """Average gradients tensor by tensor through the configured compressor"""
+        return tree_unflatten([
+            (name, self._timed_collective(lambda g: self.compression.reduce(name, g, self.comm), grad))
+            for name, grad in tree_flatten(grads)
+        ])
+
+    def _timed_collective(self, collective: Callable, x: mx.array, overlap: bool = False) -> mx.array:
+        """Run `collective(x)` and add its wall time and wire bytes to the counters
+
+        `x` is evaluated first so backward compute isn't counted, and lazy
+        (`mx.distributed`) results are evaluated inside the timed region.
+        Lazy collectives overlapped with backward can't be timed without
+        blocking, so only their bytes are counted here, at launch;
+        `PendingGradients.wait` adds the time spent blocked on them.
+        """
+        lazy = isinstance(self.comm, MLXCommunicator)
+        deferred = lazy and overlap
+        if not deferred:
+            mx.eval(x)
+        sent = self.communication_stats()["bytes_sent"]
+        start = time.perf_counter()
+        out = collective(x)
+        if lazy and not overlap:
+            mx.eval(out)
+        if not deferred:
+            self.comm_time += time.perf_counter() - start
+        self.comm_bytes += self.communication_stats()["bytes_sent"] - sent
+        return out
+
+    def _add_comm_time(self, seconds: float):
+        self.comm_time += seconds
+
+    def communication_stats(self):
+        """Gradient bytes on the wire, with compression accounting if enabled"""
+        if self.compression is not None:
+            return self.compression.stats()
+        return {"bytes_sent": self.bytes_sent, "bytes_dense": self.bytes_sent, "compression_ratio": 1.0}
+
+    def network_bandwidth(self) -> float:
+        """Achieved gradient all-reduce bandwidth in MB/s since the previous call
+
+        Bytes on the wire over the time spent inside the collectives, so
+        compute between steps doesn't dilute it. Overlapped all-reduces on
+        the lazy MLX backend count only the time `wait` blocks on them, so
+        this reads higher than the link when they hide behind backward. Compare with the peak bus
+        bandwidth from `mlx-train bench comm`.
+        """
+        last_time, last_bytes = self._bandwidth_mark
+        self._bandwidth_mark = (self.comm_time, self.comm_bytes)
+        elapsed = self.comm_time - last_time
+        return (self.comm_bytes - last_bytes) / elapsed / 1e6 if elapsed > 0 else 0.0
+
+    def broadcast_parameters(self, model, root: int = 0):
+        """Overwrite every rank's parameters with rank `root`'s, bucket by bucket
+
+        Parameters are flattened into same-dtype buffers of ~bucket_size_mb and
+        sent as raw tensors, so replicas end up bit-identical to the root.
+        """
+        flat = tree_flatten(model.parameters())
+        arrays = [p for _, p in flat]
+        updated = []
+        for bucket in build_buckets(arrays, self.bucket_size_mb):
+            buffer = self.comm.broadcast(flatten_bucket([arrays[i] for i in bucket]), root=root)
+            parts = unflatten_bucket(buffer, [arrays[i].shape for i in bucket])
+            # Evaluate bucket by bucket to bound the transient buffers
+            mx.eval(parts)
+            updated.extend((flat[i][0], part) for i, part in zip(bucket, parts))
+        model.update(tree_unflatten(updated))
+        return model
+
+    def parameter_checksum(self, model) -> int:
+        """CRC32 over the names and raw bytes of all parameters"""
+        checksum = 0
+        for name, param in tree_flatten(model.parameters()):
+            param = param.reshape(-1)
+            mx.eval(param)
+            checksum = zlib.crc32(name.encode(), checksum)
+            checksum = zlib.crc32(memoryview(param), checksum)
+        return checksum
+
+    def verify_parameters(self, model, root: int = 0) -> List[int]:
+        """Ranks whose parameters are not bit-identical to rank `root`'s"""
+        checksum = mx.array([self.parameter_checksum(model)], dtype=mx.uint32)
+        checksums = self.comm.all_gather(checksum).tolist()
+        return [rank for rank, c in enumerate(checksums) if c != checksums[root]]
+
     def synchronize_model(self, model):
-        """Ensure model weights are synchronized across devices"""
+        """Ensure model weights are synchronized across devices
+
+        Broadcasts rank 0's parameters and checks that every rank ends up
+        with the same checksum.
+        """
         if self.size == 1:
             return model
             
         try:
-            size_float = float(self.size)  # Convert to float for division
-            
-            def reduce_fn(x):
-                return mx.distributed.all_sum(x) / size_float
-                
-            params = tree_map(reduce_fn, model.parameters())
-            model.update(params)
-            return model
+            model = self.broadcast_parameters(model)
         except Exception as e:
             print(f"Error synchronizing model: {e}")
-            return model
\ No newline at end of file
+            return model
+        
+        mismatched = self.verify_parameters(model)
+        if mismatched:
+            raise RuntimeError(f"Parameters on ranks {mismatched} differ from rank 0 after synchronization")
+        return model
+
+class PendingGradients:
+    """Handle for bucketed gradient all-reduces that are already in flight"""
+    
+    def __init__(self, grads, buffers=None, on_wait: Optional[Callable[[float], None]] = None):
+        self.grads = grads
+        self.buffers = buffers or []
+        # Called with the seconds `wait` blocked on buckets still in flight
+        self.on_wait = on_wait
+        
+    def wait(self):
+        """Block until all outstanding buckets are reduced and return the gradients"""
+        if self.buffers:
+            start = time.perf_counter()
+            mx.eval(self.buffers)
+            if self.on_wait is not None:
+                self.on_wait(time.perf_counter() - start)
+            self.buffers = []
+        return self.grads
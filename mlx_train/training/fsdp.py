@@ -0,0 +1,235 @@
+import math
+from typing import Dict, List, Optional, Tuple
+import mlx.core as mx
+import mlx.optimizers as optim
+from mlx.utils import tree_flatten, tree_unflatten
+from mlx_train.core.distributed import Communicator, get_communicator
+from mlx_train.models.base import BaseModel
+from mlx_train.training.buckets import flatten_bucket, unflatten_bucket
+
+class FullyShardedDataParallel:
+    """Fully sharded data parallelism over the stages of a `BaseModel`
+
+    Each rank keeps only a 1/world_size fp32 slice of every stage's
+    parameters (plus the optimizer state for that slice). Training runs
+    stage by stage:
+
+    - forward: all-gather a stage's parameters just in time, run it, keep
+      its input activation and drop the gathered copy again
+    - backward: re-gather each stage in reverse, recompute its forward under
+      `mx.vjp` and reduce-scatter the parameter gradients straight into the
+      owned slice
+
+    While one stage runs, the next stage's all-gather is already launched
+    (`prefetch`), so at most two stages are materialized at any time.
+    """
+
+    def __init__(self, model: BaseModel, communicator: Optional[Communicator] = None, prefetch: bool = True):
+        self.model = model
+        self.comm = communicator if communicator is not None else get_communicator()
+        self.prefetch = prefetch
+        self.stages = model.stages()
+        self.shards: Dict[str, mx.array] = {}
+        self._layouts: List[List[Tuple[str, Tuple[int, ...], mx.Dtype]]] = []
+        # Each stage parameter's name in the model, for checkpoints in the model's layout
+        self._names: List[List[str]] = []
+        self._seeds: List[int] = []
+        self.peak_gathered_bytes = 0
+
+        model_names = {id(p): name for name, p in tree_flatten(model.parameters())}
+        for i, stage in enumerate(self.stages):
+            flat = tree_flatten(stage.parameters())
+            self._layouts.append([(name, p.shape, p.dtype) for name, p in flat])
+            self._names.append([model_names[id(p)] for _, p in flat])
+            self.shards[f"stage_{i}"] = self._shard(flatten_bucket([p.astype(mx.float32) for _, p in flat]))
+            mx.eval(self.shards[f"stage_{i}"])
+            self._release(i)
+
+    def _shard(self, buffer: mx.array) -> mx.array:
+        """This rank's slice of a flat fp32 buffer, zero-padded to a multiple of the world size"""
+        pad = -buffer.size % self.comm.size
+        if pad:
+            buffer = mx.concatenate([buffer, mx.zeros((pad,), dtype=mx.float32)])
+        chunk = buffer.size // self.comm.size
+        return mx.array(buffer[self.comm.rank * chunk:(self.comm.rank + 1) * chunk])
+
+    def _numel(self, i: int) -> int:
+        return sum(math.prod(shape) for _, shape, _ in self._layouts[i])
+
+    def _gather(self, i: int) -> List[mx.array]:
+        """Launch the all-gather of stage `i`'s parameters (lazy on MLX)"""
+        layout = self._layouts[i]
+        full = self.comm.all_gather(self.shards[f"stage_{i}"])[:self._numel(i)]
+        params = unflatten_bucket(full, [shape for _, shape, _ in layout])
+        return [p.astype(dtype) for p, (_, _, dtype) in zip(params, layout)]
+
+    def _load(self, i: int, params: List[mx.array]):
+        self.stages[i].update(tree_unflatten([(name, p) for (name, _, _), p in zip(self._layouts[i], params)]))
+
+    def _release(self, i: int):
+        """Swap a stage's gathered parameters for empty placeholders"""
+        self.stages[i].update(tree_unflatten([
+            (name, mx.zeros((0,), dtype=dtype)) for name, _, dtype in self._layouts[i]
+        ]))
+
+    def _materialize(self, params: List[mx.array]) -> List[mx.array]:
+        mx.eval(params)
+        self.peak_gathered_bytes = max(self.peak_gathered_bytes, sum(p.nbytes for p in params))
+        return params
+
+    def _prefetch(self, i: int) -> Optional[List[mx.array]]:
+        if not self.prefetch or not 0 <= i < len(self.stages):
+            return None
+        params = self._gather(i)
+        mx.async_eval(params)
+        return params
+
+    def __call__(self, x: mx.array, keep_inputs: bool = False):
+        """Sharded forward pass; optionally returns every stage's input too"""
+        inputs = []
+        if keep_inputs:
+            self._seeds = []
+        upcoming = self._prefetch(0)
+        for i in range(len(self.stages)):
+            params = upcoming if upcoming is not None else self._gather(i)
+            upcoming = self._prefetch(i + 1)
+            self._load(i, self._materialize(params))
+            if keep_inputs:
+                inputs.append(x)
+                # Replay the same dropout masks when recomputing in backward
+                self._seeds.append(int(mx.random.randint(0, 2 ** 31 - 1, ()).item()))
+                mx.random.seed(self._seeds[i])
+            x = self.stages[i](x)
+            mx.eval(x)
+            self._release(i)
+            del params
+        return (x, inputs) if keep_inputs else x
+
+    def value_and_grad(self, x: mx.array, y: mx.array) -> Tuple[mx.array, Dict[str, mx.array]]:
+        """Loss and rank-averaged gradients for the owned parameter slices"""
+        output, inputs = self(x, keep_inputs=True)
+        loss, cotangent = mx.value_and_grad(lambda out: self.model.loss_fn(out, y))(output)
+        mx.eval(loss, cotangent)
+        del output
+
+        grads = {}
+        size = float(self.comm.size)
+        upcoming = self._prefetch(len(self.stages) - 1)
+        for i in reversed(range(len(self.stages))):
+            params = upcoming if upcoming is not None else self._gather(i)
+            upcoming = self._prefetch(i - 1)
+            params = self._materialize(params)
+
+            def stage_fn(*primals):
+                self._load(i, list(primals[:-1]))
+                return self.stages[i](primals[-1])
+
+            mx.random.seed(self._seeds[i])
+            _, vjps = mx.vjp(stage_fn, params + [inputs[i]], [cotangent])
+            param_grads = [g.astype(mx.float32) for g in vjps[:-1]]
+            buffer = flatten_bucket(param_grads)
+            pad = self.shards[f"stage_{i}"].size * self.comm.size - buffer.size
+            if pad:
+                buffer = mx.concatenate([buffer, mx.zeros((pad,), dtype=mx.float32)])
+            grads[f"stage_{i}"] = self.comm.reduce_scatter(buffer) / size
+            cotangent = vjps[-1]
+            mx.eval(grads[f"stage_{i}"], cotangent)
+
+            self._release(i)
+            inputs[i] = None
+            del params, vjps, param_grads, buffer
+        return loss, grads
+
+    def apply_gradients(self, optimizer: optim.Optimizer, grads: Dict[str, mx.array]):
+        """Update the owned parameter slices in place"""
+        self.shards = optimizer.apply_gradients(grads, self.shards)
+        mx.eval(self.shards)
+
+    def state_dict(self) -> Dict[str, mx.array]:
+        """Gather the full parameters in the model's layout (e.g. for export)
+
+        This materializes the whole model on this rank.
+        """
+        for i in range(len(self.stages)):
+            self._load(i, self._gather(i))
+        weights = dict(tree_flatten(self.model.parameters()))
+        mx.eval(weights)
+        for i in range(len(self.stages)):
+            self._release(i)
+        return weights
+
+    def parameters(self) -> Dict:
+        """The gathered full parameter tree, so checkpoints can take the wrapper as the model
+
+        Collective: every rank must call it.
+        """
+        return tree_unflatten(list(self.state_dict().items()))
+
+    def update(self, parameters: Dict):
+        """Re-shard full parameters (e.g. a checkpoint saved with any world size) onto this rank"""
+        flat = dict(tree_flatten(parameters))
+        for i, names in enumerate(self._names):
+            self.shards[f"stage_{i}"] = self._shard(flatten_bucket([flat[name].astype(mx.float32) for name in names]))
+        mx.eval(self.shards)
+
+    def optimizer_state_dict(self, optimizer: optim.Optimizer) -> Dict:
+        """The state of an optimizer stepping the shards, in the model's parameter layout
+
+        Matches `ZeROOptimizer.state_dict`, so the checkpoint is independent
+        of world size. Collective: every rank must call it.
+        """
+        flat = [(k, v) for k, v in optimizer.state.items() if not k.startswith("stage_")]
+        for i, layout in enumerate(self._layouts):
+            for field, shard in optimizer.state.get(f"stage_{i}", {}).items():
+                full = self.comm.all_gather(shard)[:self._numel(i)]
+                values = unflatten_bucket(full, [shape for _, shape, _ in layout])
+                flat.extend((f"{name}.{field}", value) for name, value in zip(self._names[i], values))
+        return tree_unflatten(flat)
+
+    def load_optimizer_state_dict(self, optimizer: optim.Optimizer, state: Dict):
+        """Slice an `optimizer_state_dict` back onto this rank's shards"""
+        flat = dict(tree_flatten(state))
+        for i, names in enumerate(self._names):
+            prefix = f"{names[0]}."
+            fields = [k[len(prefix):] for k in flat if k.startswith(prefix) and "." not in k[len(prefix):]]
+            optimizer.state[f"stage_{i}"] = {
+                field: self._shard(flatten_bucket([flat[f"{name}.{field}"].astype(mx.float32) for name in names]))
+                for field in fields
+            }
+        for key in ("step", "learning_rate"):
+            if key in state:
+                optimizer.state[key] = state[key]
+        mx.eval(optimizer.state)
+
+    def memory_stats(self) -> Dict[str, int]:
+        """Per-rank bytes of owned parameter slices and the largest gathered stage"""
+        return {
+            "shard_bytes": sum(s.nbytes for s in self.shards.values()),
+            "peak_gathered_bytes": self.peak_gathered_bytes
+        }
+
+
+class FSDPOptimizerState:
+    """Checkpoint view of an optimizer that steps `FullyShardedDataParallel` shards
+
+    Has the `state_dict`/`load_state_dict` pair of a `ZeROOptimizer`, so
+    `DistributedController` saves the gathered state and restores it into
+    the shards. Pass the FSDP wrapper itself as the model.
+    """
+
+    def __init__(self, fsdp: FullyShardedDataParallel, optimizer: optim.Optimizer):
+        self.fsdp = fsdp
+        self.optimizer = optimizer
+
+    @property
+    def state(self) -> Dict:
+        return self.state_dict()
+
+    def state_dict(self) -> Dict:
+        return self.fsdp.optimizer_state_dict(self.optimizer)
+
+    def load_state_dict(self, model, state: Dict):
+        self.fsdp.load_optimizer_state_dict(self.optimizer, state)
+
+    def load_sharded(self, model, reader):
+        self.load_state_dict(model, reader.read_tree("optimizer"))
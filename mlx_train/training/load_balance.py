@@ -0,0 +1,101 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+import mlx.core as mx
+from mlx.utils import tree_map
+from mlx_train.core.distributed import Communicator, get_communicator
+
+class LoadBalancer:
+    """Per-rank micro-batch sizing for data parallelism on mixed hardware
+
+    The global batch is split in proportion to each rank's throughput, so a
+    fast M3 Max no longer waits on an M1 Air every step. Sizes start from
+    the ranks' estimated TFLOPS and are re-fit after every step from the
+    measured compute times (an exponential moving average of samples/s).
+    Call `weight_gradients` before the all-reduce so the averaged gradient
+    is still exactly the global-batch mean. A short final batch is split in
+    the same proportions; it needs at least one sample per rank.
+    """
+
+    def __init__(
+        self,
+        global_batch_size: int,
+        capabilities: Sequence[float],
+        communicator: Optional[Communicator] = None,
+        smoothing: float = 0.5
+    ):
+        self.comm = communicator if communicator is not None else get_communicator()
+        if len(capabilities) != self.comm.size:
+            raise ValueError(f"Need one capability per rank ({self.comm.size}), got {len(capabilities)}")
+        if global_batch_size < self.comm.size:
+            raise ValueError("Global batch size must give every rank at least one sample")
+        self.global_batch_size = global_batch_size
+        self.smoothing = smoothing
+        self.throughput = [float(c) for c in capabilities]  # Relative until the first measurement
+        self._measured = False
+        self.sizes = self._split(self.throughput)
+        # Split of the batch last passed to `shard_batch` (shorter than `sizes` at the end of an epoch)
+        self.step_sizes = list(self.sizes)
+        self.last_idle: Optional[List[float]] = None
+
+    def _split(self, weights: Sequence[float], batch_size: Optional[int] = None) -> List[int]:
+        """Largest-remainder split of a batch (the global one by default), at least one sample per rank"""
+        batch_size = self.global_batch_size if batch_size is None else batch_size
+        total = sum(weights)
+        shares = [batch_size * w / total for w in weights]
+        sizes = [int(share) for share in shares]
+        by_remainder = sorted(range(len(weights)), key=lambda r: sizes[r] - shares[r])
+        for r in by_remainder[:batch_size - sum(sizes)]:
+            sizes[r] += 1
+        for r in range(len(sizes)):
+            if sizes[r] == 0:
+                sizes[r] = 1
+                sizes[sizes.index(max(sizes))] -= 1
+        return sizes
+
+    @property
+    def local_batch_size(self) -> int:
+        return self.sizes[self.comm.rank]
+
+    def shard_batch(self, batch: Tuple[mx.array, ...]) -> Tuple[mx.array, ...]:
+        """This rank's slice of a global batch, re-split in proportion if the batch is short"""
+        batch_size = len(batch[0])
+        if batch_size < self.comm.size:
+            raise ValueError(f"A batch of {batch_size} can't give each of {self.comm.size} ranks a sample")
+        if batch_size == self.global_batch_size:
+            self.step_sizes = self.sizes
+        else:
+            self.step_sizes = self._split(self.throughput, batch_size)
+        start = sum(self.step_sizes[:self.comm.rank])
+        return tuple(x[start:start + self.step_sizes[self.comm.rank]] for x in batch)
+
+    def weight_gradients(self, grads):
+        """Scale mean-reduced local gradients so the rank average is the mean over the batch"""
+        weight = self.step_sizes[self.comm.rank] * self.comm.size / sum(self.step_sizes)
+        return tree_map(lambda g: g * weight, grads)
+
+    def record_step(self, compute_time: float) -> Dict[str, List[float]]:
+        """Share this rank's compute time, update throughput estimates and rebalance"""
+        times = self.comm.all_gather(mx.array([compute_time], dtype=mx.float32)).tolist()
+        slowest = max(times)
+        self.last_idle = [slowest - t for t in times]
+
+        measured = [size / max(t, 1e-9) for size, t in zip(self.step_sizes, times)]
+        if self._measured:
+            self.throughput = [
+                (1 - self.smoothing) * old + self.smoothing * new
+                for old, new in zip(self.throughput, measured)
+            ]
+        else:
+            # TFLOPS estimates only set the initial ratio; switch to samples/s
+            self.throughput = measured
+            self._measured = True
+        self.sizes = self._split(self.throughput)
+        self.step_sizes = self.sizes
+        return {"sizes": list(self.sizes), "idle_time": self.last_idle}
+
+    def unbalanced_idle(self) -> Optional[List[float]]:
+        """Per-rank idle seconds an even batch split would cause at measured throughput"""
+        if not self._measured:
+            return None
+        even = self.global_batch_size / self.comm.size
+        times = [even / t for t in self.throughput]
+        return [max(times) - t for t in times]
@@ -0,0 +1,85 @@
+from typing import Dict, Optional
+import mlx.core as mx
+import mlx.nn as nn
+import mlx.optimizers as optim
+from mlx.utils import tree_flatten, tree_map
+from mlx_train.training.distributed import DistributedController
+
+class LocalSGD:
+    """Local SGD / DiLoCo: H local optimizer steps between parameter syncs
+
+    Every rank trains its own replica with the inner optimizer and no
+    per-step gradient all-reduce. Every `sync_every` steps the ranks average
+    their parameter deltas since the last sync (through the controller's
+    bucketed, optionally compressed, all-reduce). Without an outer optimizer
+    the replicas jump to the average; with `outer_lr` set the averaged delta
+    is applied as a pseudo-gradient with Nesterov momentum (DiLoCo).
+    """
+
+    def __init__(
+        self,
+        model: nn.Module,
+        optimizer: optim.Optimizer,
+        controller: DistributedController,
+        sync_every: int = 8,
+        outer_lr: Optional[float] = None,
+        outer_momentum: float = 0.9
+    ):
+        if sync_every < 1:
+            raise ValueError("sync_every must be at least 1")
+        self.model = model
+        self.optimizer = optimizer
+        self.controller = controller
+        self.sync_every = sync_every
+        self.outer = (
+            optim.SGD(learning_rate=outer_lr, momentum=outer_momentum, nesterov=True)
+            if outer_lr is not None else None
+        )
+        # Parameters as of the last sync, identical on every rank
+        self.anchor = tree_map(lambda p: mx.array(p), model.trainable_parameters())
+        self.local_steps = 0
+        self.syncs = 0
+        self.tokens = 0
+        self.bytes_sent = 0
+
+    def step(self, grads: Dict, num_tokens: int):
+        """Apply a local optimizer step and synchronize every `sync_every` steps"""
+        self.optimizer.update(self.model, grads)
+        self.local_steps += 1
+        self.tokens += num_tokens
+        if self.local_steps % self.sync_every == 0:
+            self.synchronize()
+
+    def synchronize(self):
+        """Average the parameter deltas across ranks and update the replicas"""
+        delta = tree_map(lambda a, p: a - p, self.anchor, self.model.trainable_parameters())
+        sent_before = self.controller.communication_stats()["bytes_sent"]
+        delta = self.controller.all_reduce_grads(delta)
+        if self.controller.size == 1:
+            # The controller skips the collective for a single rank
+            delta_bytes = sum(d.nbytes for _, d in tree_flatten(delta))
+        else:
+            delta_bytes = self.controller.communication_stats()["bytes_sent"] - sent_before
+        self.bytes_sent += delta_bytes
+
+        if self.outer is not None:
+            params = self.outer.apply_gradients(delta, self.anchor)
+        else:
+            params = tree_map(lambda d, a: a - d, delta, self.anchor)
+        self.model.update(params)
+        self.anchor = params
+        mx.eval(self.anchor)
+        self.syncs += 1
+
+    def communication_stats(self) -> Dict[str, float]:
+        """Bytes on the wire per token, against per-step data-parallel all-reduce"""
+        param_bytes = sum(p.nbytes for _, p in tree_flatten(self.anchor))
+        tokens = max(self.tokens, 1)
+        data_parallel = self.local_steps * param_bytes / tokens
+        local = self.bytes_sent / tokens
+        return {
+            "syncs": self.syncs,
+            "bytes_per_token": local,
+            "data_parallel_bytes_per_token": data_parallel,
+            "reduction": data_parallel / local if local else float("inf")
+        }
@@ -1,7 +1,7 @@
 import mlx.core as mx
 import mlx.nn as nn
 import mlx.optimizers as optim
-from typing import Dict
+from typing import Dict, Optional
 from pathlib import Path
 import time
 from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn
@@ -13,83 +13,358 @@ from rich.panel import Panel
 import numpy as np
 from rich.prompt import Confirm
 from mlx_train.training.visualization import TrainingMetrics, TrainingVisualizer
-from core.distributed import DistributedController
-from data.manager import DatasetManager
+from mlx_train.training.distributed import DistributedController
+from mlx_train.training.checkpoint import RetentionPolicy
+from mlx_train.training.zero import ZeROOptimizer
+from mlx_train.training.fsdp import FSDPOptimizerState, FullyShardedDataParallel
+from mlx_train.training.load_balance import LoadBalancer
+from mlx_train.training.local_sgd import LocalSGD
+from mlx_train.training.state import restore_training_state, training_state
+from mlx_train.core.hardware import HardwareConfig
+from mlx_train.utils.memory import MemoryOptimizer
+from mlx_train.utils.metrics import DistributedMetricsTracker, model_flops_utilization
+from mlx_train.models.builder import ModelBuilder
+from mlx_train.models.architectures.tensor_parallel import TensorParallelOptimizerState, TensorParallelState
+from mlx_train.data.manager import DatasetManager
+from mlx_train.data.sampler import ResumableSampler
 
 console = Console()
 
 class TrainingOrchestrator:
-    def __init__(self, config: Dict):
+    """Config-driven training loop with live monitoring
+
+    Builds the model from the flat project config unless one is passed,
+    and switches on the distributed features by config key: `zero_stage`,
+    `fsdp`, `load_balance`, `local_sgd`, `telemetry`, `tensor_parallel`,
+    the checkpoint options and `resume`. Batches come from a
+    `ResumableSampler`, so a resumed run continues at the saved sample.
+    """
+
+    def __init__(
+        self,
+        config: Dict,
+        model: Optional[nn.Module] = None,
+        distributed: Optional[DistributedController] = None
+    ):
         self.config = config
-        self.distributed = DistributedController()
+        self.distributed = distributed if distributed is not None else DistributedController(
+            checkpoint_dir=config.get("checkpoint_dir", "checkpoints"),
+            async_checkpoints=config.get("async_checkpoints", 0),
+            sharded_checkpoints=config.get("sharded_checkpoints", False),
+            incremental_checkpoints=config.get("incremental_checkpoints", False),
+            retention=RetentionPolicy(**config["retention"]) if config.get("retention") else None
+        )
         
         # Initialize components
-        self.model = self._build_model()
+        self.model = model if model is not None else self._build_model()
+        # Syncs and checkpoints see a tensor-parallel model's shards gathered into full tensors
+        self.tensor_parallel = TensorParallelState(
+            self.model, self.distributed.comm
+        ) if config.get("tensor_parallel") else None
+        # Start every replica from rank 0's weights (each rank keeps its own shard of them)
+        self.distributed.synchronize_model(self.tensor_parallel if self.tensor_parallel is not None else self.model)
         self.optimizer = self._setup_optimizer()
+        # Shard parameters across ranks when the model doesn't fit on one device
+        self.fsdp = FullyShardedDataParallel(self.model, self.distributed.comm) if config.get("fsdp") else None
+        self.balancer = self._setup_load_balancer() if config.get("load_balance") else None
+        # Infrequent parameter averaging for slow links
+        self.local_sgd = LocalSGD(
+            self.model, self.optimizer, self.distributed, **config["local_sgd"]
+        ) if config.get("local_sgd") else None
+        # Per-rank compute / collective-wait timings to spot slow machines
+        telemetry = config.get("telemetry")
+        self.telemetry = DistributedMetricsTracker(
+            self.distributed.size,
+            communicator=self.distributed.comm,
+            log_path=self.distributed.checkpoint_dir / "telemetry.jsonl",
+            **(telemetry if isinstance(telemetry, dict) else {})
+        ) if telemetry else None
+        if self.balancer is not None:
+            # Read global batches and let the balancer split them across ranks
+            config = {**config, "batch_size": self.balancer.global_batch_size}
         self.dataset = DatasetManager(config)
+        # ResumableSampler driving the dataloader (built in `train`); its cursor is checkpointed
+        self.sampler = None
         
         # Training state
         self.start_time = None
+        self.global_step = 0
         self.samples_processed = 0
+        self.sequence_length = None  # Tokens per sample, for MFU
         self.current_epoch = 0
+        self.current_loss = float('nan')
         self.best_loss = float('inf')
         
-    def train(self):
-        """Run training with live monitoring"""
+        if config.get("resume"):
+            # Checkpoints re-shard onto the current world size (elastic restart)
+            _, self.current_epoch = self.distributed.load_checkpoint(*self._checkpoint_targets())
+            self.samples_processed = self.distributed.resume_state.get("samples_processed", 0)
+            if self.fsdp is None and self.tensor_parallel is None:
+                self.model = self.distributed.synchronize_model(self.model)
+        
+    def train(self, dataset) -> Optional[Dict]:
+        """Train for `num_epochs` with live monitoring; returns the last epoch's metrics"""
+        self.sampler = self._setup_sampler(len(dataset))
+        if self.config.get("resume"):
+            # Step, data position and RNG, so the run continues mid-epoch exactly
+            self.global_step = restore_training_state(
+                self.distributed.resume_state.get("training_state"), sampler=self.sampler
+            )
+        
         visualizer = TrainingVisualizer(
             num_devices=self.distributed.size,
-            config=self.config
+            config={**self.config, "current_epoch": self.current_epoch}
         )
+        self.start_time = time.time()
+        epoch_metrics = None
         
-        with Live(refresh_per_second=1) as live:
+        with Live(refresh_per_second=1, console=console) as live:
             for epoch in range(self.current_epoch, self.config["num_epochs"]):
+                visualizer.config["current_epoch"] = epoch
                 try:
-                    # Training loop
+                    epoch_metrics = self._train_epoch(dataset)
+                    self.current_loss = epoch_metrics["loss"]
+                    self.best_loss = min(self.best_loss, self.current_loss)
+                    
                     metrics = TrainingMetrics(
                         loss=self.current_loss,
-                        learning_rate=self.optimizer.learning_rate,
-                        samples_per_second=self.samples_processed / (time.time() - self.start_time),
-                        memory_used=mx.metal.get_active_memory() / 1e9,  # GB
-                        memory_total=self.config["hardware"]["memory_per_device"],
+                        learning_rate=float(self.optimizer.learning_rate),
+                        samples_per_second=epoch_metrics["samples_per_second"],
+                        memory_used=mx.get_active_memory() / 1e9,  # GB
+                        memory_total=self.config.get("memory_per_device", HardwareConfig().total_memory_gb),
                         device_utilization=self._get_device_utilization(),
-                        network_bandwidth=self._get_network_bandwidth() if self.distributed.size > 1 else None
+                        network_bandwidth=self._get_network_bandwidth() if self.distributed.size > 1 else None,
+                        idle_time=self.balancer.last_idle if self.balancer else None,
+                        idle_time_unbalanced=self.balancer.unbalanced_idle() if self.balancer else None,
+                        rank_timings=[
+                            self.telemetry.device_metrics[r] for r in range(self.distributed.size)
+                        ] if self.telemetry else None,
+                        stragglers=self.telemetry.stragglers() if self.telemetry else None,
+                        mfu=self._model_flops_utilization()
                     )
                     
                     # Update visualization
                     live.update(visualizer.generate_view(metrics))
                     visualizer.history.append(metrics)
                     
+                    # The sampler has rolled over, so a resume starts the next epoch
+                    self.current_epoch = epoch + 1
+                    self._save_checkpoint(epoch_metrics)
+                    
                 except Exception as e:
                     self._handle_training_error(e)
+                
+                if not self._check_training_health(epoch_metrics):
+                    break
+        
+        self.distributed.wait_for_checkpoints()
+        return epoch_metrics
     
-    def _train_epoch(self) -> Dict:
-        """Train single epoch with progress tracking"""
+    def _setup_sampler(self, num_samples: int) -> ResumableSampler:
+        """Sampler over the dataset, sliced per rank where ranks train on different data"""
+        seed = self.config.get("seed", 0)
+        if self.balancer is not None or self.config.get("tensor_parallel"):
+            # Every rank reads the same batch: the balancer slices it, tensor parallelism shares it
+            return ResumableSampler(num_samples, self.dataset.batch_size, seed=seed)
+        return ResumableSampler(
+            num_samples,
+            self.dataset.batch_size,
+            seed=seed,
+            rank=self.distributed.rank,
+            world_size=self.distributed.size
+        )
+    
+    def _train_epoch(self, dataset) -> Dict:
+        """Train the rest of the sampler's current epoch"""
         total_loss = 0
         num_batches = 0
         
-        for batch in self.dataset.get_batches():
-            # Forward pass and loss
+        for batch in self.dataset.get_dataloader(dataset, sampler=self.sampler):
+            self.sequence_length = batch[0].shape[-1]
+            if self.fsdp is not None:
+                # Gradients come back reduce-scattered onto this rank's shard
+                loss, grads = self.fsdp.value_and_grad(*batch)
+                self.fsdp.apply_gradients(self.optimizer, grads)
+                total_loss += loss.item()
+                num_batches += 1
+                self.global_step += 1
+                self.samples_processed += len(batch[0])
+                self._step_checkpoint(total_loss / num_batches)
+                continue
+            
+            if self.balancer is not None:
+                if len(batch[0]) < self.distributed.size:
+                    # Too short to give every rank a sample; all ranks see it and skip it together
+                    continue
+                # Batches are global; this rank takes a throughput-sized slice
+                batch = self.balancer.shard_batch(batch)
+            step_start = time.time()
+            
+            # Forward pass and loss (lazy: nothing is computed yet)
             loss, grads = self._compute_loss_and_grads(batch)
             
-            # All-reduce gradients
-            grads = self.distributed.all_reduce_grads(grads)
+            if self.balancer is not None or self.telemetry is not None:
+                # Materialize gradients so compute is timed apart from communication
+                mx.eval(loss, grads)
+            compute_time = time.time() - step_start
+            
+            if self.balancer is not None:
+                self.balancer.record_step(compute_time)
+                grads = self.balancer.weight_gradients(grads)
+            
+            # All-reduce gradients bucket by bucket, overlapping with backward
+            # (ZeRO reduces inside its update, Local SGD only every few steps,
+            # and tensor-parallel ranks already hold the full batch's gradients)
+            wait_start = time.time()
+            if (not isinstance(self.optimizer, ZeROOptimizer) and self.local_sgd is None
+                    and not self.config.get("tensor_parallel")):
+                pending = self.distributed.all_reduce_grads_async(grads)
+                grads = pending.wait()
             
-            # Update model
-            self.optimizer.apply_gradients(self.model, grads)
+            wait_time = time.time() - wait_start
+            
+            # Update model (only trainable parameters, e.g. LoRA adapters)
+            if self.local_sgd is not None:
+                x = batch[0]
+                num_tokens = x.size if mx.issubdtype(x.dtype, mx.integer) else len(x)
+                self.local_sgd.step(grads, num_tokens)
+            elif isinstance(self.optimizer, ZeROOptimizer):
+                # The reduce-scatter and all-gather run inside the update: time it as communication
+                update_start = time.time()
+                self.optimizer.update(self.model, grads)
+                mx.eval(self.model.parameters())
+                wait_time += time.time() - update_start
+            else:
+                self.optimizer.update(self.model, grads)
+            
+            if self.telemetry is not None:
+                self.telemetry.record_step(compute_time, wait_time)
             
             # Update metrics
             total_loss += loss.item()
             num_batches += 1
+            self.global_step += 1
             self.samples_processed += len(batch[0])
             
             # Evaluate gradients
             mx.eval(self.model.parameters())
             
+            self._step_checkpoint(total_loss / num_batches)
+            
+        if num_batches == 0:
+            raise ValueError("The dataset yielded no batches for this epoch")
         return {
             "loss": total_loss / num_batches,
             "samples_per_second": self.samples_processed / (time.time() - self.start_time)
         }
     
+    def _step_checkpoint(self, loss: float):
+        """Checkpoint every `checkpoint_every` steps; `train` saves the end of each epoch"""
+        every = self.config.get("checkpoint_every")
+        if every and self.global_step % every == 0 and self.sampler.cursor < self.sampler.num_samples:
+            self._save_checkpoint({"loss": loss}, step=self.global_step)
+    
+    def _save_checkpoint(self, metrics: Dict, step: Optional[int] = None):
+        """Checkpoint weights, optimizer and everything needed to resume mid-epoch"""
+        self.distributed.save_checkpoint(
+            *self._checkpoint_targets(),
+            self.current_epoch,
+            metrics,
+            samples_processed=self.samples_processed,
+            training_state=training_state(self.global_step, sampler=self.sampler),
+            step=step
+        )
+    
+    def _checkpoint_targets(self):
+        """Model and optimizer as checkpoints see them: full tensors, restored into FSDP or TP shards"""
+        if self.fsdp is not None:
+            return self.fsdp, FSDPOptimizerState(self.fsdp, self.optimizer)
+        if self.tensor_parallel is not None:
+            return self.tensor_parallel, TensorParallelOptimizerState(self.tensor_parallel, self.optimizer)
+        return self.model, self.optimizer
+
+    def _build_model(self) -> nn.Module:
+        """Build the configured model, sharded over the ranks if `tensor_parallel` is set"""
+        return ModelBuilder.build(
+            self.config,
+            model_type=self.config.get("model_type", "simple"),
+            pretrained=bool(self.config.get("pretrained_path")),
+            quantize=self.config.get("quantize", False),
+            lora=bool(self.config.get("lora")),
+            communicator=self.distributed.comm
+        )
+    
+    def _get_device_utilization(self) -> Optional[float]:
+        """Share of step time spent computing rather than waiting on collectives, in percent"""
+        if self.telemetry is None or not self.telemetry.compute_times:
+            return None
+        compute = float(np.mean(self.telemetry.compute_times))
+        wait = float(np.mean(self.telemetry.wait_times))
+        return 100 * compute / (compute + wait) if compute + wait > 0 else None
+    
+    def _handle_training_error(self, error: Exception):
+        """Report the failure, suggest a smaller configuration on OOM and re-raise
+
+        Pending background checkpoint writes are finished first, so the run
+        can be resumed from the last save.
+        """
+        console.print(f"[red]Error in epoch {self.current_epoch + 1}: {error}[/red]")
+        self.distributed.wait_for_checkpoints()
+        if "memory" in str(error).lower() and "batch_size" in self.config:
+            suggestion = MemoryOptimizer.suggest_recovery_config(
+                {"optimizer": "adamw", **self.config}
+            )
+            console.print(f"[yellow]Warning: try batch_size={suggestion['batch_size']} with gradient checkpointing[/yellow]")
+        raise error
+    
+    def _model_flops_utilization(self) -> Optional[float]:
+        """This rank's MFU, for models that report `flops_per_token`"""
+        if not hasattr(self.model, "flops_per_token") or self.sequence_length is None:
+            return None
+        tokens_per_second = self.samples_processed * self.sequence_length / (time.time() - self.start_time)
+        return model_flops_utilization(
+            tokens_per_second,
+            self.model.flops_per_token(self.sequence_length),
+            HardwareConfig().total_tflops
+        )
+    
+    def _setup_load_balancer(self) -> LoadBalancer:
+        """Size per-rank micro-batches from every rank's estimated TFLOPS"""
+        local_tflops = mx.array([HardwareConfig().total_tflops])
+        capabilities = self.distributed.comm.all_gather(local_tflops).tolist()
+        return LoadBalancer(
+            global_batch_size=self.config["batch_size"] * self.distributed.size,
+            capabilities=capabilities,
+            communicator=self.distributed.comm
+        )
+    
+    def _setup_optimizer(self):
+        """Create the optimizer, sharded across ranks if `zero_stage` is set"""
+        optimizer = optim.AdamW(learning_rate=self.config.get("learning_rate", 1e-4))
+        zero_stage = self.config.get("zero_stage", 0)
+        if zero_stage:
+            return ZeROOptimizer(
+                optimizer,
+                self.distributed.comm,
+                stage=zero_stage,
+                bucket_size_mb=self.distributed.bucket_size_mb
+            )
+        return optimizer
+    
+    def _get_network_bandwidth(self) -> float:
+        """Gradient traffic in MB/s measured since the last dashboard refresh"""
+        return self.distributed.network_bandwidth()
+
+    def _compute_loss_and_grads(self, batch):
+        """Compute loss and gradients w.r.t. trainable parameters only"""
+        x, y = batch
+
+        def loss_fn(model, x, y):
+            # Lets models fuse their output layer into the loss
+            return model.loss(x, y)
+
+        return nn.value_and_grad(self.model, loss_fn)(self.model, x, y)
+    
     def _generate_training_view(self) -> Layout:
         """Generate comprehensive training view"""
         layout = Layout()
@@ -0,0 +1,282 @@
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+import mlx.core as mx
+import mlx.nn as nn
+import mlx.optimizers as optim
+from mlx.utils import tree_flatten, tree_map
+from mlx_train.core.distributed import Communicator, get_communicator
+from mlx_train.core.hardware import HardwareConfig
+from mlx_train.models.base import BaseModel
+
+# Activation dtypes that can cross a pipeline boundary
+_DTYPES = [mx.float32, mx.float16, mx.bfloat16]
+_MAX_NDIM = 8
+
+def measure_tflops(size: int = 1024, iterations: int = 10) -> float:
+    """Measure achieved fp32 matmul TFLOPS on the default device"""
+    a = mx.random.normal((size, size))
+    b = mx.random.normal((size, size))
+    mx.eval(a @ b)  # Warm up
+    start = time.perf_counter()
+    for _ in range(iterations):
+        mx.eval(a @ b)
+    elapsed = time.perf_counter() - start
+    return 2 * size ** 3 * iterations / elapsed / 1e12
+
+def partition_stages(
+    costs: Sequence[float],
+    capabilities: Sequence[float],
+    memory: Optional[Sequence[float]] = None,
+    memory_limits: Optional[Sequence[float]] = None
+) -> List[Tuple[int, int]]:
+    """Split consecutive layers into one contiguous `[start, end)` range per node
+
+    Minimizes the slowest node's time (`sum(costs) / capability`), so faster
+    nodes get proportionally more layers, while keeping each node's
+    `sum(memory)` within its `memory_limits`.
+    """
+    n, k = len(costs), len(capabilities)
+    if n < k:
+        raise ValueError(f"Cannot split {n} layers across {k} pipeline stages")
+    memory = memory or [0.0] * n
+    inf = float("inf")
+
+    prefix_cost = [0.0]
+    prefix_memory = [0.0]
+    for cost, mem in zip(costs, memory):
+        prefix_cost.append(prefix_cost[-1] + cost)
+        prefix_memory.append(prefix_memory[-1] + mem)
+
+    # best[j][i]: smallest bottleneck placing the first i layers on the first j nodes
+    best = [[inf] * (n + 1) for _ in range(k + 1)]
+    split = [[0] * (n + 1) for _ in range(k + 1)]
+    best[0][0] = 0.0
+    for j in range(1, k + 1):
+        for i in range(j, n - (k - j) + 1):
+            for s in range(j - 1, i):
+                if memory_limits and prefix_memory[i] - prefix_memory[s] > memory_limits[j - 1]:
+                    continue
+                bottleneck = max(best[j - 1][s], (prefix_cost[i] - prefix_cost[s]) / capabilities[j - 1])
+                if bottleneck < best[j][i]:
+                    best[j][i], split[j][i] = bottleneck, s
+
+    if best[k][n] == inf:
+        raise ValueError("Model does not fit in the pipeline's combined memory")
+
+    ranges = []
+    end = n
+    for j in range(k, 0, -1):
+        start = split[j][end]
+        ranges.append((start, end))
+        end = start
+    return ranges[::-1]
+
+def one_f_one_b(num_stages: int, num_microbatches: int) -> List[List[Tuple[str, int]]]:
+    """Per-stage op order ("F"/"B", micro-batch) of the 1F1B schedule
+
+    Stage s runs `num_stages - s - 1` warm-up forwards, then alternates one
+    forward with one backward, then drains the remaining backwards. At most
+    `num_stages - s` micro-batches of activations are live per stage.
+    """
+    schedule = []
+    for stage in range(num_stages):
+        warmup = min(num_stages - stage - 1, num_microbatches)
+        ops = [("F", m) for m in range(warmup)]
+        forward, backward = warmup, 0
+        while forward < num_microbatches:
+            ops.append(("F", forward))
+            ops.append(("B", backward))
+            forward += 1
+            backward += 1
+        ops.extend(("B", m) for m in range(backward, num_microbatches))
+        schedule.append(ops)
+    return schedule
+
+def simulate_schedule(
+    schedule: List[List[Tuple[str, int]]],
+    forward_times: Sequence[float],
+    backward_times: Sequence[float]
+) -> Dict[str, float]:
+    """Replay a pipeline schedule with per-stage op times and report the bubble
+
+    The bubble fraction is the share of stage-time spent idle waiting on
+    neighbours: `1 - busy / (num_stages * makespan)`.
+    """
+    num_stages = len(schedule)
+    finished: Dict[Tuple[str, int, int], float] = {}
+    clock = [0.0] * num_stages
+    position = [0] * num_stages
+    busy = [0.0] * num_stages
+
+    while any(position[s] < len(schedule[s]) for s in range(num_stages)):
+        progressed = False
+        for s in range(num_stages):
+            if position[s] == len(schedule[s]):
+                continue
+            op, m = schedule[s][position[s]]
+            if op == "F":
+                dependency = ("F", s - 1, m) if s > 0 else None
+                duration = forward_times[s]
+            else:
+                dependency = ("B", s + 1, m) if s < num_stages - 1 else ("F", s, m)
+                duration = backward_times[s]
+            if dependency is not None and dependency not in finished:
+                continue
+            start = max(clock[s], finished.get(dependency, 0.0))
+            clock[s] = start + duration
+            finished[(op, s, m)] = clock[s]
+            busy[s] += duration
+            position[s] += 1
+            progressed = True
+        if not progressed:
+            raise RuntimeError("Pipeline schedule deadlocks")
+
+    makespan = max(clock)
+    return {
+        "makespan": makespan,
+        "bubble_fraction": 1 - sum(busy) / (num_stages * makespan) if makespan else 0.0,
+        "stage_busy": busy
+    }
+
+class PipelineParallel:
+    """Capability-weighted 1F1B pipeline parallelism over `BaseModel.stages()`
+
+    Rank r runs a contiguous range of stages. Ranges come from
+    `partition_stages`, weighting each node by its TFLOPS (from its
+    `HardwareConfig`, or measured with `measure_tflops`) and bounding it by
+    its memory, so a mixed cluster runs at its aggregate pace instead of the
+    slowest node's. Activations and their gradients move between neighbours
+    with point-to-point send/recv, ordered so that sends which block until
+    the peer receives (rendezvous transports) can't deadlock.
+    """
+
+    def __init__(
+        self,
+        model: BaseModel,
+        hardware: Sequence[HardwareConfig],
+        communicator: Optional[Communicator] = None,
+        num_microbatches: int = 4,
+        capabilities: Optional[Sequence[float]] = None
+    ):
+        self.model = model
+        self.comm = communicator if communicator is not None else get_communicator()
+        if len(hardware) != self.comm.size:
+            raise ValueError(f"Need one HardwareConfig per rank ({self.comm.size}), got {len(hardware)}")
+        self.num_microbatches = num_microbatches
+        self.capabilities = list(capabilities or [hw.total_tflops for hw in hardware])
+
+        stages = model.stages()
+        # Parameter count as a proxy for per-token FLOPs; params, grads and
+        # Adam moments in fp32 for memory
+        costs = [max(1, sum(p.size for _, p in tree_flatten(stage.parameters()))) for stage in stages]
+        memory = [cost * 16 / 1024 ** 3 for cost in costs]
+        self.partition = partition_stages(costs, self.capabilities, memory, [hw.total_memory_gb for hw in hardware])
+
+        start, end = self.partition[self.comm.rank]
+        self.local = nn.Sequential(*stages[start:end])
+        self.is_first = self.comm.rank == 0
+        self.is_last = self.comm.rank == self.comm.size - 1
+
+        full_schedule = one_f_one_b(self.comm.size, num_microbatches)
+        self.schedule = full_schedule[self.comm.rank]
+        stage_times = [
+            sum(costs[s:e]) / capability
+            for (s, e), capability in zip(self.partition, self.capabilities)
+        ]
+        # Backward costs about twice the forward
+        self.plan = simulate_schedule(full_schedule, stage_times, [2 * t for t in stage_times])
+
+    def _send(self, x: mx.array, dst: int):
+        header = [x.ndim, _DTYPES.index(x.dtype)] + list(x.shape) + [0] * (_MAX_NDIM - x.ndim)
+        self.comm.send(mx.array(header, dtype=mx.int32), dst)
+        self.comm.send(x, dst)
+
+    def _recv(self, src: int) -> mx.array:
+        header = self.comm.recv((_MAX_NDIM + 2,), mx.int32, src).tolist()
+        ndim, dtype = header[0], _DTYPES[header[1]]
+        return self.comm.recv(tuple(header[2:2 + ndim]), dtype, src)
+
+    def train_step(self, x: mx.array, y: mx.array, optimizer: optim.Optimizer) -> Dict[str, float]:
+        """Run one 1F1B step over `num_microbatches` and update the local stages
+
+        Every rank passes the same batch; only the first stage reads `x` and
+        only the last reads `y`. Returns the loss and the measured bubble
+        (time spent waiting on neighbours) next to the planned one.
+        """
+        m_count = self.num_microbatches
+        xs = mx.split(x, m_count) if self.is_first else None
+        ys = mx.split(y, m_count) if self.is_last else None
+        params = self.local.trainable_parameters()
+
+        inputs, cotangents, seeds, received = {}, {}, {}, {}
+        grads = None
+        loss_total = mx.array(0.0)
+        idle = 0.0
+        step_start = time.perf_counter()
+
+        def stage_fn(p, h, cotangent):
+            self.local.update(p)
+            return (self.local(h) * cotangent).sum()
+
+        for index, (op, m) in enumerate(self.schedule):
+            if op == "F":
+                wait_start = time.perf_counter()
+                if self.is_first:
+                    h = xs[m]
+                else:
+                    h = received.pop(m) if m in received else self._recv(self.comm.rank - 1)
+                idle += time.perf_counter() - wait_start
+
+                # Replay the same dropout masks when recomputing in backward
+                seeds[m] = int(mx.random.randint(0, 2 ** 31 - 1, ()).item())
+                mx.random.seed(seeds[m])
+                out = self.local(h)
+                mx.eval(out)
+                inputs[m] = h
+
+                if self.is_last:
+                    loss, cotangent = mx.value_and_grad(
+                        lambda o: self.model.loss_fn(o, ys[m]) / m_count
+                    )(out)
+                    mx.eval(loss, cotangent)
+                    loss_total = loss_total + loss
+                    cotangents[m] = cotangent
+                else:
+                    wait_start = time.perf_counter()
+                    self._send(out, self.comm.rank + 1)
+                    idle += time.perf_counter() - wait_start
+            else:
+                wait_start = time.perf_counter()
+                cotangent = cotangents.pop(m) if self.is_last else self._recv(self.comm.rank + 1)
+                idle += time.perf_counter() - wait_start
+
+                mx.random.seed(seeds.pop(m))
+                param_grads, input_grad = mx.grad(stage_fn, argnums=(0, 1))(params, inputs.pop(m), cotangent)
+                self.local.update(params)
+                grads = param_grads if grads is None else tree_map(lambda a, b: a + b, grads, param_grads)
+                mx.eval(grads, input_grad)
+
+                if not self.is_first:
+                    wait_start = time.perf_counter()
+                    # The previous stage sends the next activation before it
+                    # receives this gradient, so take the activation first or
+                    # blocking (rendezvous) sends deadlock
+                    following = self.schedule[index + 1] if index + 1 < len(self.schedule) else None
+                    if following is not None and following[0] == "F":
+                        received[following[1]] = self._recv(self.comm.rank - 1)
+                    self._send(input_grad, self.comm.rank - 1)
+                    idle += time.perf_counter() - wait_start
+
+        if grads is not None:
+            optimizer.update(self.local, grads)
+            mx.eval(self.local.parameters())
+        step_time = time.perf_counter() - step_start
+
+        loss_total = self.comm.broadcast(loss_total, root=self.comm.size - 1)
+        return {
+            "loss": loss_total.item(),
+            "step_time": step_time,
+            "idle_time": idle,
+            "bubble_fraction": idle / step_time if step_time else 0.0,
+            "planned_bubble_fraction": self.plan["bubble_fraction"]
+        }
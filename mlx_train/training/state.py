@@ -0,0 +1,65 @@
+from typing import Dict, Optional
+import mlx.core as mx
+import numpy as np
+
+def rng_state() -> Dict:
+    """The global MLX key and NumPy generator state, as JSON-serializable data"""
+    name, keys, pos, has_gauss, cached_gaussian = np.random.get_state()
+    return {
+        "mlx": mx.random.state[0].tolist(),
+        "numpy": {
+            "bit_generator": name,
+            "keys": keys.tolist(),
+            "pos": pos,
+            "has_gauss": has_gauss,
+            "cached_gaussian": cached_gaussian
+        }
+    }
+
+def set_rng_state(state: Dict):
+    """Restore the random state captured by `rng_state`"""
+    hi, lo = state["mlx"]
+    # Seeding with a 64-bit value sets the key to its (high, low) words
+    mx.random.seed((hi << 32) | lo)
+    numpy_state = state["numpy"]
+    np.random.set_state((
+        numpy_state["bit_generator"],
+        np.array(numpy_state["keys"], dtype=np.uint32),
+        numpy_state["pos"],
+        numpy_state["has_gauss"],
+        numpy_state["cached_gaussian"]
+    ))
+
+def training_state(step: int, sampler=None, **components) -> Dict:
+    """Everything besides weights and optimizer state needed to resume mid-epoch
+
+    Captures the global step, the sampler's epoch and cursor, and the random
+    state. `components` are any other stateful objects exposing
+    `state_dict()` (a loss scaler, for instance); their state is stored
+    under the keyword name. The result is plain JSON and goes into the
+    checkpoint manifest via `save_checkpoint(..., training_state=...)`.
+    """
+    return {
+        "step": step,
+        "sampler": sampler.state_dict() if sampler is not None else None,
+        "rng": rng_state(),
+        "components": {name: component.state_dict() for name, component in components.items()}
+    }
+
+def restore_training_state(state: Optional[Dict], sampler=None, **components) -> int:
+    """Restore a `training_state` and return its global step
+
+    Components are matched by keyword name; ones missing from the saved
+    state are left untouched. Returns 0 when there is nothing to restore.
+    """
+    if not state:
+        return 0
+    if sampler is not None and state.get("sampler"):
+        sampler.load_state_dict(state["sampler"])
+    if state.get("rng"):
+        set_rng_state(state["rng"])
+    saved = state.get("components", {})
+    for name, component in components.items():
+        if name in saved:
+            component.load_state_dict(saved[name])
+    return state.get("step", 0)
@@ -21,6 +21,11 @@ class TrainingMetrics:
     memory_total: float
     network_bandwidth: Optional[float] = None  # MB/s for distributed
     device_utilization: Optional[float] = None  # Percentage
+    idle_time: Optional[List[float]] = None  # Seconds per rank waiting on the slowest
+    idle_time_unbalanced: Optional[List[float]] = None  # Same, with an even batch split
+    rank_timings: Optional[List[Dict]] = None  # Per-rank summaries from DistributedMetricsTracker
+    stragglers: Optional[List[int]] = None  # Ranks flagged as slow
+    mfu: Optional[float] = None  # Model FLOPs utilization, 0-1
 
 class TrainingVisualizer:
     """Real-time training visualization with distributed support"""
@@ -94,6 +99,13 @@ class TrainingVisualizer:
             f"{max([m.samples_per_second for m in self.history + [metrics]], default=0):.1f} samples/s"
         )
         
+        if metrics.mfu is not None:
+            metrics_table.add_row(
+                "MFU",
+                f"{metrics.mfu:.1%}",
+                f"{max(m.mfu or 0 for m in self.history + [metrics]):.1%}"
+            )
+        
         layout["metrics"].update(Panel(metrics_table, title="Training Progress"))
     
     def _update_resource_section(self, layout: Layout, metrics: TrainingMetrics):
@@ -104,6 +116,10 @@ class TrainingVisualizer:
         resources.add_column("Utilization")
         if self.num_devices > 1:
             resources.add_column("Network")
+        if metrics.idle_time:
+            resources.add_column("Idle (even → balanced)")
+        if metrics.rank_timings:
+            resources.add_column("Compute p95 (wait)")
         
         # Memory usage bar
         memory_percent = (metrics.memory_used / metrics.memory_total) * 100
@@ -124,10 +140,27 @@ class TrainingVisualizer:
             ]
             
             # Add network bandwidth for distributed training
-            if self.num_devices > 1 and metrics.network_bandwidth:
-                row.append(f"{metrics.network_bandwidth:.1f} MB/s")
+            if self.num_devices > 1:
+                row.append(f"{metrics.network_bandwidth:.1f} MB/s" if metrics.network_bandwidth else "N/A")
+            
+            # Per-rank idle time before and after load balancing
+            if metrics.idle_time:
+                before = (
+                    f"{metrics.idle_time_unbalanced[device] * 1000:.0f}ms → "
+                    if metrics.idle_time_unbalanced else ""
+                )
+                row.append(f"{before}{metrics.idle_time[device] * 1000:.0f}ms")
+            
+            # Per-rank compute tail and collective wait
+            if metrics.rank_timings:
+                timing = metrics.rank_timings[device] or {}
+                row.append(
+                    f"{timing['compute_p95'] * 1000:.0f}ms ({timing['wait_p95'] * 1000:.0f}ms)"
+                    if "compute_p95" in timing else "N/A"
+                )
             
-            resources.add_row(*row)
+            straggler = device in (metrics.stragglers or [])
+            resources.add_row(*row, style="red" if straggler else None)
         
         layout["resources"].update(Panel(resources, title="Resource Utilization"))
     
@@ -0,0 +1,199 @@
+import math
+from typing import Dict, List, Optional, Tuple
+import mlx.core as mx
+import mlx.nn as nn
+import mlx.optimizers as optim
+from mlx.utils import tree_flatten, tree_unflatten
+from mlx_train.core.distributed import Communicator, get_communicator
+from mlx_train.training.buckets import build_buckets, flatten_bucket, unflatten_bucket
+
+class ZeROOptimizer:
+    """ZeRO stage 1/2 data parallelism around a regular MLX optimizer
+
+    Trainable parameters are flattened into fp32 buckets and every rank owns
+    a 1/world_size slice of each bucket. Only the owned slices get a master
+    copy and optimizer state, so Adam's moments shrink with world size.
+
+    - stage 1: gradients are all-reduced, each rank updates its slice
+    - stage 2: gradients are reduce-scattered, so a rank only ever holds the
+      averaged gradients of the slice it owns
+
+    After the update the new slices are all-gathered into the model. Pass
+    the raw (un-reduced) gradients to `update`; the reduction happens here.
+    """
+
+    def __init__(
+        self,
+        optimizer: optim.Optimizer,
+        communicator: Optional[Communicator] = None,
+        stage: int = 1,
+        bucket_size_mb: float = 25.0
+    ):
+        if stage not in (1, 2):
+            raise ValueError(f"Unsupported ZeRO stage {stage}. Use 1 or 2")
+        self.optimizer = optimizer
+        self.comm = communicator if communicator is not None else get_communicator()
+        self.stage = stage
+        self.bucket_size_mb = bucket_size_mb
+        self.master: Dict[str, mx.array] = {}  # Owned fp32 slice of each bucket
+        self._buckets: List[List[int]] = []
+        self._layout = []  # (name, shape, dtype) of each trainable parameter
+        self._grad_bytes = 0
+
+    @property
+    def state(self):
+        return self.optimizer.state
+
+    @property
+    def learning_rate(self):
+        return self.optimizer.learning_rate
+
+    def init(self, model: nn.Module):
+        """Partition the trainable parameters and create the owned master slices"""
+        flat = tree_flatten(model.trainable_parameters())
+        self._layout = [(name, p.shape, p.dtype) for name, p in flat]
+        arrays = [p for _, p in flat]
+        self._buckets = build_buckets(arrays, self.bucket_size_mb)
+        self.master = {
+            f"bucket_{n}": self._shard(self._flatten([arrays[i] for i in bucket]))
+            for n, bucket in enumerate(self._buckets)
+        }
+        mx.eval(self.master)
+        self.optimizer.init(self.master)
+
+    def _flatten(self, arrays: List[mx.array]) -> mx.array:
+        """Flat fp32 buffer padded to a multiple of the world size"""
+        buffer = flatten_bucket([a.astype(mx.float32) for a in arrays])
+        pad = -buffer.size % self.comm.size
+        if pad:
+            buffer = mx.concatenate([buffer, mx.zeros((pad,), dtype=mx.float32)])
+        return buffer
+
+    def _shard(self, buffer: mx.array) -> mx.array:
+        chunk = buffer.size // self.comm.size
+        return buffer[self.comm.rank * chunk:(self.comm.rank + 1) * chunk]
+
+    def update(self, model: nn.Module, grads: Dict):
+        """Reduce gradients, update the owned slices and all-gather the parameters"""
+        if not self.master:
+            self.init(model)
+        flat_grads = dict(tree_flatten(grads))
+        size = float(self.comm.size)
+
+        grad_shards = {}
+        self._grad_bytes = 0
+        for n, bucket in enumerate(self._buckets):
+            buffer = self._flatten([flat_grads[self._layout[i][0]] for i in bucket])
+            if self.stage == 2:
+                grad_shards[f"bucket_{n}"] = self.comm.reduce_scatter(buffer) / size
+                self._grad_bytes += buffer.nbytes // self.comm.size
+            else:
+                grad_shards[f"bucket_{n}"] = self._shard(self.comm.all_reduce(buffer) / size)
+                self._grad_bytes += buffer.nbytes
+
+        self.master = self.optimizer.apply_gradients(grad_shards, self.master)
+
+        updated = []
+        for n, bucket in enumerate(self._buckets):
+            shapes = [self._layout[i][1] for i in bucket]
+            numel = sum(flat_grads[self._layout[i][0]].size for i in bucket)
+            full = self.comm.all_gather(self.master[f"bucket_{n}"])[:numel]
+            for i, param in zip(bucket, unflatten_bucket(full, shapes)):
+                name, _, dtype = self._layout[i]
+                updated.append((name, param.astype(dtype)))
+        model.update(tree_unflatten(updated))
+
+    def state_dict(self) -> Dict:
+        """Optimizer state in the model's parameter layout, independent of world size
+
+        Collective: every rank must call it.
+        """
+        flat = [(k, v) for k, v in self.optimizer.state.items() if not k.startswith("bucket_")]
+        for n, bucket in enumerate(self._buckets):
+            numel = sum(math.prod(self._layout[i][1]) for i in bucket)
+            for field, shard in self.optimizer.state[f"bucket_{n}"].items():
+                full = self.comm.all_gather(shard)[:numel]
+                for i, value in zip(bucket, unflatten_bucket(full, [self._layout[i][1] for i in bucket])):
+                    flat.append((f"{self._layout[i][0]}.{field}", value))
+        return tree_unflatten(flat)
+
+    def load_state_dict(self, model: nn.Module, state: Dict):
+        """Re-shard a `state_dict` (saved with any world size) onto this world"""
+        self.init(model)
+        flat = dict(tree_flatten(state))
+        for n, bucket in enumerate(self._buckets):
+            fields = self.optimizer.state[f"bucket_{n}"]
+            for field in fields:
+                buffer = self._flatten([flat[f"{self._layout[i][0]}.{field}"] for i in bucket])
+                fields[field] = self._shard(buffer)
+        for key in ("step", "learning_rate"):
+            if key in state:
+                self.optimizer.state[key] = state[key]
+        mx.eval(self.optimizer.state)
+
+    def _owned_ranges(self, bucket: List[int]):
+        """(layout index, start, stop, offset) of each parameter range in this rank's bucket slice
+
+        `start:stop` is the element range within the flattened parameter and
+        `offset` its position within the owned slice.
+        """
+        numels = [math.prod(self._layout[i][1]) for i in bucket]
+        chunk = (sum(numels) + -sum(numels) % self.comm.size) // self.comm.size
+        lo, hi = self.comm.rank * chunk, (self.comm.rank + 1) * chunk
+        position = 0
+        for i, numel in zip(bucket, numels):
+            start, stop = max(lo, position), min(hi, position + numel)
+            if start < stop:
+                yield i, start - position, stop - position, start - lo
+            position += numel
+
+    def shard_pieces(self) -> List[Tuple]:
+        """This rank's optimizer state as `(name, shape, start, flat_slice)` pieces
+
+        Names follow `state_dict`'s `"<param>.<field>"` layout, so a sharded
+        checkpoint written from the pieces of all ranks can be read back
+        under any world size without gathering first.
+        """
+        pieces = []
+        if self.comm.rank == 0:
+            pieces.extend(
+                (k, v.shape, 0, v) for k, v in self.optimizer.state.items()
+                if not k.startswith("bucket_") and isinstance(v, mx.array)
+            )
+        for n, bucket in enumerate(self._buckets):
+            for field, shard in self.optimizer.state[f"bucket_{n}"].items():
+                for i, start, stop, offset in self._owned_ranges(bucket):
+                    name, shape, _ = self._layout[i]
+                    pieces.append((f"{name}.{field}", shape, start, shard[offset:offset + stop - start]))
+        return pieces
+
+    def load_sharded(self, model: nn.Module, reader):
+        """Load this rank's slices from a `ShardedCheckpointReader`, reading nothing else"""
+        self.init(model)
+        for n, bucket in enumerate(self._buckets):
+            fields = self.optimizer.state[f"bucket_{n}"]
+            chunk = fields[next(iter(fields))].size if fields else 0
+            for field in fields:
+                parts, position = [], 0
+                for i, start, stop, offset in self._owned_ranges(bucket):
+                    if offset > position:
+                        parts.append(mx.zeros((offset - position,), dtype=mx.float32))
+                    parts.append(reader.read("optimizer", f"{self._layout[i][0]}.{field}", start, stop).astype(mx.float32))
+                    position = offset + stop - start
+                if chunk > position:  # Padding at the end of the last slice
+                    parts.append(mx.zeros((chunk - position,), dtype=mx.float32))
+                fields[field] = mx.concatenate(parts) if len(parts) > 1 else parts[0]
+        for key in ("step", "learning_rate"):
+            if ("optimizer", key) in reader.pieces:
+                self.optimizer.state[key] = reader.read("optimizer", key)
+        mx.eval(self.optimizer.state)
+
+    def memory_stats(self) -> Dict[str, float]:
+        """Per-rank bytes held for master weights, gradients and optimizer state"""
+        state_bytes = sum(v.nbytes for _, v in tree_flatten(self.optimizer.state) if isinstance(v, mx.array) and v.ndim)
+        return {
+            "stage": self.stage,
+            "master_bytes": sum(v.nbytes for v in self.master.values()),
+            "gradient_bytes": self._grad_bytes,
+            "optimizer_state_bytes": state_bytes
+        }
@@ -0,0 +1,182 @@
+import json
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+import mlx.core as mx
+
+DEFAULT_SIZES = [2 ** k for k in range(10, 27, 2)]  # 1KB .. 64MB
+COLLECTIVES = ("all_reduce", "all_gather", "broadcast")
+DEFAULT_VOCAB_SIZES = (32_000, 128_000, 256_000)
+
+def bus_bandwidth_factor(op: str, world_size: int) -> float:
+    """Ratio of bus to algorithm bandwidth (nccl-tests convention)
+
+    Bus bandwidth reflects the bytes each link actually carries, so it can
+    be compared against the raw link speed independent of world size.
+    """
+    n = world_size
+    if op == "all_reduce":
+        return 2 * (n - 1) / n
+    if op == "all_gather":
+        return (n - 1) / n
+    return 1.0
+
+def benchmark_collectives(
+    comm,
+    sizes: Sequence[int] = DEFAULT_SIZES,
+    dtypes: Sequence[str] = ("float32", "bfloat16"),
+    ops: Sequence[str] = COLLECTIVES,
+    iterations: int = 10,
+    warmup: int = 2
+) -> List[Dict]:
+    """Measure latency and bandwidth of collectives across message sizes and dtypes
+
+    `sizes` are message sizes in bytes per rank. Every rank must call this
+    with the same arguments; each rank returns the same rows.
+    """
+    results = []
+    for op in ops:
+        for dtype_name in dtypes:
+            dtype = getattr(mx, dtype_name)
+            for size in sizes:
+                x = mx.ones((max(1, size // dtype.size),), dtype=dtype)
+                run = getattr(comm, op)
+                for _ in range(warmup):
+                    mx.eval(run(x))
+
+                times = []
+                for _ in range(iterations):
+                    comm.barrier()
+                    start = time.perf_counter()
+                    mx.eval(run(x))
+                    times.append(time.perf_counter() - start)
+                # Average the per-rank medians so every rank reports the same row
+                latency = comm.all_reduce(mx.array(statistics.median(times))).item() / comm.size
+                algbw = x.nbytes / latency / 1e9
+                results.append({
+                    "op": op,
+                    "dtype": dtype_name,
+                    "bytes": x.nbytes,
+                    "world_size": comm.size,
+                    "latency_us": latency * 1e6,
+                    "algbw_gbps": algbw,
+                    "busbw_gbps": algbw * bus_bandwidth_factor(op, comm.size)
+                })
+    return results
+
+def save_results(results: List[Dict], path: Path, metadata: Dict = None):
+    """Write benchmark rows (plus run metadata) as JSON"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"metadata": metadata or {}, "results": results, "timestamp": time.time()}, f, indent=2)
+
+def peak_bus_bandwidth(results: List[Dict], op: str = "all_reduce") -> float:
+    """Best measured bus bandwidth in GB/s for a collective"""
+    return max((r["busbw_gbps"] for r in results if r["op"] == op), default=0.0)
+
+def _directory_bytes(path: Path) -> int:
+    path = Path(path)
+    return path.stat().st_size if path.is_file() else sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+def benchmark_checkpoint(
+    num_params: int = 1_000_000_000,
+    dtype: str = "float32",
+    directory: Optional[Path] = None,
+    json_limit: int = 10_000_000
+) -> List[Dict]:
+    """Time saving and loading a `num_params` checkpoint, binary vs legacy JSON
+
+    Parameters are 4096-wide matrices (the last one truncated). The JSON
+    format is only measured up to `json_limit` parameters, since it needs
+    several Python objects per element.
+    """
+    from mlx_train.training.checkpoint import read_checkpoint, read_legacy_checkpoint, write_checkpoint
+
+    width = 4096
+    params, remaining = {}, num_params
+    while remaining > 0:
+        rows = min(width, -(-remaining // width))
+        params[f"layers.{len(params)}.weight"] = mx.random.normal((rows, width)).astype(getattr(mx, dtype))
+        remaining -= rows * width
+    mx.eval(params)
+    numel = sum(p.size for p in params.values())
+
+    root = Path(tempfile.mkdtemp(dir=directory))
+    results = []
+    try:
+        start = time.perf_counter()
+        path = write_checkpoint(root / "checkpoint_epoch_0", params, {}, {"epoch": 0})
+        save_time = time.perf_counter() - start
+        start = time.perf_counter()
+        loaded, _, _ = read_checkpoint(path)
+        mx.eval(loaded)
+        load_time = time.perf_counter() - start
+        del loaded
+        results.append({"format": "safetensors", "params": numel, "dtype": dtype, "save_s": save_time,
+                        "load_s": load_time, "bytes": _directory_bytes(path)})
+
+        if numel <= json_limit:
+            path = root / "checkpoint_epoch_1.json"
+            start = time.perf_counter()
+            with open(path, "w") as f:
+                json.dump({"epoch": 1, "model_state": {k: v.tolist() for k, v in params.items()}}, f)
+            save_time = time.perf_counter() - start
+            start = time.perf_counter()
+            loaded, _, _ = read_legacy_checkpoint(path)
+            mx.eval(loaded)
+            load_time = time.perf_counter() - start
+            results.append({"format": "json", "params": numel, "dtype": dtype, "save_s": save_time,
+                            "load_s": load_time, "bytes": _directory_bytes(path)})
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return results
+
+def benchmark_loss_memory(
+    vocab_sizes: Sequence[int] = DEFAULT_VOCAB_SIZES,
+    tokens: int = 2048,
+    hidden_size: int = 512,
+    chunk_size: int = 1024,
+    dtype: str = "float32"
+) -> List[Dict]:
+    """Peak memory and time of the output projection + cross-entropy, forward and backward
+
+    Compares the naive loss on full `[tokens, vocab]` logits with
+    `BaseModel.chunked_cross_entropy`. `peak_bytes` is measured above the
+    inputs already in memory.
+    """
+    import mlx.nn as nn
+    from mlx_train.models.base import BaseModel
+
+    methods = {
+        "naive": lambda h, w, t: mx.mean(nn.losses.cross_entropy(h @ w.T, t)),
+        "chunked": lambda h, w, t: BaseModel.chunked_cross_entropy(h, w, t, chunk_size)
+    }
+    results = []
+    for vocab in vocab_sizes:
+        hidden = mx.random.normal((tokens, hidden_size)).astype(getattr(mx, dtype))
+        weight = (mx.random.normal((vocab, hidden_size)) * hidden_size ** -0.5).astype(getattr(mx, dtype))
+        targets = mx.random.randint(0, vocab, (tokens,))
+        mx.eval(hidden, weight, targets)
+        for method, loss_fn in methods.items():
+            mx.clear_cache()
+            baseline = mx.get_active_memory()
+            mx.reset_peak_memory()
+            start = time.perf_counter()
+            loss, grads = mx.value_and_grad(loss_fn, argnums=(0, 1))(hidden, weight, targets)
+            mx.eval(loss, grads)
+            results.append({
+                "vocab_size": vocab,
+                "method": method,
+                "tokens": tokens,
+                "dtype": dtype,
+                "loss": loss.item(),
+                "time_s": time.perf_counter() - start,
+                "peak_bytes": mx.get_peak_memory() - baseline,
+                "logits_bytes": tokens * vocab * 4
+            })
+            del loss, grads
+    return results
@@ -1,5 +1,12 @@
-from typing import Dict, Any
+from collections.abc import Mapping
+from typing import Dict, Any, List, Optional
 import mlx.core as mx
+import mlx.nn as nn
+from mlx.utils import tree_flatten, tree_unflatten
+from rich.console import Console
+from mlx_train.utils.safetensors import LazySafetensors
+
+console = Console()
 
 class MemoryOptimizer:
     """Memory optimization utilities for large models"""
@@ -14,58 +21,146 @@ class MemoryOptimizer:
         return max(1, int(available_memory / mem_per_sample))
     
     @staticmethod
-    def load_sharded(path: str) -> Dict[str, Any]:
-        """Load large models in sharded format"""
-        try:
-            # First try safetensors format
-            return mx.load_safetensors(path)
-        except:
-            # Fallback to regular loading with memory checks
-            if mx.metal.is_available():
-                current_mem = mx.metal.get_active_memory()
-                mx.metal.clear_cache()  # Clear cache before loading
-            
-            weights = mx.load(path)
-            return weights
-    
+    def load_sharded(path: str) -> LazySafetensors:
+        """Open large models in (sharded) safetensors format without reading them
+
+        Returns a mapping whose tensors are memory-mapped and read on first
+        access; see `LazySafetensors` for the supported layouts.
+        """
+        return LazySafetensors(path)
+
+    @staticmethod
+    def load_into(
+        model: nn.Module,
+        weights: Mapping,
+        strict: bool = True,
+        dtype: Optional[mx.Dtype] = None
+    ) -> List[str]:
+        """Materialize weights straight into a model, one tensor at a time
+
+        Names and shapes are checked against the headers before any data is
+        read. Each initial value is dropped right before its replacement is
+        read, so an unevaluated (lazy) random init is never computed and an
+        evaluated one never coexists with the loaded copy: peak memory stays
+        about one model size. Tensors keep their stored dtype, and any that
+        differ from the model's are reported, unless `dtype` is given, in
+        which case every tensor is cast to it. Returns the names that were
+        loaded.
+        """
+        params = dict(tree_flatten(model.parameters()))
+        missing = sorted(set(params) - set(weights))
+        unexpected = sorted(set(weights) - set(params))
+        if strict and (missing or unexpected):
+            raise ValueError(f"Weights don't match the model: missing {missing}, unexpected {unexpected}")
+
+        names = [name for name in weights if name in params]
+        mismatched = []
+        for name in names:
+            shape = weights.shape(name) if hasattr(weights, "shape") else weights[name].shape
+            if tuple(shape) != params[name].shape:
+                raise ValueError(f"Shape mismatch for {name}: {tuple(shape)} vs {params[name].shape}")
+            stored = weights.dtype(name) if hasattr(weights, "dtype") else weights[name].dtype
+            if dtype is None and stored != params[name].dtype:
+                mismatched.append(f"{name} ({stored} vs {params[name].dtype})")
+        del params
+        if mismatched:
+            console.print(
+                f"[yellow]Warning: {len(mismatched)} weight(s) keep their stored dtype instead of the "
+                f"model's: {', '.join(mismatched)}. Pass dtype= to cast them.[/yellow]"
+            )
+
+        for name in names:
+            # Drop the initial value before reading the replacement
+            model.update(tree_unflatten([(name, mx.zeros((0,)))]))
+            tensor = weights[name]
+            if dtype is not None:
+                tensor = tensor.astype(dtype)
+            mx.eval(tensor)
+            model.update(tree_unflatten([(name, tensor)]))
+        return names
+
     @staticmethod
-    def quantize_weights(weights: Dict[str, mx.array], bits: int = 8):
-        """Quantize model weights for memory efficiency"""
+    def quantize_weights(weights: Dict[str, mx.array], bits: int = 8, group_size: int = 64):
+        """Quantize model weights for memory efficiency
+
+        Each quantized `<prefix>.weight` is expanded into the packed weight plus
+        `<prefix>.scales` and `<prefix>.biases`, matching `nn.QuantizedLinear`.
+        """
         if bits not in [4, 8]:
             raise ValueError("Only 4 and 8 bit quantization supported")
             
         quantized = {}
         for name, param in weights.items():
             # Skip non-weight tensors
-            if any(x in name for x in ['bias', 'norm']):
+            if any(x in name for x in ['bias', 'norm']) or param.ndim != 2 or param.shape[-1] % group_size:
                 quantized[name] = param
                 continue
                 
             # Quantize weights
-            quantized[name] = mx.quantize(param, bits)
+            prefix = name[:-len("weight")]
+            quantized[name], quantized[prefix + "scales"], quantized[prefix + "biases"] = mx.quantize(
+                param, group_size, bits
+            )
         
         return quantized 
+
+    @staticmethod
+    def quantize_model(model: nn.Module, bits: int = 4, group_size: int = 64) -> Dict[str, float]:
+        """Convert frozen linear layers to group-wise quantized modules in place
+
+        Returns a report comparing parameter memory against an fp16 baseline.
+        """
+        if bits not in [4, 8]:
+            raise ValueError("Only 4 and 8 bit quantization supported")
+
+        def should_quantize(path: str, module: nn.Module) -> bool:
+            return isinstance(module, nn.Linear) and module.weight.shape[-1] % group_size == 0
+
+        fp16_bytes = sum(p.size * 2 for _, p in tree_flatten(model.parameters()))
+        # Quantized linears are created frozen; only adapters on top get gradients
+        nn.quantize(model, group_size=group_size, bits=bits, class_predicate=should_quantize)
+        quantized_bytes = sum(p.nbytes for _, p in tree_flatten(model.parameters()))
+
+        return {
+            "bits": bits,
+            "group_size": group_size,
+            "fp16_memory_gb": fp16_bytes / (1024 ** 3),
+            "quantized_memory_gb": quantized_bytes / (1024 ** 3),
+            "memory_saved_gb": (fp16_bytes - quantized_bytes) / (1024 ** 3),
+            "compression_ratio": fp16_bytes / max(quantized_bytes, 1)
+        }
     
     @staticmethod
-    def suggest_config(model_size: int, num_devices: int) -> dict:
-        """Suggest optimal memory configuration"""
+    def suggest_config(model_size: int, num_devices: int, zero_stage: int = 0) -> dict:
+        """Suggest optimal memory configuration
+
+        Plain data parallelism replicates everything on each device; ZeRO
+        stage 1 shards the optimizer states and stage 2 also the gradients.
+        """
         # Calculate memory requirements
         param_memory = model_size * 4  # 4 bytes per parameter
+        gradient_memory = param_memory
         
         # Account for optimizer states (e.g., Adam has 2 states per parameter)
         optimizer_memory = param_memory * 2
         
+        if zero_stage >= 1:
+            optimizer_memory /= num_devices
+        if zero_stage >= 2:
+            gradient_memory /= num_devices
+        
         # Estimate activation memory (rough approximation)
         activation_memory = param_memory * 0.5
         
         # Total memory per device
-        total_memory = (param_memory + optimizer_memory + activation_memory) / num_devices
+        total_memory = param_memory + gradient_memory + optimizer_memory + activation_memory
         
         # Convert to GB
         memory_gb = total_memory / (1024 ** 3)
         
         return {
             "estimated_memory_gb": memory_gb,
+            "zero_stage": zero_stage,
             "suggested_batch_size": max(1, int(32 / memory_gb)),  # Scale batch size with memory
             "activation_checkpointing": memory_gb > 8,  # Enable for large models
             "gradient_accumulation": max(1, int(memory_gb / 4))  # Scale with memory
@@ -1,10 +1,20 @@
-from typing import Dict
-from collections import defaultdict
+from typing import Dict, List, Optional
+from collections import defaultdict, deque
+import mlx.core as mx
 import numpy as np
 import json
 import time
 from pathlib import Path
 
+def model_flops_utilization(tokens_per_second: float, flops_per_token: float, peak_tflops: float) -> float:
+    """Fraction of a device's peak FLOPs spent on the model's own math
+
+    Use per-device throughput with per-device peak (e.g.
+    `HardwareConfig().total_tflops`). Recomputation and other overheads
+    don't count, so this is comparable across parallelism strategies.
+    """
+    return tokens_per_second * flops_per_token / (peak_tflops * 1e12)
+
 class MetricsTracker:
     """Tracks training and validation metrics"""
     
@@ -59,11 +69,39 @@ class MetricsTracker:
             json.dump(metrics, f) 
 
 class DistributedMetricsTracker:
-    """Track and validate distributed training metrics"""
+    """Track and validate distributed training metrics
+
+    Besides per-device metrics, every rank records its compute time and
+    the time it spent waiting in collectives each step. Every
+    `report_every` steps the ranks exchange compact summaries (mean and p95
+    over the last `window` steps), and a rank whose p95 compute time exceeds
+    the median across ranks by `threshold` is flagged as a straggler. Step
+    time (compute + wait) can't be used for that: in synchronous training
+    the fast ranks spend the straggler's extra time waiting, so every rank
+    ends up with the same step time. Rank 0 appends each round of summaries
+    to `log_path` as one JSON line.
+    """
+    
+    SUMMARY_FIELDS = ("steps", "compute_mean", "compute_p95", "wait_mean", "wait_p95", "step_p95")
     
-    def __init__(self, num_devices: int):
+    def __init__(
+        self,
+        num_devices: int,
+        communicator=None,
+        report_every: int = 10,
+        threshold: float = 1.25,
+        window: int = 100,
+        log_path: Optional[Path] = None
+    ):
         self.num_devices = num_devices
         self.device_metrics = {i: {} for i in range(num_devices)}
+        self.comm = communicator
+        self.report_every = report_every
+        self.threshold = threshold
+        self.log_path = Path(log_path) if log_path is not None else None
+        self.compute_times = deque(maxlen=window)
+        self.wait_times = deque(maxlen=window)
+        self.steps = 0
         
     def update(self, device_id: int, metrics: Dict):
         """Update metrics for a specific device"""
@@ -78,4 +116,75 @@ class DistributedMetricsTracker:
         losses = [m.get('loss', 0) for m in self.device_metrics.values()]
         max_diff = max(losses) - min(losses)
         
-        return max_diff < 1e-6  # Tolerance threshold
\ No newline at end of file
+        return max_diff < 1e-6  # Tolerance threshold
+
+    def record_step(self, compute_time: float, wait_time: float = 0.0) -> Optional[List[int]]:
+        """Record one step's timings; returns the stragglers when summaries were exchanged
+
+        Collective every `report_every` steps: all ranks must call it equally often.
+        """
+        self.compute_times.append(compute_time)
+        self.wait_times.append(wait_time)
+        self.steps += 1
+        if self.steps % self.report_every:
+            return None
+        self.report()
+        return self.stragglers()
+
+    def summary(self) -> Dict[str, float]:
+        """This rank's timing summary over the recent window"""
+        compute = np.array(self.compute_times)
+        wait = np.array(self.wait_times)
+        return {
+            "steps": self.steps,
+            "compute_mean": float(compute.mean()),
+            "compute_p95": float(np.percentile(compute, 95)),
+            "wait_mean": float(wait.mean()),
+            "wait_p95": float(np.percentile(wait, 95)),
+            "step_p95": float(np.percentile(compute + wait, 95))
+        }
+
+    def report(self):
+        """Exchange summaries across ranks and log them on rank 0"""
+        local = self.summary()
+        if self.comm is None or self.comm.size == 1:
+            rank = self.comm.rank if self.comm is not None else 0
+            self.device_metrics[rank] = {**self.device_metrics.get(rank, {}), **local}
+        else:
+            # One small fixed-size vector per rank
+            vector = mx.array([local[k] for k in self.SUMMARY_FIELDS], dtype=mx.float32)
+            gathered = np.array(self.comm.all_gather(vector)).reshape(self.comm.size, -1)
+            for rank, row in enumerate(gathered):
+                summary = dict(zip(self.SUMMARY_FIELDS, row.tolist()))
+                summary["steps"] = int(summary["steps"])
+                self.device_metrics[rank] = {**self.device_metrics.get(rank, {}), **summary}
+
+        if self.log_path is not None and (self.comm is None or self.comm.rank == 0):
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+            record = {
+                "step": self.steps,
+                "timestamp": time.time(),
+                "ranks": {rank: self._timings(rank) for rank in sorted(self.device_metrics)},
+                "stragglers": self.stragglers()
+            }
+            with open(self.log_path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+
+    def _timings(self, rank: int) -> Dict[str, float]:
+        return {k: v for k, v in self.device_metrics[rank].items() if k in self.SUMMARY_FIELDS}
+
+    def step_times(self) -> List[Optional[float]]:
+        """Latest p95 step time of every rank (None before its first report)"""
+        return [self.device_metrics.get(rank, {}).get("step_p95") for rank in range(self.num_devices)]
+
+    def rank_compute_times(self) -> List[Optional[float]]:
+        """Latest p95 compute time of every rank (None before its first report)"""
+        return [self.device_metrics.get(rank, {}).get("compute_p95") for rank in range(self.num_devices)]
+
+    def stragglers(self) -> List[int]:
+        """Ranks whose p95 compute time exceeds the median across ranks by `threshold`"""
+        times = {rank: t for rank, t in enumerate(self.rank_compute_times()) if t is not None}
+        if len(times) < 2:
+            return []
+        median = float(np.median(list(times.values())))
+        return [rank for rank, t in times.items() if t > median * self.threshold]
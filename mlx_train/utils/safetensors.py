@@ -0,0 +1,120 @@
+import json
+import struct
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+import mlx.core as mx
+import numpy as np
+
+# safetensors dtype tags -> (numpy storage type, MLX dtype); bf16 is read as raw uint16
+SAFETENSORS_DTYPES = {
+    "BOOL": (np.bool_, mx.bool_),
+    "U8": (np.uint8, mx.uint8),
+    "I8": (np.int8, mx.int8),
+    "U16": (np.uint16, mx.uint16),
+    "I16": (np.int16, mx.int16),
+    "U32": (np.uint32, mx.uint32),
+    "I32": (np.int32, mx.int32),
+    "U64": (np.uint64, mx.uint64),
+    "I64": (np.int64, mx.int64),
+    "F16": (np.float16, mx.float16),
+    "BF16": (np.uint16, mx.bfloat16),
+    "F32": (np.float32, mx.float32)
+}
+
+def read_safetensors_header(path: Path) -> Tuple[Dict, int]:
+    """Tensor entries of a safetensors file and the byte offset of its data section"""
+    with open(path, "rb") as f:
+        (length,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(length))
+    header.pop("__metadata__", None)
+    return header, 8 + length
+
+def read_tensor_range(
+    path: Path,
+    header: Dict,
+    data_offset: int,
+    key: str,
+    start: int = 0,
+    stop: Optional[int] = None
+) -> mx.array:
+    """Elements [start, stop) of a flattened tensor (all by default), through a memory map
+
+    Only the pages holding those elements are read from disk, and they are
+    copied once into the returned MLX array.
+    """
+    entry = header[key]
+    np_dtype, mx_dtype = SAFETENSORS_DTYPES[entry["dtype"]]
+    itemsize = np.dtype(np_dtype).itemsize
+    numel = int(np.prod(entry["shape"])) if entry["shape"] else 1
+    stop = numel if stop is None else stop
+    if stop <= start:
+        return mx.zeros((0,), dtype=mx_dtype)
+    view = np.memmap(
+        path, dtype=np_dtype, mode="r",
+        offset=data_offset + entry["data_offsets"][0] + start * itemsize,
+        shape=(stop - start,)
+    )
+    array = mx.array(view)
+    del view
+    return array.view(mx_dtype) if mx_dtype == mx.bfloat16 else array
+
+class LazySafetensors(Mapping):
+    """Read-only mapping over the tensors of one or more safetensors files
+
+    `path` is a `.safetensors` file or a directory of shards. With an index
+    (`*.safetensors.index.json` with a `weight_map`, the Hugging Face
+    layout) names are known up front and a shard's header is only read when
+    one of its tensors is first accessed; otherwise all headers are read
+    (they are small). Tensor data is memory-mapped and read on access, so
+    loading touches only the bytes of the tensors actually used.
+    """
+
+    def __init__(self, path: Path):
+        path = Path(path)
+        self._headers: Dict[Path, Tuple[Dict, int]] = {}
+        self._files: Dict[str, Path] = {}
+        if path.is_file():
+            self._index_file(path)
+            return
+        indexes = sorted(path.glob("*.safetensors.index.json"))
+        if indexes:
+            with open(indexes[0]) as f:
+                weight_map = json.load(f)["weight_map"]
+            self._files = {name: path / filename for name, filename in weight_map.items()}
+        else:
+            for shard in sorted(path.glob("*.safetensors")):
+                self._index_file(shard)
+        if not self._files:
+            raise FileNotFoundError(f"No safetensors weights found in {path}")
+
+    def _index_file(self, path: Path):
+        header, _ = self._header(path)
+        self._files.update({name: path for name in header})
+
+    def _header(self, path: Path) -> Tuple[Dict, int]:
+        if path not in self._headers:
+            self._headers[path] = read_safetensors_header(path)
+        return self._headers[path]
+
+    def info(self, name: str) -> Dict:
+        """Shape and dtype tag of a tensor, without reading its data"""
+        header, _ = self._header(self._files[name])
+        return header[name]
+
+    def shape(self, name: str) -> Tuple[int, ...]:
+        return tuple(self.info(name)["shape"])
+
+    def dtype(self, name: str) -> mx.Dtype:
+        return SAFETENSORS_DTYPES[self.info(name)["dtype"]][1]
+
+    def __getitem__(self, name: str) -> mx.array:
+        path = self._files[name]
+        header, offset = self._header(path)
+        return read_tensor_range(path, header, offset, name).reshape(self.shape(name))
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._files)
+
+    def __len__(self) -> int:
+        return len(self._files)
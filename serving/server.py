@@ -2,31 +2,53 @@ import mlx.core as mx
 from fastapi import FastAPI, HTTPException
 from fastapi.responses import StreamingResponse, JSONResponse
 from pydantic import BaseModel
+import asyncio
 import time
 import json
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Dict, List, Optional
 import uvicorn
 from rich.console import Console
-from models.builder import ModelBuilder
-from utils.memory import MemoryOptimizer
-from utils.metrics import MetricsTracker
+from mlx_train.models.builder import ModelBuilder
+from mlx_train.models.architectures.lora import load_multi_adapter, set_adapter_ids
+from mlx_train.utils.memory import MemoryOptimizer
+from mlx_train.utils.metrics import MetricsTracker
 
 console = Console()
 
+def _use_thread_stream():
+    """MLX streams are per thread, so the forward-pass worker needs its own"""
+    mx.set_default_stream(mx.new_stream(mx.default_device()))
+
 class InferenceRequest(BaseModel):
     prompt: str
     max_tokens: int = 100
     temperature: float = 0.7
     top_p: float = 0.9
     stream: bool = False
+    adapter: Optional[str] = None
+
+class ForwardRequest(BaseModel):
+    inputs: List[float]
+    adapter: Optional[str] = None
 
 class ModelServer:
-    def __init__(self, model_path: Path, port: int = 8000):
+    def __init__(self, model_path: Path, port: int = 8000, max_batch_size: int = 16, batch_timeout_ms: float = 5.0):
         self.app = FastAPI(title="MLX Model Server")
         self.port = port
         self.model_path = model_path
         self.model = None
+        self.tokenizer = None
         self.metrics = MetricsTracker()
+        
+        # Multi-adapter serving: adapter name -> slot in the stacked adapter tensors
+        self.adapter_slots: Dict[str, int] = {}
+        self.max_batch_size = max_batch_size
+        self.batch_timeout_ms = batch_timeout_ms
+        self._queue: Optional[asyncio.Queue] = None
+        # Forward passes run here, off the event loop, one batch at a time
+        self._executor = ThreadPoolExecutor(max_workers=1, initializer=_use_thread_stream)
         self.setup_routes()
         
     def setup_routes(self):
@@ -34,6 +56,10 @@ class ModelServer:
         async def generate(request: InferenceRequest):
             if not self.model:
                 raise HTTPException(500, "Model not loaded")
+            if self.tokenizer is None:
+                raise HTTPException(500, "Tokenizer not loaded")
+            if request.adapter is not None and request.adapter not in self.adapter_slots:
+                raise HTTPException(404, f"Adapter {request.adapter} not loaded")
                 
             if request.stream:
                 return StreamingResponse(
@@ -41,19 +67,35 @@ class ModelServer:
                         request.prompt,
                         request.max_tokens,
                         request.temperature,
-                        request.top_p
+                        request.top_p,
+                        request.adapter
                     ),
                     media_type="text/event-stream"
                 )
             
-            response = self._generate_text(
+            response = await self._generate_text(
                 request.prompt,
                 request.max_tokens,
                 request.temperature,
-                request.top_p
+                request.top_p,
+                request.adapter
             )
             return JSONResponse(response)
             
+        @self.app.post("/v1/forward")
+        async def forward(request: ForwardRequest):
+            if not self.model:
+                raise HTTPException(500, "Model not loaded")
+            if request.adapter is not None and request.adapter not in self.adapter_slots:
+                raise HTTPException(404, f"Adapter {request.adapter} not loaded")
+                
+            output = await self.submit(mx.array(request.inputs), request.adapter)
+            return {"outputs": output.tolist(), "adapter": request.adapter}
+            
+        @self.app.get("/v1/adapters")
+        async def adapters():
+            return {"adapters": sorted(self.adapter_slots)}
+            
         @self.app.get("/v1/metrics")
         async def metrics():
             """Get server performance metrics"""
@@ -74,6 +116,119 @@ class ModelServer:
                 "memory_usage": self._get_memory_usage()
             }
 
+    def load_model(self, quantize: bool = True):
+        """Build the base model from an export directory
+
+        Reads `config.json` and the weights next to it (`*.safetensors`, or
+        the `.npz` files the MLX exports write). With `quantize` the linear
+        layers are converted per `config["quantization"]` (4-bit by default)
+        before any adapters are attached. The tokenizer for `/v1/generate`
+        comes from the directory or `config["tokenizer"]` when present.
+        """
+        model_path = Path(self.model_path)
+        with open(model_path / "config.json") as f:
+            config = json.load(f)
+        model = ModelBuilder.build(config, model_type=config.get("model_type", "simple"))
+        
+        if any(model_path.glob("*.safetensors")):
+            weights = MemoryOptimizer.load_sharded(str(model_path))
+        else:
+            weights = {}
+            for path in sorted(model_path.glob("*.npz")):
+                weights.update(mx.load(str(path)))
+        quantization = config.get("quantization", {})
+        bits, group_size = quantization.get("bits", 4), quantization.get("group_size", 64)
+        prequantized = any(name.endswith(".scales") for name in weights)
+        if prequantized:
+            # Match the stored module layout before loading
+            MemoryOptimizer.quantize_model(model, bits=bits, group_size=group_size)
+        MemoryOptimizer.load_into(model, weights)
+        if quantize and not prequantized:
+            MemoryOptimizer.quantize_model(model, bits=bits, group_size=group_size)
+        model.eval()
+        mx.eval(model.parameters())
+        self.model = model
+        
+        if (model_path / "tokenizer.json").exists() or config.get("tokenizer"):
+            from transformers import AutoTokenizer
+            source = model_path if (model_path / "tokenizer.json").exists() else config["tokenizer"]
+            self.tokenizer = AutoTokenizer.from_pretrained(str(source))
+        console.print(f"[green]Loaded {config.get('model_type', 'simple')} model from {model_path}[/green]")
+        return model
+
+    def load_adapters(self, adapter_dir: Path) -> List[str]:
+        """Load every `*.safetensors` adapter in a directory over the shared base"""
+        adapter_paths = {path.stem: path for path in sorted(Path(adapter_dir).glob("*.safetensors"))}
+        if not adapter_paths:
+            raise FileNotFoundError(f"No adapters found in {adapter_dir}")
+            
+        self.adapter_slots = load_multi_adapter(self.model, adapter_paths)
+        mx.eval(self.model.parameters())
+        console.print(f"[green]Loaded {len(self.adapter_slots)} adapters: {', '.join(self.adapter_slots)}[/green]")
+        return sorted(self.adapter_slots)
+        
+    def forward_batch(self, inputs: List[mx.array], adapters: List[Optional[str]]) -> mx.array:
+        """Run one batched forward pass, applying each row's own adapter"""
+        slots = mx.array([self.adapter_slots.get(name, 0) if name else 0 for name in adapters])
+        set_adapter_ids(self.model, slots)
+        try:
+            outputs = self.model(mx.stack(inputs))
+            mx.eval(outputs)
+        finally:
+            set_adapter_ids(self.model, None)
+        return outputs
+        
+    async def submit(self, x: mx.array, adapter: Optional[str] = None) -> mx.array:
+        """Queue a request for the next batched forward pass"""
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            asyncio.get_running_loop().create_task(self._batch_worker())
+            
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((x, adapter, future))
+        return await future
+        
+    def _forward_rows(self, inputs: List[mx.array], adapters: List[Optional[str]]) -> List[mx.array]:
+        """`forward_batch` split into evaluated per-request rows (runs on the worker thread)"""
+        outputs = self.forward_batch(inputs, adapters)
+        rows = [outputs[i] for i in range(len(inputs))]
+        mx.eval(rows)
+        return rows
+        
+    async def _batch_worker(self):
+        """Group concurrent requests (any mix of adapters) into single batches"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_timeout_ms / 1000
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+                    
+            # Rows are stacked, so each input shape (e.g. prompt length) gets its own pass
+            groups: Dict[tuple, list] = {}
+            for item in batch:
+                groups.setdefault(tuple(item[0].shape), []).append(item)
+            for group in groups.values():
+                try:
+                    outputs = await loop.run_in_executor(
+                        self._executor, self._forward_rows, [x for x, _, _ in group], [a for _, a, _ in group]
+                    )
+                    for output, (_, _, future) in zip(outputs, group):
+                        if not future.done():
+                            future.set_result(output)
+                except Exception as e:
+                    for _, _, future in group:
+                        if not future.done():
+                            future.set_exception(e)
+                    
+            self.metrics.update_training({"batch_size": len(batch)})
+
     def _get_memory_usage(self):
         """Get current memory usage"""
         if mx.metal.is_available():
@@ -83,49 +238,90 @@ class ModelServer:
             }
         return {}
 
+    @staticmethod
+    def _sample(logits: mx.array, temperature: float, top_p: float) -> int:
+        """Next token from a sequence's logits: greedy at temperature 0, else nucleus sampling
+
+        Runs on the worker thread, like every other MLX op in the server.
+        """
+        logits = logits[-1]
+        if temperature <= 0:
+            return int(mx.argmax(logits).item())
+        probs = mx.softmax(logits.astype(mx.float32) / temperature)
+        order = mx.argsort(-probs)
+        sorted_probs = probs[order]
+        # Keep the smallest prefix whose mass reaches top_p
+        keep = mx.cumsum(sorted_probs) - sorted_probs < top_p
+        choice = mx.random.categorical(mx.log(mx.where(keep, sorted_probs, 0)))
+        return int(order[choice].item())
+        
+    async def _generate_tokens(
+        self,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        top_p: float,
+        adapter: Optional[str] = None
+    ):
+        """Decode token by token, each step a row of the shared batched forward pass
+
+        There is no KV cache: every step re-runs the whole sequence, which
+        keeps steps from different requests (and adapters) batchable.
+        """
+        loop = asyncio.get_running_loop()
+        tokens = list(self.tokenizer.encode(prompt))
+        eos = getattr(self.tokenizer, "eos_token_id", None)
+        for _ in range(max_tokens):
+            logits = await self.submit(mx.array(tokens), adapter)
+            token = await loop.run_in_executor(self._executor, self._sample, logits, temperature, top_p)
+            if token == eos:
+                break
+            tokens.append(token)
+            yield token
+            
+    async def _generate_text(
+        self,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        top_p: float,
+        adapter: Optional[str] = None
+    ) -> Dict:
+        """Generate a full completion"""
+        start_time = time.time()
+        tokens = [token async for token in self._generate_tokens(prompt, max_tokens, temperature, top_p, adapter)]
+        elapsed = time.time() - start_time
+        self.metrics.update_training({"tokens_per_second": len(tokens) / max(elapsed, 1e-9)})
+        return {
+            "text": self.tokenizer.decode(tokens),
+            "tokens": len(tokens),
+            "adapter": adapter,
+            "latency_ms": elapsed * 1000
+        }
+
     async def _generate_stream(
         self,
         prompt: str,
         max_tokens: int,
         temperature: float,
-        top_p: float
+        top_p: float,
+        adapter: Optional[str] = None
     ):
-        """Stream generation with performance tracking"""
+        """Stream generation as server-sent events"""
         try:
-            self.metrics.increment("active_requests")
-            self.metrics.increment("total_requests")
-            
             start_time = time.time()
             tokens_generated = 0
-            
-            # Initialize generation
-            for token in self.model.generate(
-                prompt=prompt,
-                max_tokens=max_tokens,
-                temperature=temperature,
-                top_p=top_p
-            ):
-                # Track performance
+            async for token in self._generate_tokens(prompt, max_tokens, temperature, top_p, adapter):
                 tokens_generated += 1
-                elapsed = time.time() - start_time
-                self.metrics.update({
-                    "tokens_per_second": tokens_generated / elapsed,
-                    "latency_ms": (elapsed * 1000) / tokens_generated
-                })
-                
-                # Stream token
                 text = self.tokenizer.decode([token])
                 yield f"data: {json.dumps({'text': text, 'done': False})}\n\n"
-                
-                # Force evaluation for accurate timing
-                mx.eval(token)
             
+            elapsed = time.time() - start_time
+            self.metrics.update_training({"tokens_per_second": tokens_generated / max(elapsed, 1e-9)})
             yield f"data: {json.dumps({'text': '', 'done': True})}\n\n"
             
         except Exception as e:
             yield f"data: {json.dumps({'error': str(e)})}\n\n"
-        finally:
-            self.metrics.decrement("active_requests")
     
     def serve(self):
         """Start the model server"""
@@ -135,6 +331,8 @@ Running on: http://localhost:{self.port}
 
 API endpoints:
 - POST /v1/generate  - Generate text
+- POST /v1/forward   - Batched forward pass (per-request adapter)
+- GET  /v1/adapters  - Loaded LoRA adapters
 - GET  /v1/metrics   - Performance metrics
 - GET  /v1/health    - Server health
 
@@ -56,4 +56,137 @@ def test_basic_throughput():
     
     # Cleanup
     import shutil
-    shutil.rmtree("test_cache", ignore_errors=True)
\ No newline at end of file
+    shutil.rmtree("test_cache", ignore_errors=True)
+
+
+@pytest.mark.distributed
+def test_all_reduce_bucketing():
+    """Measure all-reduce time against tensor count, per-tensor vs bucketed"""
+    from mlx.utils import tree_map
+    from mlx_train.training.distributed import DistributedController
+    from mlx_train.training.buckets import build_buckets, flatten_bucket, unflatten_bucket
+
+    controller = DistributedController(bucket_size_mb=25.0)
+    results = {}
+
+    for num_tensors in [8, 64, 512]:
+        # Mix of small bias-like tensors and larger weights (~4MB total)
+        grads = {f"layer{i}": mx.ones((64,) if i % 2 else (64, 64)) for i in range(num_tensors)}
+        mx.eval(grads)
+
+        start = time.perf_counter()
+        mx.eval(tree_map(controller.comm.all_reduce, grads))
+        per_tensor = time.perf_counter() - start
+
+        start = time.perf_counter()
+        reduced = controller._bucketed_all_reduce(grads)
+        mx.eval(reduced)
+        bucketed = time.perf_counter() - start
+
+        results[num_tensors] = {"per_tensor_ms": per_tensor * 1e3, "bucketed_ms": bucketed * 1e3}
+        if controller.size == 1:
+            assert all(mx.array_equal(reduced[k], grads[k]) for k in grads)
+        print(f"{num_tensors} tensors: {results[num_tensors]}")
+
+    # Round trip through buckets is exact and preserves shapes
+    arrays = [mx.arange(6).reshape(2, 3), mx.arange(4), mx.ones((1,), dtype=mx.float16)]
+    buckets = build_buckets(arrays, bucket_size_mb=1.0)
+    assert buckets == [[0, 1], [2]]  # dtype change starts a new bucket
+    restored = unflatten_bucket(flatten_bucket(arrays[:2]), [a.shape for a in arrays[:2]])
+    assert all(mx.array_equal(a, b) for a, b in zip(arrays, restored))
+
+
+def _bucketing_worker(comm, tensor_counts):
+    """Time per-tensor vs bucketed all-reduce on one shared-memory rank"""
+    from mlx_train.training.distributed import DistributedController
+
+    controller = DistributedController(bucket_size_mb=25.0, communicator=comm)
+    results = {}
+    for num_tensors in tensor_counts:
+        grads = {f"layer{i}": mx.full((64,) if i % 2 else (64, 64), float(comm.rank)) for i in range(num_tensors)}
+        mx.eval(grads)
+        comm.barrier()
+
+        start = time.perf_counter()
+        mx.eval({k: comm.all_reduce(g) for k, g in grads.items()})
+        per_tensor = time.perf_counter() - start
+        comm.barrier()
+
+        bytes_before = controller.comm_bytes
+        start = time.perf_counter()
+        reduced = controller.all_reduce_grads(grads)
+        mx.eval(reduced)
+        bucketed = time.perf_counter() - start
+        results[num_tensors] = {
+            "per_tensor_ms": per_tensor * 1e3,
+            "bucketed_ms": bucketed * 1e3,
+            "bytes": controller.comm_bytes - bytes_before,
+            "values": sorted({v.item() for g in reduced.values() for v in (g.min(), g.max())})
+        }
+    return results
+
+
+def test_all_reduce_bucketing_multiprocess():
+    """Measure all-reduce time against tensor count with 2 local ranks"""
+    from mlx_train.core.distributed import launch_local
+
+    tensor_counts = [8, 64, 256]
+    results = launch_local(_bucketing_worker, 2, tensor_counts)[0]
+    for num_tensors in tensor_counts:
+        print(f"{num_tensors} tensors (2 ranks): {results[num_tensors]}")
+
+        # Timings vary with load, so only their presence is checked
+        row = results[num_tensors]
+        assert set(row) == {"per_tensor_ms", "bucketed_ms", "bytes", "values"}
+        assert row["per_tensor_ms"] > 0 and row["bucketed_ms"] > 0
+        # Every gradient byte goes through the buckets once and comes back averaged
+        weights, biases = -(-num_tensors // 2), num_tensors // 2
+        assert row["bytes"] == (weights * 64 * 64 + biases * 64) * 4
+        assert row["values"] == [0.5]
+
+
+def test_checkpoint_save_load_speed():
+    """Measure binary checkpoint save/load against the legacy JSON format"""
+    from mlx_train.utils.benchmark import benchmark_checkpoint
+
+    results = {r["format"]: r for r in benchmark_checkpoint(num_params=1_000_000)}
+    for fmt, row in results.items():
+        print(f"{fmt}: save {row['save_s']:.3f}s, load {row['load_s']:.3f}s, {row['bytes'] / 1e6:.1f}MB")
+
+    assert set(results) == {"safetensors", "json"}
+    for row in results.values():
+        # Whole 4096-wide rows, so slightly over the requested count
+        assert 1_000_000 <= row["params"] < 1_000_000 + 4096 and row["dtype"] == "float32"
+        assert row["save_s"] > 0 and row["load_s"] > 0
+    # Raw float32 data plus a small header
+    params = results["safetensors"]["params"]
+    assert params * 4 <= results["safetensors"]["bytes"] < params * 4 + 100_000
+    assert results["safetensors"]["bytes"] < results["json"]["bytes"] / 3
+
+
+def test_chunked_loss_memory():
+    """Measure chunked cross-entropy peak memory against the naive loss"""
+    import mlx.nn as nn
+    from mlx_train.models.base import BaseModel
+    from mlx_train.utils.benchmark import benchmark_loss_memory
+
+    results = benchmark_loss_memory(vocab_sizes=(8192, 32000), tokens=1024, hidden_size=32, chunk_size=32)
+    rows = {(r["vocab_size"], r["method"]): r for r in results}
+    for (vocab, method), row in rows.items():
+        print(f"vocab {vocab} {method}: peak {row['peak_bytes'] / 1e6:.1f}MB "
+              f"(logits {row['logits_bytes'] / 1e6:.1f}MB), {row['time_s']:.2f}s")
+
+    for vocab in (8192, 32000):
+        naive, chunked = rows[(vocab, "naive")], rows[(vocab, "chunked")]
+        assert abs(naive["loss"] - chunked["loss"]) < 1e-4
+        assert chunked["peak_bytes"] < naive["logits_bytes"] < naive["peak_bytes"]
+
+    # Gradients match autodiff through the full logits
+    h = mx.random.normal((3, 40, 16))
+    w = mx.random.normal((100, 16)) * 0.25
+    t = mx.random.randint(0, 100, (3, 40))
+    naive_grads = mx.grad(lambda h, w: mx.mean(nn.losses.cross_entropy(h @ w.T, t)), argnums=(0, 1))(h, w)
+    chunked_grads = mx.grad(lambda h, w: BaseModel.chunked_cross_entropy(h, w, t, chunk_size=32), argnums=(0, 1))(h, w)
+    for a, b in zip(naive_grads, chunked_grads):
+        assert a.shape == b.shape
+        assert mx.allclose(a, b, atol=1e-6)
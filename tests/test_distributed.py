@@ -5,21 +5,23 @@ from datasets import Dataset
 from mlx_train.models import SimpleModel
 from mlx_train.data import DatasetManager
 from mlx_train.training.distributed import DistributedController
+from mlx_train.core.distributed import MLXCommunicator
 import json
 from pathlib import Path
 import time
+from mlx.utils import tree_map
 
 @pytest.mark.distributed
-def test_basic_distributed():
+def test_basic_distributed(tmp_path):
     """Test basic distributed training functionality"""
-    controller = DistributedController()
+    controller = DistributedController(checkpoint_dir=str(tmp_path / "checkpoints"))
     world = controller.world
     
     config = {
         "hidden_size": 128,
         "batch_size": 8,
         "memory_per_device": 8,
-        "cache_dir": f"test_cache_{world.rank}",
+        "cache_dir": str(tmp_path / f"cache_{controller.rank}"),
         "model_size": 128 * 128
     }
     
@@ -85,14 +87,10 @@ def test_basic_distributed():
     
     # Basic assertions
     assert reduced_grad is not None, "Gradient reduction failed"
-    
-    # Cleanup
-    import shutil
-    shutil.rmtree(f"test_cache_{world.rank}", ignore_errors=True)
 
-def test_distributed_recovery():
+def test_distributed_recovery(tmp_path):
     """Test error recovery in distributed setting"""
-    controller = DistributedController()
+    controller = DistributedController(checkpoint_dir=str(tmp_path))
     world = controller.world
     
     # Create checkpoint directory
@@ -134,20 +132,15 @@ def test_distributed_recovery():
     if world.rank == 0:  # Only check on primary device
         assert epoch == 1, "Checkpoint epoch not loaded correctly"
     
-    # Cleanup
-    if world.rank == 0:
-        import shutil
-        shutil.rmtree(controller.checkpoint_dir, ignore_errors=True)
-    
 def test_memory_optimization():
     """Verify memory optimization strategies"""
     
 def test_model_synchronization():
     """Ensure model sync across devices"""
     
-def test_device_discovery():
+def test_device_discovery(tmp_path):
     """Test device discovery and connection"""
-    controller = DistributedController()
+    controller = DistributedController(checkpoint_dir=str(tmp_path))
     world = controller.world
     
     # Test device info using MLX's built-in methods
@@ -162,9 +155,9 @@ def test_device_discovery():
     assert devices["status"] == "connected"
     
 @pytest.mark.distributed
-def test_training_resumption():
+def test_training_resumption(tmp_path):
     """Test training resumption after interruption"""
-    controller = DistributedController()
+    controller = DistributedController(checkpoint_dir=str(tmp_path))
     
     # Setup basic training state
     checkpoint = {
@@ -223,4 +216,1096 @@ def test_memory_management():
         peak_memory = mx.metal.get_peak_memory()
         
         assert peak_memory < config["memory_per_device"] * 1e9, "Memory usage exceeds limit"
- 
\ No newline at end of file
+ 
+@pytest.mark.distributed
+def test_overlapped_gradient_reduction(simple_model):
+    """Test bucketed all-reduce launched asynchronously during backward"""
+    import mlx.nn as nn
+    from mlx.utils import tree_flatten
+
+    controller = DistributedController(bucket_size_mb=0.01)
+    x = mx.random.normal((4, simple_model.hidden_size))
+    _, grads = nn.value_and_grad(simple_model, _mse_loss)(simple_model, x, x)
+
+    # Exercise the bucketed path even on a single rank
+    pending = controller._bucketed_all_reduce(grads, overlap=True)
+    assert len(pending.buffers) > 1
+    reduced = pending.wait()
+    expected = controller._bucketed_all_reduce(grads)
+
+    reduced_flat, expected_flat = dict(tree_flatten(reduced)), dict(tree_flatten(expected))
+    assert set(reduced_flat) == set(expected_flat)
+    for name in expected_flat:
+        assert mx.allclose(reduced_flat[name], expected_flat[name])
+
+def test_gradient_compression():
+    """Test gradient compressors and their bytes-on-wire accounting"""
+    from mlx_train.core.distributed import MLXCommunicator
+    from mlx_train.training.compression import get_compressor
+
+    group = MLXCommunicator()
+    grad = mx.random.normal((64, 32))
+
+    # fp16 casting halves the bytes of a dense fp32 all-reduce
+    cast = get_compressor("fp16")
+    assert mx.allclose(cast.reduce("w", grad, group), grad, atol=1e-2)
+    assert cast.stats()["compression_ratio"] == 2.0
+
+    # Top-k with error feedback never loses gradient mass
+    topk = get_compressor("topk", ratio=0.1)
+    sent = mx.zeros_like(grad)
+    for _ in range(3):
+        sent = sent + topk.reduce("w", grad, group)
+    if group.size == 1:
+        assert mx.allclose(sent + topk.residuals["w"].reshape(grad.shape), 3 * grad, atol=1e-4)
+    assert topk.stats()["compression_ratio"] > 4
+
+    # PowerSGD recovers a low-rank gradient exactly
+    powersgd = get_compressor("powersgd", rank=4)
+    low_rank = mx.random.normal((64, 2)) @ mx.random.normal((2, 32))
+    assert mx.allclose(powersgd.reduce("w", low_rank, group), low_rank, atol=1e-3)
+    assert powersgd.stats()["bytes_sent"] == (64 + 32) * 4 * 4
+
+    controller = DistributedController(compression=get_compressor("bf16"))
+    assert controller.communication_stats()["bytes_sent"] == 0
+
+
+def _seeded_model(hidden_size: int) -> SimpleModel:
+    """Dropout-free SimpleModel, initialized identically in every process"""
+    mx.random.seed(0)
+    return SimpleModel(hidden_size=hidden_size, dropout=0.0)
+
+def _mse_loss(model, x, y):
+    return model.loss_fn(model(x), y)
+
+def _flat_params(model) -> dict:
+    from mlx.utils import tree_flatten
+    return {name: np.array(value) for name, value in tree_flatten(model.parameters())}
+
+def _launch(worker, world_size: int, *args):
+    """Run `worker(comm, *args)` on `world_size` shared-memory ranks"""
+    from mlx_train.core.distributed import launch_local
+    return launch_local(worker, world_size, *args, slot_mb=0.01)
+
+def _reference_training(hidden_size: int, optimizer, steps):
+    """Single-process training on the rank-averaged gradient of every step
+
+    `steps` holds each step's per-rank inputs (the model learns the
+    identity, so inputs double as targets). Returns the model and each
+    step's per-rank losses.
+    """
+    import mlx.nn as nn
+
+    model = _seeded_model(hidden_size)
+    losses = []
+    for inputs in steps:
+        results = [nn.value_and_grad(model, _mse_loss)(model, x, x) for x in inputs]
+        losses.append([loss.item() for loss, _ in results])
+        optimizer.update(model, tree_map(lambda *g: sum(g) / len(g), *[g for _, g in results]))
+        mx.eval(model.parameters())
+    return model, losses
+
+class _LazyCommunicator(MLXCommunicator):
+    """Shared-memory all-reduce taking the controller's code paths for lazy `mx.distributed`"""
+
+    def __init__(self, comm):
+        self.comm, self.rank, self.size = comm, comm.rank, comm.size
+
+    def all_reduce(self, x: mx.array) -> mx.array:
+        return self.comm.all_reduce(x)
+
+def _collectives_worker(comm):
+    """Run every collective on a shared-memory rank (spawned by launch_local)"""
+    from mlx_train.training.distributed import DistributedController
+
+    size, rank = comm.size, comm.rank
+    x = mx.arange(size * 3, dtype=mx.float32) + rank
+    results = {
+        "all_reduce": comm.all_reduce(x),
+        "broadcast": comm.broadcast(x, root=size - 1),
+        "all_gather": comm.all_gather(mx.array([rank, rank], dtype=mx.int32)),
+        "reduce_scatter": comm.reduce_scatter(x),
+        "bf16": comm.all_reduce(mx.ones((4,), dtype=mx.bfloat16)).astype(mx.float32)
+    }
+    comm.barrier()
+
+    # Bucketed gradient averaging through the controller on the same transport
+    controller = DistributedController(bucket_size_mb=1e-4, communicator=comm)
+    grads = {"w": mx.full((8, 8), float(rank)), "b": mx.full((8,), float(rank))}
+    time.sleep(0.5)  # Compute between steps must not count as communication
+    results["grads"] = controller.all_reduce_grads(grads)
+    stats = {"comm_time": controller.comm_time, "comm_bytes": controller.comm_bytes,
+             "bandwidth": controller.network_bandwidth()}
+
+    # Overlapped buckets on a lazy backend are counted at launch and timed in wait()
+    lazy = DistributedController(bucket_size_mb=1e-4, communicator=_LazyCommunicator(comm))
+    results["async_grads"] = lazy.all_reduce_grads_async(grads).wait()
+    stats["async"] = {"comm_time": lazy.comm_time, "comm_bytes": lazy.comm_bytes,
+                      "bandwidth": lazy.network_bandwidth()}
+    return {k: np.array(v) if isinstance(v, mx.array) else {n: np.array(g) for n, g in v.items()}
+            for k, v in results.items()}, stats
+
+@pytest.mark.parametrize("world_size", [2, 4])
+def test_shared_memory_collectives(world_size):
+    """Test collective correctness with N local ranks over shared memory"""
+    from mlx_train.core.distributed import launch_local
+
+    outputs = launch_local(_collectives_worker, world_size, slot_mb=0.0001)
+    base = np.arange(world_size * 3, dtype=np.float32)
+    total = world_size * base + sum(range(world_size))
+    chunk = 3
+
+    for rank, (out, stats) in enumerate(outputs):
+        assert np.array_equal(out["all_reduce"], total)
+        assert np.array_equal(out["broadcast"], base + world_size - 1)
+        assert out["all_gather"].tolist() == [r for r in range(world_size) for _ in range(2)]
+        assert np.array_equal(out["reduce_scatter"], total[rank * chunk:(rank + 1) * chunk])
+        assert np.array_equal(out["bf16"], np.full(4, world_size))
+        mean_rank = sum(range(world_size)) / world_size
+        assert np.allclose(out["grads"]["w"], mean_rank)
+        assert np.allclose(out["grads"]["b"], mean_rank)
+        assert stats["comm_bytes"] == (64 + 8) * 4
+        assert 0 < stats["comm_time"] < 0.5
+        assert np.isclose(stats["bandwidth"], stats["comm_bytes"] / stats["comm_time"] / 1e6)
+        assert np.allclose(out["async_grads"]["w"], mean_rank)
+        assert stats["async"]["comm_bytes"] == (64 + 8) * 4
+        assert stats["async"]["comm_time"] > 0 and stats["async"]["bandwidth"] > 0
+
+def _zero_worker(comm, stage):
+    """Take two ZeRO steps on a shared-memory rank (spawned by launch_local)"""
+    import mlx.nn as nn
+    import mlx.optimizers as optim
+    from mlx_train.training.zero import ZeROOptimizer
+
+    model = _seeded_model(32)
+    optimizer = ZeROOptimizer(optim.Adam(learning_rate=1e-2), comm, stage=stage, bucket_size_mb=0.001)
+    for step in range(2):
+        # Each rank sees a different micro-batch
+        x = mx.random.normal((4, 32), key=mx.random.key(100 * step + comm.rank))
+        _, grads = nn.value_and_grad(model, _mse_loss)(model, x, x)
+        optimizer.update(model, grads)
+        mx.eval(model.parameters())
+    return _flat_params(model), optimizer.memory_stats()
+
+@pytest.mark.parametrize("stage", [1, 2])
+def test_zero_sharded_optimizer(stage):
+    """Test ZeRO matches replicated Adam while sharding optimizer state"""
+    import mlx.optimizers as optim
+    from mlx.utils import tree_flatten
+
+    world_size = 2
+    outputs = _launch(_zero_worker, world_size, stage)
+
+    # Reference: plain Adam on the gradients averaged over both micro-batches
+    optimizer = optim.Adam(learning_rate=1e-2)
+    model, _ = _reference_training(32, optimizer, [
+        [mx.random.normal((4, 32), key=mx.random.key(100 * step + rank)) for rank in range(world_size)]
+        for step in range(2)
+    ])
+    expected = _flat_params(model)
+
+    full_state = sum(v.nbytes for _, v in tree_flatten(optimizer.state) if isinstance(v, mx.array) and v.ndim)
+    for params, stats in outputs:
+        for name, value in expected.items():
+            assert np.allclose(params[name], value, atol=1e-5)
+        # Each rank keeps only its share of the Adam moments
+        assert stats["optimizer_state_bytes"] <= full_state / world_size + 64
+    if stage == 2:
+        assert outputs[0][1]["gradient_bytes"] < full_state / 2
+
+def _fsdp_worker(comm):
+    """Take one fully sharded step on a shared-memory rank (spawned by launch_local)"""
+    import mlx.optimizers as optim
+    from mlx_train.training.fsdp import FullyShardedDataParallel
+
+    fsdp = FullyShardedDataParallel(_seeded_model(32), comm)
+    x = mx.random.normal((4, 32), key=mx.random.key(comm.rank))
+    loss, grads = fsdp.value_and_grad(x, x)
+    fsdp.apply_gradients(optim.Adam(learning_rate=1e-2), grads)
+    params = {k: np.array(v) for k, v in fsdp.state_dict().items()}
+    return float(loss.item()), params, fsdp.memory_stats()
+
+def test_fully_sharded_data_parallel():
+    """Test FSDP matches replicated training while each rank holds a shard"""
+    import mlx.optimizers as optim
+
+    world_size = 2
+    outputs = _launch(_fsdp_worker, world_size)
+
+    model, (losses,) = _reference_training(32, optim.Adam(learning_rate=1e-2), [
+        [mx.random.normal((4, 32), key=mx.random.key(rank)) for rank in range(world_size)]
+    ])
+    expected = _flat_params(model)
+    full_bytes = sum(v.nbytes for v in expected.values())
+
+    for rank, (loss, params, stats) in enumerate(outputs):
+        assert np.isclose(loss, losses[rank], atol=1e-6)
+        for name, value in expected.items():
+            assert np.allclose(params[name], value, atol=1e-5)
+        assert stats["shard_bytes"] <= full_bytes / world_size + 64
+        # Never more than one stage gathered at a time
+        assert stats["peak_gathered_bytes"] < full_bytes
+
+def test_pipeline_partition_and_schedule():
+    """Test capability-weighted partitioning and the 1F1B bubble"""
+    from mlx_train.training.pipeline import partition_stages, one_f_one_b, simulate_schedule
+
+    # A node with 3x the compute gets 3x the layers
+    assert partition_stages([1.0] * 8, [1.0, 3.0]) == [(0, 2), (2, 8)]
+    # ... unless it runs out of memory
+    assert partition_stages([1.0] * 8, [1.0, 3.0], [1.0] * 8, [8.0, 4.0]) == [(0, 4), (4, 8)]
+
+    schedule = one_f_one_b(4, 8)
+    for ops in schedule:
+        assert sorted(ops) == sorted([("F", m) for m in range(8)] + [("B", m) for m in range(8)])
+    # Uniform stages: bubble is (S - 1) / (M + S - 1)
+    plan = simulate_schedule(schedule, [1.0] * 4, [2.0] * 4)
+    assert np.isclose(plan["bubble_fraction"], 3 / 11)
+
+class _RendezvousCommunicator:
+    """Wrap a communicator so `send` blocks until the peer has received"""
+
+    def __init__(self, comm, acks):
+        self.comm = comm
+        self.acks = acks
+
+    def __getattr__(self, name):
+        return getattr(self.comm, name)
+
+    def send(self, x, dst):
+        self.comm.send(x, dst)
+        # A deadlocked schedule never gets its ack
+        self.acks[(self.comm.rank, dst)].get(timeout=60)
+
+    def recv(self, shape, dtype, src):
+        x = self.comm.recv(shape, dtype, src)
+        self.acks[(src, self.comm.rank)].put(None)
+        return x
+
+def _pipeline_worker(comm, acks=None):
+    """Take one 1F1B pipeline step on a shared-memory rank (spawned by launch_local)"""
+    import mlx.optimizers as optim
+    from mlx_train.core.hardware import HardwareConfig
+    from mlx_train.training.pipeline import PipelineParallel
+
+    if acks is not None:
+        comm = _RendezvousCommunicator(comm, acks)
+    model = _seeded_model(32)
+    hardware = [HardwareConfig(device_type="M1", memory_gb=8), HardwareConfig(device_type="M3 Max", memory_gb=64)]
+    pipeline = PipelineParallel(model, hardware, comm, num_microbatches=4)
+    x = mx.random.normal((8, 32), key=mx.random.key(1))
+    stats = pipeline.train_step(x, x, optim.SGD(learning_rate=0.1))
+    # Stages share their layers with the model; only the local ones are updated
+    return stats, pipeline.partition, _flat_params(model)
+
+@pytest.mark.parametrize("rendezvous", [False, True])
+def test_pipeline_parallel_training(rendezvous):
+    """Test a 2-stage pipeline step matches single-device training"""
+    import multiprocessing as mp
+    import mlx.optimizers as optim
+
+    # With rendezvous sends, 1F1B must pair each send with the peer's receive
+    acks = {(0, 1): mp.get_context("spawn").Queue(), (1, 0): mp.get_context("spawn").Queue()} if rendezvous else None
+    outputs = _launch(_pipeline_worker, 2, acks)
+
+    model, [[loss]] = _reference_training(32, optim.SGD(learning_rate=0.1), [
+        [mx.random.normal((8, 32), key=mx.random.key(1))]
+    ])
+
+    (first_stats, partition, first), (last_stats, _, last) = outputs
+    assert partition == [(0, 1), (1, 2)]
+    for stats in (first_stats, last_stats):
+        assert np.isclose(stats["loss"], loss, atol=1e-5)
+        assert 0 <= stats["bubble_fraction"] <= 1
+    assert np.allclose(first["linear1.weight"], np.array(model.linear1.weight), atol=1e-5)
+    assert np.allclose(last["linear2.weight"], np.array(model.linear2.weight), atol=1e-5)
+
+def _load_balance_worker(comm, speeds):
+    """Rebalance against simulated per-rank speeds (spawned by launch_local)"""
+    import mlx.nn as nn
+    from mlx_train.training.load_balance import LoadBalancer
+
+    balancer = LoadBalancer(global_batch_size=16, capabilities=[1.0] * comm.size, communicator=comm)
+    history = [list(balancer.sizes)]
+    for _ in range(3):
+        # Compute time proportional to local samples / this rank's speed
+        balancer.record_step(balancer.local_batch_size / speeds[comm.rank])
+        history.append(list(balancer.sizes))
+
+    # Sample-weighted local gradients average to the global-batch gradient
+    model = _seeded_model(8)
+    x = mx.random.normal((16, 8), key=mx.random.key(3))
+    local_x, = balancer.shard_batch((x,))
+    _, grads = nn.value_and_grad(model, _mse_loss)(model, local_x, local_x)
+    controller = DistributedController(communicator=comm)
+    reduced = controller.all_reduce_grads(balancer.weight_gradients(grads))
+
+    # A short final batch is split in the same proportions and weighted by its real slices
+    short_x = mx.random.normal((5, 8), key=mx.random.key(4))
+    local_x, = balancer.shard_batch((short_x,))
+    _, grads = nn.value_and_grad(model, _mse_loss)(model, local_x, local_x)
+    short = controller.all_reduce_grads(balancer.weight_gradients(grads))
+    short_sizes = list(balancer.step_sizes)
+    with pytest.raises(ValueError):
+        balancer.shard_batch((short_x[:1],))
+    return (history, balancer.last_idle, balancer.unbalanced_idle(), np.array(reduced["linear1"]["weight"]),
+            short_sizes, np.array(short["linear1"]["weight"]))
+
+def test_heterogeneous_load_balancing():
+    """Test per-rank batch sizes follow throughput and keep gradients exact"""
+    import mlx.nn as nn
+
+    outputs = _launch(_load_balance_worker, 2, [1.0, 3.0])
+    history, idle, unbalanced, grad, short_sizes, _ = outputs[0]
+
+    assert history[0] == [8, 8]
+    # A 3x faster rank ends up with 3x the samples and nobody waits
+    assert history[-1] == [4, 12]
+    assert max(idle) == 0.0
+    assert unbalanced[0] == 0.0 and unbalanced[1] > 0
+
+    model = _seeded_model(8)
+    x = mx.random.normal((16, 8), key=mx.random.key(3))
+    _, grads = nn.value_and_grad(model, _mse_loss)(model, x, x)
+    short_x = mx.random.normal((5, 8), key=mx.random.key(4))
+    _, short_grads = nn.value_and_grad(model, _mse_loss)(model, short_x, short_x)
+    assert short_sizes == [1, 4]
+    for _, _, _, rank_grad, _, short_grad in outputs:
+        assert np.allclose(rank_grad, np.array(grads["linear1"]["weight"]), atol=1e-6)
+        assert np.allclose(short_grad, np.array(short_grads["linear1"]["weight"]), atol=1e-6)
+
+_TRANSFORMER_CONFIG = {
+    "hidden_size": 32, "num_layers": 2, "num_heads": 4, "num_kv_heads": 2, "vocab_size": 64,
+    "tensor_parallel": True
+}
+
+class _CountingCommunicator:
+    """Wrap a communicator and count its all-reduces"""
+
+    def __init__(self, comm):
+        self.comm = comm
+        self.all_reduces = 0
+
+    def __getattr__(self, name):
+        return getattr(self.comm, name)
+
+    def all_reduce(self, x):
+        self.all_reduces += 1
+        return self.comm.all_reduce(x)
+
+def _tensor_parallel_worker(comm):
+    """Run tensor-parallel MLP and attention on a shared-memory rank (spawned by launch_local)"""
+    import mlx.nn as nn
+    from mlx_train.models.architectures.tensor_parallel import apply_tensor_parallel, ShardedAttention
+
+    model = _seeded_model(16)
+    replaced = apply_tensor_parallel(model, comm, column=["linear1"], row=["linear2"])
+    x = mx.random.normal((4, 16), key=mx.random.key(1))
+    loss, grads = nn.value_and_grad(model, _mse_loss)(model, x, x)
+
+    mx.random.seed(0)
+    attention = nn.MultiHeadAttention(16, 4)
+    sharded = ShardedAttention.from_attention(attention, comm)
+    h = mx.random.normal((2, 5, 16), key=mx.random.key(2))
+    attention_out = sharded(h, h, h)
+
+    # The Transformer's default plan shards its (grouped-query) attention and MLP
+    from mlx_train.models.builder import ModelBuilder
+    mx.random.seed(0)
+    counting = _CountingCommunicator(comm)
+    transformer = ModelBuilder.build(_TRANSFORMER_CONFIG, model_type="transformer", communicator=counting)
+    tokens = mx.random.randint(0, 64, (2, 6), key=mx.random.key(3))
+    logits = transformer(tokens)
+    counting.all_reduces = 0
+    _, transformer_grads = nn.value_and_grad(transformer, lambda m, x: m.loss(x[:, :-1], x[:, 1:]))(transformer, tokens)
+    mx.eval(transformer_grads)
+
+    # Heads must not be split across ranks, even when the widths divide
+    with pytest.raises(ValueError):
+        ModelBuilder.build({**_TRANSFORMER_CONFIG, "num_kv_heads": 1}, model_type="transformer", communicator=comm)
+    return {
+        "replaced": replaced,
+        "loss": loss.item(),
+        "linear1": np.array(grads["linear1"]["weight"]),
+        "linear2": np.array(grads["linear2"]["weight"]),
+        "attention": np.array(attention_out),
+        "transformer": np.array(logits),
+        "kv_rows": transformer.layers[0].attention.k_proj.weight.shape[0],
+        "embed_grad": np.array(transformer_grads["embed_tokens"]["weight"]),
+        "all_reduces": counting.all_reduces
+    }
+
+def test_tensor_parallel_layers():
+    """Test column/row-parallel linears and head-sharded attention match dense layers"""
+    import mlx.nn as nn
+
+    world_size = 2
+    outputs = _launch(_tensor_parallel_worker, world_size)
+
+    model = _seeded_model(16)
+    x = mx.random.normal((4, 16), key=mx.random.key(1))
+    loss, grads = nn.value_and_grad(model, _mse_loss)(model, x, x)
+    w1, w2 = np.array(grads["linear1"]["weight"]), np.array(grads["linear2"]["weight"])
+
+    mx.random.seed(0)
+    attention = nn.MultiHeadAttention(16, 4)
+    h = mx.random.normal((2, 5, 16), key=mx.random.key(2))
+    expected_attention = np.array(attention(h, h, h))
+
+    from mlx_train.models import Transformer
+    mx.random.seed(0)
+    transformer = Transformer.from_config(_TRANSFORMER_CONFIG)
+    tokens = mx.random.randint(0, 64, (2, 6), key=mx.random.key(3))
+    expected_logits = np.array(transformer(tokens))
+    _, transformer_grads = nn.value_and_grad(transformer, lambda m, x: m.loss(x[:, :-1], x[:, 1:]))(transformer, tokens)
+    expected_embed_grad = np.array(transformer_grads["embed_tokens"]["weight"])
+
+    for rank, out in enumerate(outputs):
+        assert out["replaced"] == {"column": ["linear1"], "row": ["linear2"], "attention": []}
+        assert np.isclose(out["loss"], loss.item(), atol=1e-6)
+        # Column-parallel shards output rows, row-parallel shards input columns
+        assert np.allclose(out["linear1"], w1[rank * 8:(rank + 1) * 8], atol=1e-6)
+        assert np.allclose(out["linear2"], w2[:, rank * 8:(rank + 1) * 8], atol=1e-6)
+        assert np.allclose(out["attention"], expected_attention, atol=1e-5)
+        assert np.allclose(out["transformer"], expected_logits, atol=1e-4)
+        assert out["kv_rows"] == 8  # One of the two KV heads per rank
+        assert np.allclose(out["embed_grad"], expected_embed_grad, atol=1e-5)
+        # Per layer: attention and MLP outputs in forward, one shared input each in backward
+        assert out["all_reduces"] == 4 * _TRANSFORMER_CONFIG["num_layers"]
+
+    # ModelBuilder applies the same layers by pattern (single rank here)
+    from mlx_train.models.builder import ModelBuilder
+    from mlx_train.models.architectures.tensor_parallel import ColumnParallelLinear, RowParallelLinear
+    built = ModelBuilder.build(
+        {"hidden_size": 16, "tensor_parallel": {"column": ["linear1"], "row": ["linear2"]}},
+        model_type="simple"
+    )
+    assert isinstance(built.linear1, ColumnParallelLinear)
+    assert isinstance(built.linear2, RowParallelLinear)
+
+def _elastic_worker(comm, checkpoint_dir):
+    """ZeRO training that checkpoints every step; rank 1 dies on the first attempt"""
+    import os
+    import mlx.nn as nn
+    import mlx.optimizers as optim
+    from mlx_train.core.elastic import RESTART_ENV
+    from mlx_train.training.zero import ZeROOptimizer
+
+    model = _seeded_model(8)
+    optimizer = ZeROOptimizer(optim.Adam(learning_rate=1e-2), comm, stage=2)
+    controller = DistributedController(communicator=comm, checkpoint_dir=checkpoint_dir)
+    model, start = controller.load_checkpoint(model, optimizer)
+
+    for step in range(start, 3):
+        # The global batch is fixed; each rank takes an equal slice of it
+        x = mx.random.normal((8, 8), key=mx.random.key(step))
+        chunk = 8 // comm.size
+        local = x[comm.rank * chunk:(comm.rank + 1) * chunk]
+        _, grads = nn.value_and_grad(model, _mse_loss)(model, local, local)
+        optimizer.update(model, grads)
+        controller.save_checkpoint(model, optimizer, step + 1, {}, samples_processed=(step + 1) * 8)
+        if os.environ[RESTART_ENV] == "0" and comm.rank == 1:
+            os._exit(1)  # Simulate losing a laptop mid-run
+    return _flat_params(model), controller.resume_state
+
+def test_elastic_restart(tmp_path):
+    """Test a dead rank triggers a restart that resumes on the survivors"""
+    import mlx.optimizers as optim
+    from mlx_train.core.elastic import ElasticSupervisor
+
+    supervisor = ElasticSupervisor(_elastic_worker, world_size=2, max_restarts=1, slot_mb=0.01, timeout=60)
+    outputs = supervisor.run(str(tmp_path))
+    assert supervisor.history == [2, 1]
+    params, resume_state = outputs[0]
+    assert resume_state["world_size"] == 2
+    assert resume_state["samples_processed"] == 8
+
+    # Same result as three uninterrupted steps on the full batch
+    model, _ = _reference_training(8, optim.Adam(learning_rate=1e-2), [
+        [mx.random.normal((8, 8), key=mx.random.key(step))] for step in range(3)
+    ])
+    for name, value in _flat_params(model).items():
+        assert np.allclose(params[name], value, atol=1e-5)
+
+def test_mpi_elastic_restart(tmp_path):
+    """Test a failed multi-node job is relaunched without its unreachable host"""
+    import sys
+    from mlx_train.core.distributed import RankFailure
+    from mlx_train.core.elastic import MPIElasticSupervisor, RESTART_ENV
+
+    # Stand-in for mpirun: log the hostfile, fail on the first attempt
+    fake_mpirun = (
+        "import os, sys; hostfile = sys.argv[sys.argv.index('--hostfile') + 1]; "
+        f"open({str(tmp_path / 'log')!r}, 'a').write(open(hostfile).read() + '--\\n'); "
+        f"sys.exit(1 if os.environ[{RESTART_ENV!r}] == '0' else 0)"
+    )
+    supervisor = MPIElasticSupervisor(
+        ["python", "train.py"], ["node1", "node2", "node3"], slots_per_host=2,
+        hostfile=tmp_path / "hostfile", launcher=[sys.executable, "-c", fake_mpirun],
+        probe=lambda host: host != "node2"
+    )
+    assert supervisor.mpirun_command(["node1"])[-6:] == ["-np", "2", "-x", RESTART_ENV, "python", "train.py"]
+    assert supervisor.run() == ["node1", "node3"]
+    assert supervisor.history == [["node1", "node2", "node3"], ["node1", "node3"]]
+    attempts = (tmp_path / "log").read_text().split("--\n")[:-1]
+    assert attempts[1] == "node1 slots=2\nnode3 slots=2\n"
+
+    # Too few reachable hosts left: give up and report the lost ranks
+    supervisor = MPIElasticSupervisor(
+        ["python", "train.py"], ["node1", "node2"], min_hosts=2, hostfile=tmp_path / "hostfile",
+        launcher=[sys.executable, "-c", "import sys; sys.exit(1)"], probe=lambda host: host == "node1"
+    )
+    with pytest.raises(RankFailure) as failure:
+        supervisor.run()
+    assert failure.value.failed_ranks == [1]
+
+def _local_sgd_worker(comm, outer_lr):
+    """Train replicas with periodic delta averaging (spawned by launch_local)"""
+    import mlx.nn as nn
+    import mlx.optimizers as optim
+    from mlx_train.training.local_sgd import LocalSGD
+
+    model = _seeded_model(8)
+    controller = DistributedController(communicator=comm)
+    local_sgd = LocalSGD(model, optim.SGD(learning_rate=0.1), controller, sync_every=4, outer_lr=outer_lr)
+    for step in range(8):
+        x = mx.random.normal((4, 8), key=mx.random.key(10 * step + comm.rank))
+        _, grads = nn.value_and_grad(model, _mse_loss)(model, x, x)
+        local_sgd.step(grads, num_tokens=4)
+    return _flat_params(model), local_sgd.communication_stats()
+
+@pytest.mark.parametrize("outer_lr", [None, 0.7])
+def test_local_sgd(outer_lr):
+    """Test Local SGD / DiLoCo keeps replicas in sync and cuts traffic by H"""
+    outputs = _launch(_local_sgd_worker, 2, outer_lr)
+    (params_a, stats), (params_b, _) = outputs
+    for name in params_a:
+        assert np.allclose(params_a[name], params_b[name], atol=1e-6)
+    assert stats["syncs"] == 2
+    assert np.isclose(stats["reduction"], 4.0)
+
+def _bench_worker(comm, sizes):
+    """Run the collective microbenchmark (spawned by launch_local)"""
+    from mlx_train.utils.benchmark import benchmark_collectives
+    return benchmark_collectives(comm, sizes=sizes, iterations=3, warmup=1)
+
+def test_collective_benchmark(tmp_path):
+    """Test the collective benchmark rows, bus bandwidth and saved results"""
+    from mlx_train.utils.benchmark import bus_bandwidth_factor, peak_bus_bandwidth, save_results
+
+    rank0, rank1 = _launch(_bench_worker, 2, [1024, 4096])
+    assert len(rank0) == 3 * 2 * 2  # ops x dtypes x sizes
+    assert [r["latency_us"] for r in rank0] == [r["latency_us"] for r in rank1]
+    for row in rank0:
+        assert row["world_size"] == 2 and row["latency_us"] > 0
+        assert np.isclose(row["busbw_gbps"], row["algbw_gbps"] * bus_bandwidth_factor(row["op"], 2))
+    assert {r["bytes"] for r in rank0 if r["dtype"] == "bfloat16"} == {1024, 4096}
+    assert bus_bandwidth_factor("all_reduce", 4) == 1.5
+    assert peak_bus_bandwidth(rank0) > 0
+
+    path = tmp_path / "comm_benchmark.json"
+    save_results(rank0, path, metadata={"backend": "shared_memory"})
+    saved = json.loads(path.read_text())
+    assert saved["metadata"]["backend"] == "shared_memory"
+    assert len(saved["results"]) == len(rank0)
+
+def _telemetry_worker(comm, log_path):
+    """Record synchronous step timings with rank 2 three times slower (spawned by launch_local)"""
+    from mlx_train.utils.metrics import DistributedMetricsTracker
+
+    tracker = DistributedMetricsTracker(comm.size, communicator=comm, report_every=4, log_path=log_path)
+    flagged = []
+    for step in range(8):
+        computes = [0.01 + 0.001 * (step % 2)] * comm.size
+        computes[2] *= 3
+        # Faster ranks wait in the all-reduce until the slowest one arrives
+        wait = max(computes) - computes[comm.rank] + 0.002
+        result = tracker.record_step(computes[comm.rank], wait_time=wait)
+        if result is not None:
+            flagged.append(result)
+    return flagged, tracker.step_times(), tracker.rank_compute_times()
+
+def test_straggler_detection(tmp_path):
+    """Test per-rank timing summaries flag the slow rank and are logged on rank 0"""
+    log_path = tmp_path / "telemetry.jsonl"
+    outputs = _launch(_telemetry_worker, 3, str(log_path))
+    for flagged, step_times, compute_times in outputs:
+        assert flagged == [[2], [2]]
+        # Step times are equal across ranks; only compute tells the straggler apart
+        assert np.allclose(step_times, step_times[0])
+        assert np.isclose(compute_times[2], 3 * compute_times[0])
+
+    records = [json.loads(line) for line in log_path.read_text().splitlines()]
+    assert [r["step"] for r in records] == [4, 8]
+    assert records[-1]["stragglers"] == [2]
+    assert set(records[-1]["ranks"]) == {"0", "1", "2"}
+    assert records[-1]["ranks"]["0"]["steps"] == 8
+    assert records[-1]["ranks"]["0"]["wait_p95"] > records[-1]["ranks"]["2"]["wait_p95"]
+
+def _broadcast_sync_worker(comm):
+    """Synchronize differently initialized replicas (spawned by launch_local)"""
+    from mlx.utils import tree_flatten
+
+    mx.random.seed(comm.rank)
+    model = SimpleModel(hidden_size=16)
+    model.linear2.set_dtype(mx.bfloat16)
+    # Tiny buckets so the parameters span several broadcasts
+    controller = DistributedController(communicator=comm, bucket_size_mb=0.001)
+    before = controller.verify_parameters(model)
+    controller.synchronize_model(model)
+    params = {k: np.array(v.astype(mx.float32)) for k, v in tree_flatten(model.parameters())}
+    dtypes = {k: str(v.dtype) for k, v in tree_flatten(model.parameters())}
+    return before, controller.verify_parameters(model), params, dtypes
+
+def test_broadcast_parameter_sync():
+    """Test replicas become bit-identical to rank 0 through bucketed broadcast"""
+    from mlx.utils import tree_flatten
+
+    mx.random.seed(0)
+    reference = SimpleModel(hidden_size=16)
+    reference.linear2.set_dtype(mx.bfloat16)
+    expected = {k: np.array(v.astype(mx.float32)) for k, v in tree_flatten(reference.parameters())}
+
+    outputs = _launch(_broadcast_sync_worker, 3)
+    for before, after, params, dtypes in outputs:
+        assert before == [1, 2]
+        assert after == []
+        assert dtypes["linear2.weight"] == "mlx.core.bfloat16"
+        for name, value in expected.items():
+            assert np.array_equal(params[name], value)
+
+def test_binary_checkpoint_roundtrip(tmp_path):
+    """Test safetensors checkpoints keep nested parameters, optimizer state and dtypes"""
+    import mlx.nn as nn
+    import mlx.optimizers as optim
+    from mlx.utils import tree_flatten
+    from mlx_train.training.checkpoint import MANIFEST_FILE, list_checkpoints
+
+    model = SimpleModel(hidden_size=8, dropout=0.0)
+    model.linear2.set_dtype(mx.bfloat16)
+    optimizer = optim.AdamW(learning_rate=1e-3)
+    x = mx.random.normal((4, 8))
+    _, grads = nn.value_and_grad(model, lambda m: m.loss_fn(m(x), x))(model)
+    optimizer.update(model, grads)
+
+    controller = DistributedController(checkpoint_dir=str(tmp_path))
+    controller.save_checkpoint(model, optimizer, epoch=3, metrics={"loss": 0.5}, samples_processed=12)
+    manifest = json.loads((tmp_path / "checkpoint_epoch_3" / MANIFEST_FILE).read_text())
+    assert manifest["tensors"]["model"]["linear2.weight"]["dtype"] == "bfloat16"
+    assert "linear1.weight.m" in manifest["tensors"]["optimizer"]
+
+    restored = SimpleModel(hidden_size=8, dropout=0.0)
+    restored_optimizer = optim.AdamW(learning_rate=1e-3)
+    restored_optimizer.init(restored.trainable_parameters())
+    restored, epoch = controller.load_checkpoint(restored, restored_optimizer)
+    assert epoch == 3
+    assert controller.resume_state["samples_processed"] == 12
+    restored_params = dict(tree_flatten(restored.parameters()))
+    for name, value in tree_flatten(model.parameters()):
+        assert value.dtype == restored_params[name].dtype, name
+        assert mx.array_equal(value, restored_params[name]), name
+    restored_state = dict(tree_flatten(restored_optimizer.state))
+    for name, value in tree_flatten(optimizer.state):
+        assert mx.array_equal(value, restored_state[name]), name
+
+    # Legacy JSON checkpoints are still found and read
+    legacy = {"epoch": 4, "model_state": {"linear1.bias": [0.0] * 8}, "optimizer_state": {},
+              "metrics": {}, "world_size": 1, "timestamp": 0}
+    (tmp_path / "checkpoint_epoch_4.json").write_text(json.dumps(legacy))
+    assert [p.name for p in list_checkpoints(tmp_path)] == ["checkpoint_epoch_3", "checkpoint_epoch_4.json"]
+    restored, epoch = controller.load_checkpoint(restored, restored_optimizer)
+    assert epoch == 4
+    assert mx.array_equal(restored.linear1.bias, mx.zeros((8,)))
+
+def test_async_checkpointing(tmp_path):
+    """Test background checkpoint writes snapshot state, stay bounded and land atomically"""
+    import mlx.optimizers as optim
+    from mlx_train.training.checkpoint import AsyncCheckpointWriter, list_checkpoints, read_checkpoint
+
+    model = SimpleModel(hidden_size=8, dropout=0.0)
+    optimizer = optim.SGD(learning_rate=0.1)
+    optimizer.init(model.trainable_parameters())
+    controller = DistributedController(checkpoint_dir=str(tmp_path), async_checkpoints=1)
+
+    expected = []
+    for epoch in range(3):
+        controller.save_checkpoint(model, optimizer, epoch=epoch, metrics={})
+        assert controller.checkpoint_writer.in_flight <= 1
+        expected.append(np.array(model.linear1.weight))
+        # Training continues while the snapshot is written
+        model.update({"linear1": {"weight": model.linear1.weight + 1}})
+        optimizer.state["step"] = mx.array(epoch + 100)
+    controller.wait_for_checkpoints()
+
+    checkpoints = list_checkpoints(tmp_path)
+    assert [p.name for p in checkpoints] == [f"checkpoint_epoch_{e}" for e in range(3)]
+    assert not list(tmp_path.glob(".*"))  # No temporary directories left behind
+    for epoch, path in enumerate(checkpoints):
+        model_state, optimizer_state, _ = read_checkpoint(path)
+        assert np.array_equal(np.array(model_state["linear1"]["weight"]), expected[epoch])
+        assert optimizer_state["step"].item() == (epoch + 99 if epoch else 0)
+
+    # Failed writes surface on the training thread
+    writer = AsyncCheckpointWriter(max_in_flight=2)
+    (tmp_path / "not_a_dir").write_text("")
+    writer.submit(tmp_path / "not_a_dir" / "checkpoint_epoch_0", model.parameters(), {}, {"epoch": 0})
+    with pytest.raises(RuntimeError, match="Background checkpoint write failed"):
+        writer.wait()
+
+def _sharded_checkpoint_worker(comm, checkpoint_dir, save):
+    """Save or reload a sharded ZeRO checkpoint (spawned by launch_local)"""
+    import mlx.nn as nn
+    import mlx.optimizers as optim
+    from mlx.utils import tree_flatten
+    from mlx_train.training.zero import ZeROOptimizer
+
+    model = _seeded_model(16)
+    optimizer = ZeROOptimizer(optim.Adam(learning_rate=1e-2), comm, stage=2, bucket_size_mb=0.001)
+    controller = DistributedController(communicator=comm, checkpoint_dir=checkpoint_dir, sharded_checkpoints=True)
+    if save:
+        x = mx.random.normal((4, 16), key=mx.random.key(comm.rank))
+        _, grads = nn.value_and_grad(model, lambda m: m.loss_fn(m(x), x))(model)
+        optimizer.update(model, grads)
+        controller.save_checkpoint(model, optimizer, epoch=1, metrics={})
+    else:
+        model, _ = controller.load_checkpoint(model, optimizer)
+    state = {k: np.array(v) for k, v in tree_flatten(optimizer.state_dict())}
+    return state, _flat_params(model)
+
+def test_sharded_checkpoint(tmp_path):
+    """Test every rank writes a shard and a different world size reloads it"""
+    import mlx.optimizers as optim
+    from mlx.utils import tree_flatten
+    from mlx_train.training.checkpoint import INDEX_FILE
+
+    saved_state, saved_params = _launch(_sharded_checkpoint_worker, 3, str(tmp_path), True)[0]
+    path = tmp_path / "checkpoint_epoch_1"
+    shards = sorted(p.name for p in path.glob("shard-*.safetensors"))
+    assert shards == [f"shard-{r:05d}-of-00003.safetensors" for r in range(3)]
+    index = json.loads((path / INDEX_FILE).read_text())
+    assert {e["file"] for e in index["tensors"] if e["kind"] == "model"} == set(shards)
+
+    # Two ranks re-shard the optimizer state, reading only their own slices
+    for state, params in _launch(_sharded_checkpoint_worker, 2, str(tmp_path), False):
+        for name, value in saved_state.items():
+            assert np.array_equal(state[name], value), name
+        for name, value in saved_params.items():
+            assert np.array_equal(params[name], value), name
+
+    # A plain optimizer on a single process gets the full state
+    model = SimpleModel(hidden_size=16, dropout=0.0)
+    optimizer = optim.Adam(learning_rate=1e-2)
+    controller = DistributedController(checkpoint_dir=str(tmp_path))
+    model, epoch = controller.load_checkpoint(model, optimizer)
+    assert epoch == 1
+    state = dict(tree_flatten(optimizer.state))
+    assert np.array_equal(np.array(state["linear1.weight.v"]), saved_state["linear1.weight.v"])
+
+def test_incremental_checkpoints_and_retention(tmp_path):
+    """Test snapshots only write changed tensors and old ones are pruned"""
+    import mlx.nn as nn
+    import mlx.optimizers as optim
+    from mlx_train.training.checkpoint import BlobStore, RetentionPolicy, list_checkpoints, read_checkpoint
+
+    model = SimpleModel(hidden_size=16, dropout=0.0)
+    model.linear1.freeze()  # Only linear2 trains, like a LoRA adapter
+    optimizer = optim.SGD(learning_rate=0.1)
+    controller = DistributedController(
+        checkpoint_dir=str(tmp_path),
+        incremental_checkpoints=True,
+        retention=RetentionPolicy(keep_last=2, keep_best=1, metric="loss")
+    )
+    loss_fn = lambda m, x: m.loss_fn(m(x), x)
+    losses = [0.5, 0.1, 0.9, 0.8, 0.7, 0.6, 0.4, 0.3, 0.35, 0.45, 0.2, 0.25]
+    written = []
+    for epoch, loss in enumerate(losses, start=1):
+        x = mx.random.normal((4, 16))
+        _, grads = nn.value_and_grad(model, loss_fn)(model, x)
+        optimizer.update(model, grads)
+        controller.save_checkpoint(model, optimizer, epoch=epoch, metrics={"loss": loss})
+        manifest = json.loads((tmp_path / f"checkpoint_epoch_{epoch}" / "manifest.json").read_text())
+        written.append(manifest["written_bytes"])
+
+    # The frozen layer is written once; later snapshots carry only linear2
+    frozen_bytes = model.linear1.weight.nbytes + model.linear1.bias.nbytes
+    trainable_bytes = model.linear2.weight.nbytes + model.linear2.bias.nbytes
+    assert written[0] >= frozen_bytes + trainable_bytes
+    assert all(w <= trainable_bytes + 64 for w in written[1:])
+
+    # Numeric order (epoch 12 after 9) and last-2 + best-1 retention
+    assert [p.name for p in list_checkpoints(tmp_path)] == [
+        "checkpoint_epoch_2", "checkpoint_epoch_11", "checkpoint_epoch_12"
+    ]
+    # Pruned snapshots' blobs are gone; the frozen layer's blob is still shared
+    referenced = set()
+    for path in list_checkpoints(tmp_path):
+        for kind in json.loads((path / "manifest.json").read_text())["blobs"].values():
+            referenced.update(kind.values())
+    assert BlobStore(tmp_path / "blobs").keys() == referenced
+
+    model_state, _, manifest = read_checkpoint(tmp_path / "checkpoint_epoch_12")
+    assert mx.array_equal(model_state["linear2"]["weight"], model.linear2.weight)
+    assert mx.array_equal(model_state["linear1"]["weight"], model.linear1.weight)
+    restored, epoch = controller.load_checkpoint(SimpleModel(hidden_size=16, dropout=0.0), optim.SGD(learning_rate=0.1))
+    assert epoch == 12
+    assert mx.array_equal(restored.linear2.bias, model.linear2.bias)
+
+def test_mid_epoch_resume(tmp_path):
+    """Test a run resumed mid-epoch sees the same batches, dropout masks and result"""
+    import mlx.nn as nn
+    import mlx.optimizers as optim
+    from mlx_train.data import ResumableSampler
+    from mlx.utils import tree_flatten
+    from mlx_train.training.state import restore_training_state, training_state
+
+    manager = DatasetManager({"hidden_size": 8, "batch_size": 4, "memory_per_device": 8,
+                              "cache_dir": str(tmp_path / "cache")})
+    data = Dataset.from_dict({
+        "input_ids": np.random.normal(size=(22, 8)).tolist(),
+        "labels": np.random.normal(size=(22, 8)).tolist()
+    })
+    def run(model, optimizer, sampler, step, stop_at=None):
+        """Train until `stop_at` (then checkpoint) or the end of epoch 2"""
+        controller = DistributedController(checkpoint_dir=str(tmp_path / "ckpt"))
+        while sampler.epoch < 2:
+            for x, y in manager.get_dataloader(data, sampler=sampler):
+                x = x + mx.array(np.random.normal(size=x.shape).astype(np.float32)) * 0.01
+                _, grads = nn.value_and_grad(model, _mse_loss)(model, x, y)
+                optimizer.update(model, grads)
+                mx.eval(model.parameters(), optimizer.state)
+                step += 1
+                if step == stop_at:
+                    controller.save_checkpoint(model, optimizer, sampler.epoch, {},
+                                               training_state=training_state(step, sampler=sampler))
+                    return step
+        return step
+
+    def fresh():
+        mx.random.seed(0)
+        np.random.seed(0)
+        model = SimpleModel(hidden_size=8, dropout=0.5)  # Dropout makes the result RNG-dependent
+        optimizer = optim.Adam(learning_rate=1e-2)
+        optimizer.init(model.trainable_parameters())
+        return model, optimizer, ResumableSampler(len(data), 4, seed=7)
+
+    model, optimizer, sampler = fresh()
+    assert run(model, optimizer, sampler, 0) == 12  # 6 batches per epoch, the last one partial
+    reference = model.parameters()
+
+    # Stop in the middle of epoch 1, then resume in a "new process"
+    model, optimizer, sampler = fresh()
+    run(model, optimizer, sampler, 0, stop_at=9)
+    mx.random.seed(123)
+    np.random.seed(123)
+    model, optimizer, sampler = fresh()
+    controller = DistributedController(checkpoint_dir=str(tmp_path / "ckpt"))
+    model, epoch = controller.load_checkpoint(model, optimizer)
+    step = restore_training_state(controller.resume_state["training_state"], sampler=sampler)
+    assert (step, epoch, sampler.epoch, sampler.cursor) == (9, 1, 1, 12)
+    assert run(model, optimizer, sampler, step) == 12
+    for a, b in zip(tree_flatten(reference), tree_flatten(model.parameters())):
+        assert mx.array_equal(a[1], b[1]), a[0]
+
+    # The cursor counts global samples, so two ranks pick up where one left off
+    ranks = [ResumableSampler(len(data), 2, seed=7, rank=r, world_size=2) for r in range(2)]
+    for r in ranks:
+        r.load_state_dict(sampler.state_dict() | {"epoch": 1, "cursor": 12})
+    resumed = np.concatenate([i for batches in zip(*ranks) for i in batches])
+    assert np.array_equal(resumed, sampler.order(1)[12:])
+
+def _orchestrator_config(tmp_path, **flags):
+    return {
+        "model_type": "simple", "hidden_size": 8, "dropout": 0.0, "batch_size": 4, "num_epochs": 2,
+        "learning_rate": 1e-2, "memory_per_device": 8, "cache_dir": str(tmp_path / "cache"),
+        "checkpoint_dir": str(tmp_path / "ckpt"), **flags
+    }
+
+def _orchestrator_data(num_samples: int = 16):
+    rng = np.random.default_rng(0)
+    return Dataset.from_dict({
+        "input_ids": rng.normal(size=(num_samples, 8)).tolist(),
+        "labels": rng.normal(size=(num_samples, 8)).tolist()
+    })
+
+class _DelayedCommunicator:
+    """Wrap a communicator and sleep before every collective"""
+
+    def __init__(self, comm, delay):
+        self.comm = comm
+        self.delay = delay
+
+    def __getattr__(self, name):
+        attr = getattr(self.comm, name)
+        if not callable(attr):
+            return attr
+
+        def delayed(*args, **kwargs):
+            time.sleep(self.delay)
+            return attr(*args, **kwargs)
+        return delayed
+
+def _trained_params(orchestrator) -> dict:
+    """Full trained weights, gathered from the FSDP or tensor-parallel shards"""
+    if orchestrator.fsdp is not None:
+        return {name: np.array(value) for name, value in orchestrator.fsdp.state_dict().items()}
+    if orchestrator.tensor_parallel is not None:
+        return _flat_params(orchestrator.tensor_parallel)
+    return _flat_params(orchestrator.model)
+
+def _orchestrator_worker(comm, config, delay=0.0, num_samples=16):
+    """Train through the orchestrator and report its state (spawned by launch_local)"""
+    from mlx_train.training.orchestrator import TrainingOrchestrator
+
+    mx.random.seed(comm.rank)  # Replicas must come out of synchronize_model identical
+    config = {**config, "cache_dir": f"{config['cache_dir']}_{comm.rank}"}
+    if delay:
+        comm = _DelayedCommunicator(comm, delay)
+    controller = DistributedController(communicator=comm, checkpoint_dir=config["checkpoint_dir"])
+    orchestrator = TrainingOrchestrator(config, distributed=controller)
+    metrics = orchestrator.train(_orchestrator_data(num_samples))
+    summary = orchestrator.telemetry.summary() if orchestrator.telemetry else None
+    return metrics["loss"], orchestrator.global_step, _trained_params(orchestrator), summary
+
+@pytest.mark.parametrize("flags,replicated,steps", [
+    # Plain data parallelism with the overlapped gradient all-reduce
+    ({}, True, 4),
+    ({"zero_stage": 1}, True, 4),
+    ({"fsdp": True}, False, 4),
+    ({"load_balance": True}, True, 4),
+    ({"local_sgd": {"sync_every": 2}}, True, 4),
+    # Both ranks work on the same batches
+    ({"tensor_parallel": {"column": ["linear1"], "row": ["linear2"]}}, False, 8)
+])
+def test_orchestrator_features(tmp_path, flags, replicated, steps):
+    """Test each distributed config flag trains end to end through the orchestrator"""
+    outputs = _launch(_orchestrator_worker, 2, _orchestrator_config(tmp_path, **flags))
+    for loss, step, _, _ in outputs:
+        assert np.isfinite(loss)
+        # 16 samples over two epochs, in global batches of 8 (4 under tensor parallelism)
+        assert step == steps
+    if replicated:
+        for name, value in outputs[0][2].items():
+            assert np.array_equal(value, outputs[1][2][name]), name
+
+    # The final checkpoint holds rank 0's full weights and matching optimizer state
+    from mlx.utils import tree_flatten
+    from mlx_train.training.checkpoint import read_checkpoint
+    model_state, optimizer_state, _ = read_checkpoint(tmp_path / "ckpt" / "checkpoint_epoch_2")
+    saved = dict(tree_flatten(model_state))
+    assert sorted(saved) == sorted(outputs[0][2])
+    for name, value in outputs[0][2].items():
+        assert value.shape == ((8, 8) if name.endswith("weight") else (8,)), name
+        assert np.array_equal(np.array(saved[name]), value), name
+        assert dict(tree_flatten(optimizer_state))[f"{name}.m"].shape == value.shape, name
+
+@pytest.mark.parametrize("num_samples,steps", [(18, 6), (17, 4)])
+def test_orchestrator_load_balance_short_batch(tmp_path, num_samples, steps):
+    """Test load balancing splits a short final batch, or skips one too short for every rank"""
+    config = _orchestrator_config(tmp_path, load_balance=True)
+    outputs = _launch(_orchestrator_worker, 2, config, 0.0, num_samples)
+    # Global batches of 8: the trailing 2 samples are split, a single one is skipped
+    for loss, step, _, _ in outputs:
+        assert np.isfinite(loss)
+        assert step == steps
+    for name, value in outputs[0][2].items():
+        assert np.array_equal(value, outputs[1][2][name]), name
+
+def test_orchestrator_telemetry_times_zero_update(tmp_path):
+    """Test telemetry counts the ZeRO update, where the collectives run, as wait time"""
+    config = _orchestrator_config(tmp_path, zero_stage=1, telemetry={"report_every": 2})
+    outputs = _launch(_orchestrator_worker, 2, config, 0.02)
+    for _, _, _, summary in outputs:
+        assert summary["steps"] == 4
+        # At least a reduce-scatter and an all-gather per update
+        assert summary["wait_mean"] >= 0.04
+    assert (tmp_path / "ckpt" / "telemetry.jsonl").exists()
+
+@pytest.mark.parametrize("flags", [
+    {},
+    {"fsdp": True},
+    {"async_checkpoints": 2},
+    {"sharded_checkpoints": True},
+    {"incremental_checkpoints": True, "retention": {"keep_last": 2}}
+])
+def test_orchestrator_resume(tmp_path, flags):
+    """Test an interrupted orchestrator run resumes mid-epoch to the same weights"""
+    from mlx.utils import tree_flatten
+    from mlx_train.training.checkpoint import list_checkpoints
+    from mlx_train.training.orchestrator import TrainingOrchestrator
+
+    data = _orchestrator_data()
+    mx.random.seed(0)
+    reference = TrainingOrchestrator(_orchestrator_config(tmp_path / "reference", **flags))
+    reference.train(data)
+
+    # Stop right after the step 6 checkpoint, halfway through the second epoch
+    mx.random.seed(0)
+    config = _orchestrator_config(tmp_path, checkpoint_every=3, **flags)
+    interrupted = TrainingOrchestrator(config)
+    step_checkpoint = interrupted._step_checkpoint
+
+    def stop(loss):
+        step_checkpoint(loss)
+        if interrupted.global_step == 6:
+            raise RuntimeError("interrupted")
+    interrupted._step_checkpoint = stop
+    with pytest.raises(RuntimeError):
+        interrupted.train(data)
+    # Mid-epoch saves sit between the epoch checkpoints instead of replacing them
+    saved = ["checkpoint_step_3", "checkpoint_epoch_1", "checkpoint_step_6"]
+    if "retention" in flags:
+        saved = saved[-flags["retention"]["keep_last"]:]
+    assert [p.name for p in list_checkpoints(tmp_path / "ckpt")] == saved
+
+    mx.random.seed(1)
+    resumed = TrainingOrchestrator({**config, "resume": True})
+    assert resumed.current_epoch == 1
+    resumed.train(data)
+    assert (resumed.global_step, resumed.sampler.epoch, resumed.sampler.cursor) == (8, 2, 0)
+    expected = _trained_params(reference)
+    for name, value in _trained_params(resumed).items():
+        assert np.array_equal(value, expected[name]), name
+
+
+def _orchestrator_resume_worker(comm, tmp_path, flags, interrupt_at):
+    """Train uninterrupted, then interrupt and resume from a mid-epoch checkpoint (spawned by launch_local)"""
+    from mlx_train.training.orchestrator import TrainingOrchestrator
+
+    def run(config, interrupt_at=None):
+        mx.random.seed(comm.rank)
+        config = {**config, "cache_dir": f"{config['cache_dir']}_{comm.rank}"}
+        controller = DistributedController(communicator=comm, checkpoint_dir=config["checkpoint_dir"])
+        orchestrator = TrainingOrchestrator(config, distributed=controller)
+        step_checkpoint = orchestrator._step_checkpoint
+
+        def stop(loss):
+            step_checkpoint(loss)
+            if orchestrator.global_step == interrupt_at:
+                raise RuntimeError("interrupted")
+        orchestrator._step_checkpoint = stop
+        try:
+            orchestrator.train(_orchestrator_data())
+        except RuntimeError:
+            assert orchestrator.global_step == interrupt_at
+        return orchestrator
+
+    reference = run(_orchestrator_config(tmp_path / "reference", **flags))
+    config = _orchestrator_config(tmp_path, checkpoint_every=3, **flags)
+    interrupted = run(config, interrupt_at=interrupt_at)
+    resumed = run({**config, "resume": True})
+    return interrupted.global_step, resumed.global_step, _trained_params(reference), _trained_params(resumed)
+
+@pytest.mark.parametrize("flags,interrupt_at,steps", [
+    ({"fsdp": True}, 3, 4),
+    # Both ranks work on the same batches, so there are twice as many steps
+    ({"tensor_parallel": {"column": ["linear1"], "row": ["linear2"]}}, 6, 8)
+])
+def test_orchestrator_resume_sharded_model(tmp_path, flags, interrupt_at, steps):
+    """Test FSDP and tensor-parallel runs checkpoint full tensors and resume into their shards"""
+    outputs = _launch(_orchestrator_resume_worker, 2, tmp_path, flags, interrupt_at)
+    # Interrupted after a step checkpoint in the second epoch
+    for stopped, step, expected, resumed in outputs:
+        assert (stopped, step) == (interrupt_at, steps)
+        for name, value in resumed.items():
+            assert value.shape == ((8, 8) if name.endswith("weight") else (8,)), name
+            assert np.allclose(value, expected[name], atol=1e-6), name
@@ -41,4 +41,141 @@ def test_model_export(simple_model, tmp_path):
     assert (gguf_path / "model.gguf").exists()
     
     # Cleanup using tmp_path
-    shutil.rmtree(tmp_path, ignore_errors=True) 
\ No newline at end of file
+    shutil.rmtree(tmp_path, ignore_errors=True)
+
+def test_lora_merge_and_multi_adapter(model_config, tmp_path):
+    """Test adapter merging on export and batched multi-adapter forward"""
+    from mlx_train.models.architectures.lora import (
+        apply_lora, merge_lora, save_adapters, load_multi_adapter, set_adapter_ids
+    )
+
+    config = {**model_config, "dropout": 0.0}
+    x = mx.random.normal((3, config["hidden_size"]))
+    base = SimpleModel(**config)
+
+    # Two fine-tunes of the same base with different non-zero adapters
+    adapted = []
+    for i in range(2):
+        model = SimpleModel(**config)
+        model.update(base.parameters())
+        apply_lora(model, rank=4 + i)
+        model.linear1.adapter.lora_b.weight = mx.random.normal(model.linear1.adapter.lora_b.weight.shape)
+        save_adapters(model, tmp_path / f"adapter_{i}.safetensors")
+        adapted.append(model)
+    expected = [m(x) for m in adapted]
+
+    # Export merges adapters into the base weight layout
+    adapted[0].export(tmp_path / "merged", format="mlx")
+    weights = np.load(tmp_path / "merged" / "weights.npz")
+    assert set(weights.files) == {"linear1.weight", "linear1.bias", "linear2.weight", "linear2.bias"}
+
+    merge_lora(adapted[0])
+    assert isinstance(adapted[0].linear1, type(base.linear1))
+    assert mx.allclose(adapted[0](x), expected[0], atol=1e-4)
+    assert np.allclose(weights["linear1.weight"], np.array(adapted[0].linear1.weight), atol=1e-5)
+
+    # Many adapters over one shared base, selected per row in one batch
+    base_out = base(x)
+    slots = load_multi_adapter(base, {
+        "a": tmp_path / "adapter_0.safetensors",
+        "b": tmp_path / "adapter_1.safetensors"
+    })
+    set_adapter_ids(base, mx.array([0, slots["a"], slots["b"]]))
+    out = base(x)
+    assert mx.allclose(out[0], base_out[0], atol=1e-4)
+    assert mx.allclose(out[1], expected[0][1], atol=1e-4)
+    assert mx.allclose(out[2], expected[1][2], atol=1e-4)
+
+def test_merge_checkpoint_adapters(model_config, tmp_path):
+    """Test embedded adapters merge at their saved scale onto quantized bases"""
+    import mlx.nn as nn
+    import mlx.optimizers as optim
+    from mlx.utils import tree_flatten
+    from mlx_train.models.architectures.lora import apply_lora, merge_adapter_weights
+    from mlx_train.training.checkpoint import read_checkpoint
+    from mlx_train.training.distributed import DistributedController
+
+    model = SimpleModel(**{**model_config, "dropout": 0.0})
+    nn.quantize(model, group_size=64, bits=4)
+    apply_lora(model, rank=4, alpha=8.0)
+    model.linear1.adapter.lora_b.weight = mx.random.normal(model.linear1.adapter.lora_b.weight.shape)
+    expected = {name: model[name].merged_weight() for name in ("linear1", "linear2")}
+
+    controller = DistributedController(checkpoint_dir=str(tmp_path))
+    controller.save_checkpoint(model, optim.SGD(learning_rate=0.1), 0, {})
+    model_state, _, manifest = read_checkpoint(tmp_path / "checkpoint_epoch_0")
+    assert manifest["lora_scale"] == 2.0
+
+    state = dict(tree_flatten(model_state))
+    with pytest.raises(ValueError):
+        merge_adapter_weights(state)
+    merged = merge_adapter_weights(state, scale=manifest["lora_scale"])
+    assert "linear1.scales" not in merged and "linear1.adapter.lora_a.weight" not in merged
+    for name, weight in expected.items():
+        assert mx.allclose(merged[f"{name}.weight"], weight, atol=1e-5)
+
+class _ByteTokenizer:
+    """One token per byte, so a 256-token model needs no vocabulary files"""
+    eos_token_id = None
+
+    def encode(self, text):
+        return list(text.encode("latin-1"))
+
+    def decode(self, tokens):
+        return bytes(tokens).decode("latin-1")
+
+def test_server_generate_with_adapters(tmp_path):
+    """Test /v1/generate batches concurrent requests, each decoding with its own adapter"""
+    from concurrent.futures import ThreadPoolExecutor
+    from fastapi.testclient import TestClient
+    from mlx_train.models.architectures.lora import apply_lora, save_adapters
+    from mlx_train.models.architectures.transformer import Transformer
+    from serving.server import ModelServer
+
+    mx.random.seed(0)
+    config = {"model_type": "transformer", "hidden_size": 32, "num_layers": 1, "num_heads": 2, "vocab_size": 256}
+    base = Transformer.from_config(config)
+    (tmp_path / "model").mkdir()
+    (tmp_path / "model" / "config.json").write_text(json.dumps(config))
+    base.save_weights(str(tmp_path / "model" / "model.safetensors"))
+
+    # Two fine-tunes of the exported base with different output-layer adapters
+    references = {None: base}
+    (tmp_path / "adapters").mkdir()
+    for name in ("a", "b"):
+        model = Transformer.from_config(config)
+        model.update(base.parameters())
+        apply_lora(model, target_modules=["lm_head"], rank=4)
+        model.lm_head.adapter.lora_b.weight = mx.random.normal(model.lm_head.adapter.lora_b.weight.shape)
+        save_adapters(model, tmp_path / "adapters" / f"{name}.safetensors")
+        references[name] = model
+
+    def greedy(model, prompt, steps):
+        tokens = list(prompt.encode("latin-1"))
+        for _ in range(steps):
+            tokens.append(int(mx.argmax(model(mx.array([tokens]))[0, -1]).item()))
+        return bytes(tokens[len(prompt):]).decode("latin-1")
+
+    server = ModelServer(tmp_path / "model", batch_timeout_ms=20.0)
+    server.load_model(quantize=False)
+    server.load_adapters(tmp_path / "adapters")
+    server.tokenizer = _ByteTokenizer()
+
+    with TestClient(server.app) as client:
+        def generate(adapter):
+            body = {"prompt": "hi", "max_tokens": 5, "temperature": 0.0, "adapter": adapter}
+            return client.post("/v1/generate", json=body)
+
+        with ThreadPoolExecutor(3) as pool:
+            responses = dict(zip(references, pool.map(generate, references)))
+        assert generate("missing").status_code == 404
+
+    texts = {}
+    for name, response in responses.items():
+        assert response.status_code == 200
+        assert response.json()["adapter"] == name
+        texts[name] = response.json()["text"]
+        assert texts[name] == greedy(references[name], "hi", 5), name
+    assert texts["a"] != texts["b"]
+    # Requests for different adapters shared forward passes
+    assert max(server.metrics.train_metrics["batch_size"]) > 1
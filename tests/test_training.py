@@ -16,4 +16,171 @@ def test_model_creation(simple_model):
         assert "bias" in params[layer]
         # Verify parameters are initialized
         mx.eval(params[layer]["weight"])
-        mx.eval(params[layer]["bias"])
\ No newline at end of file
+        mx.eval(params[layer]["bias"])
+
+def test_lora_mode(model_config):
+    """Test LoRA mode freezes base weights and trains only adapters"""
+    import mlx.nn as nn
+    from mlx.utils import tree_flatten
+    from mlx_train.models.builder import ModelBuilder
+    from mlx_train.models.architectures.lora import LoRALinear
+
+    config = {**model_config, "dropout": 0.0, "lora": {"rank": 4, "target_modules": ["linear*"]}}
+    model = ModelBuilder.build(config, model_type="simple", lora=True)
+    assert isinstance(model.linear1, LoRALinear)
+    assert isinstance(model.linear2, LoRALinear)
+
+    # Only adapter weights are trainable
+    trainable = dict(tree_flatten(model.trainable_parameters()))
+    assert all(".adapter." in name for name in trainable)
+    assert ModelBuilder.count_parameters(model, trainable_only=True) == 2 * 2 * 4 * 128
+
+    # Zero-initialized adapters leave the base output unchanged
+    x = mx.random.normal((4, 128))
+    base_out = model.linear2.base(nn.relu(model.linear1.base(x)))
+    assert mx.allclose(model(x), base_out)
+
+    # Gradients cover adapter parameters only
+    loss_fn = lambda m, x, y: m.loss_fn(m(x), y)
+    _, grads = nn.value_and_grad(model, loss_fn)(model, x, mx.zeros((4, 128)))
+    assert set(dict(tree_flatten(grads))) == set(trainable)
+
+def test_qlora_mode(model_config):
+    """Test QLoRA: quantized frozen base with trainable fp adapters"""
+    import mlx.nn as nn
+    from mlx.utils import tree_flatten
+    from mlx_train.models.builder import ModelBuilder
+    from mlx_train.utils.memory import MemoryOptimizer
+
+    config = {**model_config, "quantization": {"bits": 4, "group_size": 64}, "lora": {"rank": 4, "dtype": "float16"}}
+    model = ModelBuilder.build(config, model_type="simple", quantize=True, lora=True)
+    assert isinstance(model.linear1.base, nn.QuantizedLinear)
+
+    trainable = dict(tree_flatten(model.trainable_parameters()))
+    assert trainable and all(".adapter." in name for name in trainable)
+    assert all(p.dtype == mx.float16 for p in trainable.values())
+
+    loss_fn = lambda m, x, y: m.loss_fn(m(x), y)
+    loss, grads = nn.value_and_grad(model, loss_fn)(model, mx.random.normal((4, 128)), mx.zeros((4, 128)))
+    assert set(dict(tree_flatten(grads))) == set(trainable)
+
+    # Report memory saved against the fp16 baseline
+    report = MemoryOptimizer.quantize_model(SimpleModel(hidden_size=128), bits=4)
+    assert report["memory_saved_gb"] > 0
+    assert report["compression_ratio"] > 2
+
+    # Quantized weight dicts expand into the QuantizedLinear layout
+    weights = MemoryOptimizer.quantize_weights({"linear1.weight": mx.zeros((128, 128))}, bits=8)
+    assert set(weights) == {"linear1.weight", "linear1.scales", "linear1.biases"}
+
+def test_lazy_sharded_loading(model_config, tmp_path, capsys):
+    """Test pretrained weights load lazily from indexed safetensors shards"""
+    import json
+    from mlx.utils import tree_flatten
+    from mlx_train.models.builder import ModelBuilder
+    from mlx_train.utils.memory import MemoryOptimizer
+
+    source = SimpleModel(hidden_size=128, dropout=0.0)
+    source.linear2.set_dtype(mx.bfloat16)
+    params = dict(tree_flatten(source.parameters()))
+    shards = {
+        "model-00001-of-00002.safetensors": ["linear1.weight", "linear1.bias"],
+        "model-00002-of-00002.safetensors": ["linear2.weight", "linear2.bias"]
+    }
+    for filename, names in shards.items():
+        mx.save_safetensors(str(tmp_path / filename), {n: params[n] for n in names})
+    weight_map = {n: filename for filename, names in shards.items() for n in names}
+    (tmp_path / "model.safetensors.index.json").write_text(json.dumps({"weight_map": weight_map}))
+
+    config = {**model_config, "dropout": 0.0, "pretrained_path": str(tmp_path)}
+    model = ModelBuilder.build(config, model_type="simple", pretrained=True)
+    for name, value in tree_flatten(model.parameters()):
+        assert value.dtype == params[name].dtype
+        assert mx.array_equal(value, params[name]), name
+    # The bf16 weights differ from the fp32 model and are reported
+    assert "linear2.weight" in capsys.readouterr().out
+
+    # Opening reads nothing: a missing shard only fails when used, and data
+    # written after opening is what gets loaded
+    second = tmp_path / "model-00002-of-00002.safetensors"
+    second.unlink()
+    weights = MemoryOptimizer.load_sharded(str(tmp_path))
+    assert len(weights) == 4
+    mx.save_safetensors(
+        str(tmp_path / "model-00001-of-00002.safetensors"),
+        {n: params[n] + 1 for n in shards["model-00001-of-00002.safetensors"]}
+    )
+    assert mx.array_equal(weights["linear1.bias"], params["linear1.bias"] + 1)
+    with pytest.raises(FileNotFoundError):
+        weights["linear2.bias"]
+
+    # An explicit dtype casts instead
+    mx.save_safetensors(str(second), {n: params[n] for n in shards["model-00002-of-00002.safetensors"]})
+    model = SimpleModel(hidden_size=128)
+    MemoryOptimizer.load_into(model, MemoryOptimizer.load_sharded(str(tmp_path)), dtype=mx.float32)
+    assert model.linear2.weight.dtype == mx.float32
+    assert "Warning" not in capsys.readouterr().out
+
+    # Shapes are validated from the headers before reading any data
+    with pytest.raises(ValueError, match="missing"):
+        MemoryOptimizer.load_into(SimpleModel(hidden_size=128), {"linear1.bias": params["linear1.bias"]})
+
+def test_transformer_model():
+    """Test the registered Transformer: GQA attention, causality, stages and FLOPs"""
+    import math
+    import mlx.nn as nn
+    import mlx.optimizers as optim
+    from mlx.utils import tree_flatten
+    from mlx_train.models.builder import ModelBuilder
+
+    config = {"hidden_size": 32, "num_layers": 2, "num_heads": 4, "num_kv_heads": 2, "vocab_size": 50}
+    model = ModelBuilder.build(config, model_type="transformer")
+    tokens = mx.random.randint(0, 50, (2, 7))
+    logits = model(tokens)
+    assert logits.shape == (2, 7, 50)
+    assert model.layers[0].attention.k_proj.weight.shape == (16, 32)  # 2 KV heads of 8
+
+    # Fused attention matches a reference with K/V tiled over each query group
+    block = model.layers[0]
+    h = block.attention_norm(model.embed_tokens(tokens))
+    attn = block.attention
+    q, k, v = (mx.unflatten(p(h), -1, (-1, 8)).transpose(0, 2, 1, 3) for p in (attn.q_proj, attn.k_proj, attn.v_proj))
+    rope = nn.RoPE(8, base=attn.rope_theta)
+    q, k = rope(q), rope(k)
+    k, v = mx.repeat(k, 2, axis=1), mx.repeat(v, 2, axis=1)
+    scores = (q @ k.transpose(0, 1, 3, 2)) / math.sqrt(8) + nn.MultiHeadAttention.create_additive_causal_mask(7)
+    reference = attn.o_proj((mx.softmax(scores, axis=-1) @ v).transpose(0, 2, 1, 3).flatten(-2, -1))
+    assert mx.allclose(attn(h), reference, atol=1e-5)
+
+    # Causal: changing the last token leaves earlier positions untouched
+    changed = model(mx.concatenate([tokens[:, :-1], (tokens[:, -1:] + 1) % 50], axis=1))
+    assert mx.allclose(changed[:, :-1], logits[:, :-1], atol=1e-5)
+    assert not mx.allclose(changed[:, -1], logits[:, -1])
+
+    # Stages compose to the forward pass
+    x = tokens
+    for stage in model.stages():
+        x = stage(x)
+    assert mx.allclose(x, logits, atol=1e-5)
+    loss, grads = nn.value_and_grad(model, lambda m: m.loss_fn(m(tokens[:, :-1]), tokens[:, 1:]))(model)
+    assert math.isfinite(loss.item())
+
+    # The chunked loss never builds the logits but gives the same loss and gradients
+    model.loss_chunk_size = 4
+    chunked, chunked_grads = nn.value_and_grad(model, lambda m: m.loss(tokens[:, :-1], tokens[:, 1:]))(model)
+    assert abs(chunked.item() - loss.item()) < 1e-5
+    for (name, a), (_, b) in zip(tree_flatten(grads), tree_flatten(chunked_grads)):
+        assert mx.allclose(a, b, atol=1e-5), name
+
+    # A few optimizer steps on the chunked loss reduce it
+    optimizer = optim.Adam(learning_rate=1e-2)
+    step = nn.value_and_grad(model, lambda m: m.loss(tokens[:, :-1], tokens[:, 1:]))
+    for _ in range(5):
+        _, step_grads = step(model)
+        optimizer.update(model, step_grads)
+        mx.eval(model.parameters(), optimizer.state)
+    assert model.loss(tokens[:, :-1], tokens[:, 1:]).item() < 0.8 * loss.item()
+
+    # 6 FLOPs per matmul weight per token, plus the attention term
+    matmul = sum(p.size for name, p in tree_flatten(model.parameters()) if name.endswith("proj.weight") or name == "lm_head.weight")
+    assert model.flops_per_token(128) == 6 * matmul + 12 * 2 * 32 * 128